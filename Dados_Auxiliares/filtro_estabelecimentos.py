@@ -0,0 +1,112 @@
+import argparse
+
+import pandas as pd
+
+# CONFIGURAÇÕES
+ARQUIVO_ENTRADA = 'tbEstabelecimento.csv'
+TAMANHO_BLOCO = 200_000  # linhas por bloco lido
+
+# Colunas usadas pelo pipeline (dimensão de unidades, relatórios e casamento de endereços)
+COLUNAS = [
+    'CO_CNES', 'CO_UNIDADE', 'CO_UF', 'CO_IBGE', 'NU_CNPJ_MANTENEDORA', 'NO_RAZAO_SOCIAL',
+    'NO_FANTASIA', 'TP_UNIDADE', 'CO_CEP', 'NO_LOGRADOURO', 'NU_ENDERECO', 'NO_BAIRRO',
+    'NU_LATITUDE', 'NU_LONGITUDE', 'NU_CNPJ',
+]
+
+
+# ============================
+# PREDICADOS (cada um recebe o bloco e devolve uma máscara booleana)
+# ============================
+
+def por_uf(*codigos):
+    codigos = {str(c) for c in codigos}
+    return lambda df: df['CO_UF'].str.strip().isin(codigos)
+
+
+def por_municipio(*codigos):
+    # Aceita o código IBGE com 6 ou 7 dígitos
+    codigos = {str(c)[:6] for c in codigos}
+    return lambda df: df['CO_IBGE'].str.strip().str[:6].isin(codigos)
+
+
+def sem_coordenadas():
+    def vazio(serie):
+        return serie.isna() | serie.str.strip().eq('')
+    return lambda df: vazio(df['NU_LATITUDE']) | vazio(df['NU_LONGITUDE'])
+
+
+def todos(*predicados):
+    """Combina predicados com E lógico."""
+    def combinado(df):
+        mask = pd.Series(True, index=df.index)
+        for p in predicados:
+            mask &= p(df)
+        return mask
+    return combinado
+
+
+# ============================
+# FILTRO EM FLUXO
+# ============================
+
+def filtrar_em_fluxo(saidas, arquivo_entrada=ARQUIVO_ENTRADA, colunas=COLUNAS,
+                     tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Lê o arquivo nacional uma única vez, em blocos e só com as colunas
+    necessárias, gravando cada subconjunto pedido.
+
+    `saidas` é um dict {arquivo_saida: predicado}. Retorna a contagem por arquivo.
+    """
+    colunas = set(colunas) if colunas else None
+    contagem = {arquivo: 0 for arquivo in saidas}
+
+    leitor = pd.read_csv(
+        arquivo_entrada,
+        sep=';',
+        encoding='latin1',
+        dtype=str,
+        usecols=(lambda c: c in colunas) if colunas else None,
+        chunksize=tamanho_bloco,
+    )
+
+    cabecalho = []
+    for bloco in leitor:
+        cabecalho = bloco.columns
+        for arquivo, predicado in saidas.items():
+            selecionados = bloco[predicado(bloco)]
+            if selecionados.empty:
+                continue
+            primeiro = contagem[arquivo] == 0
+            selecionados.to_csv(arquivo, index=False, sep=';', encoding='utf-8',
+                                mode='w' if primeiro else 'a', header=primeiro)
+            contagem[arquivo] += len(selecionados)
+
+    # Subconjuntos vazios ainda geram o arquivo (só cabeçalho), sem sobras de execuções antigas
+    for arquivo, qtd in contagem.items():
+        if qtd == 0:
+            pd.DataFrame(columns=cabecalho).to_csv(arquivo, index=False, sep=';', encoding='utf-8')
+
+    return contagem
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filtra o tbEstabelecimento em fluxo.")
+    parser.add_argument('saida', help="Arquivo CSV de saída")
+    parser.add_argument('--entrada', default=ARQUIVO_ENTRADA)
+    parser.add_argument('--uf', nargs='*', default=[], help="Códigos de UF")
+    parser.add_argument('--municipio', nargs='*', default=[], help="Códigos IBGE")
+    parser.add_argument('--sem-coordenadas', action='store_true')
+    parser.add_argument('--todas-colunas', action='store_true')
+    args = parser.parse_args()
+
+    predicados = []
+    if args.uf:
+        predicados.append(por_uf(*args.uf))
+    if args.municipio:
+        predicados.append(por_municipio(*args.municipio))
+    if args.sem_coordenadas:
+        predicados.append(sem_coordenadas())
+
+    qtd = filtrar_em_fluxo({args.saida: todos(*predicados)}, arquivo_entrada=args.entrada,
+                           colunas=None if args.todas_colunas else COLUNAS)
+    print(f"✅ {qtd[args.saida]} estabelecimentos salvos em '{args.saida}'")
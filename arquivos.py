@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+
+def _permissoes_destino(caminho):
+    """Modo do arquivo existente, ou o padrão de um arquivo novo (0666 & ~umask)."""
+    try:
+        return os.stat(caminho).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def salvar_csv_atomico(df, caminho, **kwargs):
+    """
+    Salva o DataFrame em CSV de forma atômica.
+
+    Escreve num arquivo temporário na mesma pasta e só então troca pelo
+    destino, assim uma interrupção nunca deixa o arquivo pela metade.
+    O destino mantém as permissões de antes (o temporário nasce com 0600).
+    """
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    fd, caminho_tmp = tempfile.mkstemp(
+        prefix=f".{os.path.basename(caminho)}.", suffix=".tmp", dir=pasta
+    )
+    try:
+        with os.fdopen(fd, "w", encoding=kwargs.pop("encoding", "utf-8"), newline="") as f:
+            df.to_csv(f, **kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(caminho_tmp, _permissoes_destino(caminho))
+        os.replace(caminho_tmp, caminho)
+    except BaseException:
+        if os.path.exists(caminho_tmp):
+            os.remove(caminho_tmp)
+        raise
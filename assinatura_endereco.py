@@ -0,0 +1,81 @@
+import re
+import unicodedata
+
+import pandas as pd
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+# Campos que definem o endereço de uma unidade, na ordem em que entram na assinatura:
+# nome, logradouro, número, bairro e município
+CAMPOS_DIM_UNIDADES = ["Nome_Unidade", "Rua", "Numero", "Bairro", "ID_Municipio"]
+CAMPOS_TB_ESTABELECIMENTO = [
+    "NO_FANTASIA",
+    "NO_LOGRADOURO",
+    "NU_ENDERECO",
+    "NO_BAIRRO",
+    "CO_IBGE",
+]
+
+# Valores que não carregam informação de endereço
+VALORES_VAZIOS = ["", "NAN", "NONE", "NULL", "S N", "SN", "SEM NUMERO"]
+
+
+# ============================
+# FUNÇÕES
+# ============================
+
+
+def normalizar_campo(serie):
+    """Normaliza um campo de texto (maiúsculas, sem acento, sem pontuação)."""
+    s = (
+        serie.fillna("")
+        .astype(str)
+        .str.upper()
+        .str.normalize("NFKD")
+        .str.encode("ascii", errors="ignore")
+        .str.decode("ascii")
+        .str.replace(r"[^A-Z0-9]+", " ", regex=True)
+        .str.strip()
+    )
+    # Códigos IBGE lidos como número viram "280030 0"
+    s = s.str.replace(r"^(\d+) 0$", r"\1", regex=True)
+    return s.mask(s.isin(VALORES_VAZIOS), "")
+
+
+def normalizar_texto(valor):
+    """Mesma normalização de `normalizar_campo`, para um único valor (sem pandas)."""
+    if valor is None or (isinstance(valor, float) and valor != valor):
+        return ""
+    s = unicodedata.normalize("NFKD", str(valor).upper())
+    s = s.encode("ascii", errors="ignore").decode("ascii")
+    s = re.sub(r"[^A-Z0-9]+", " ", s).strip()
+    s = re.sub(r"^(\d+) 0$", r"\1", s)
+    return "" if s in VALORES_VAZIOS else s
+
+
+def calcular_assinatura(df, campos=CAMPOS_DIM_UNIDADES):
+    """
+    Calcula a assinatura (hash hexadecimal) do endereço de cada linha.
+
+    Campos ausentes no DataFrame entram como vazios, então a assinatura
+    de uma mesma unidade é igual independente da origem dos dados.
+    """
+    partes = [
+        normalizar_campo(df[c]) if c in df.columns else pd.Series("", index=df.index)
+        for c in campos
+    ]
+    texto = partes[0].str.cat(partes[1:], sep="|")
+    hashes = pd.util.hash_pandas_object(texto, index=False)
+    return hashes.map("{:016x}".format)
+
+
+def comparar_assinaturas(assinaturas_atuais, assinaturas_cache):
+    """
+    Retorna a máscara das linhas cuja assinatura mudou em relação ao cache.
+
+    Linhas sem assinatura no cache (cache antigo) não contam como alteradas.
+    """
+    cache = assinaturas_cache.reindex(assinaturas_atuais.index)
+    return cache.notna() & (cache != assinaturas_atuais)
@@ -5,6 +5,12 @@ import pandas as pd
 from geopy.extra.rate_limiter import RateLimiter
 from geopy.geocoders import Nominatim
 
+from cdc_dim_unidades import registrar_e_informar
+from coordenadas import aplicar_qualidade
+from geocoding_google import aplicar_cache
+from reaproveitar_coordenadas import aplicar_reaproveitamento
+from validar_poligonos import aplicar_validacao
+
 # CONFIGURAÇÃO DE PASTAS
 PASTA_BRUTOS = "Dados_Brutos"
 PASTA_AUXILIARES = "Dados_Auxiliares"
@@ -97,7 +103,9 @@ def processar_fatos_dengue():
         "ID_MUNICIP",  # Código IBGE do Município (as vezes vem como ID_MUNICIP)
         "ID_UNIDADE",  # Código CNES
         "NU_ANO",  # Ano
-        # Adicione aqui outras se precisar, ex: 'DT_SIN_PRI' (Data Sintomas)
+        "ID_MN_RESI",  # Código IBGE do município de residência (fluxo de pacientes)
+        "SEM_NOT",  # Semana epidemiológica da notificação (AAAASS)
+        "DT_SIN_PRI",  # Data dos primeiros sintomas (clusters espaço-temporais)
     ]
 
     lista_dfs = []
@@ -140,21 +148,25 @@ def processar_fatos_dengue():
             "ID_MUNICIP": "ID_Municipio",
             "ID_UNIDADE": "CNES",
             "NU_ANO": "Ano",
+            "ID_MN_RESI": "ID_Municipio_Residencia",
+            "SEM_NOT": "Semana_Epidemiologica",
+            "DT_SIN_PRI": "Data_Sintomas",
         }
         df_consolidado = df_consolidado.rename(columns=mapa_colunas)
 
         print("   Tratando datas e códigos...")
 
         # Tratamento de Data
-        df_consolidado["Data_Notificacao"] = pd.to_datetime(
-            df_consolidado["Data_Notificacao"], errors="coerce"
-        )
+        for col in ["Data_Notificacao", "Data_Sintomas"]:
+            if col in df_consolidado.columns:
+                df_consolidado[col] = pd.to_datetime(
+                    df_consolidado[col], errors="coerce"
+                )
 
         # Tratamento do Código IBGE (Função que já criamos)
-        if "ID_Municipio" in df_consolidado.columns:
-            df_consolidado["ID_Municipio"] = df_consolidado["ID_Municipio"].apply(
-                tratar_codigo_ibge
-            )
+        for col in ["ID_Municipio", "ID_Municipio_Residencia"]:
+            if col in df_consolidado.columns:
+                df_consolidado[col] = df_consolidado[col].apply(tratar_codigo_ibge)
 
         # Salvar
         caminho_saida = os.path.join(PASTA_TRATADOS, "Fato_Dengue_Consolidada.csv")
@@ -186,6 +198,9 @@ def criar_dimensao_unidades_saude():
         "NO_LOGRADOURO": "Rua",
         "NU_ENDERECO": "Numero",
         "NO_BAIRRO": "Bairro",
+        "TP_UNIDADE": "Tipo_Unidade",
+        "CO_CEP": "CEP",
+        "NU_CNPJ_MANTENEDORA": "CNPJ_Mantenedora",
     }
 
     try:
@@ -222,11 +237,42 @@ def criar_dimensao_unidades_saude():
                 tratar_codigo_ibge
             )
 
+        # Qualidade: desinverte lat/long trocadas e apaga coordenadas zeradas ou
+        # fora do Brasil, que assim voltam para a fila de geocodificação. Fora da
+        # caixa da UF/município só marca a flag; apagar, só com o polígono
+        if {"Latitude", "Longitude"} <= set(df_unidades.columns):
+            for flag, qtd in aplicar_qualidade(df_unidades).items():
+                print(f"   🧭 {flag}: {qtd}")
+            # Com a malha municipal disponível, confere também pelo polígono
+            reprovadas = aplicar_validacao(df_unidades)
+            if reprovadas:
+                print(f"   🗺️ Fora do polígono do município: {reprovadas}")
+
+        # Unidades sem coordenada que dividem endereço, CEP ou mantenedora com
+        # uma irmã já localizada herdam a coordenada dela (antes de qualquer geocoder pago)
+        reaproveitadas = aplicar_reaproveitamento(df_unidades)
+        for tipo, qtd in reaproveitadas.items():
+            print(f"   ♻️ Coordenadas reaproveitadas por {tipo}: {qtd}")
+
+        # Coordenadas já pagas ao Google (cache) voltam antes do CDC; sem isso
+        # toda reconstrução publicaria as unidades geocodificadas sem coordenada
+        reaplicadas, _ = aplicar_cache(df_unidades)
+        if reaplicadas.any():
+            print(f"   📍 Coordenadas reaplicadas do cache Google: {reaplicadas.sum()}")
+
+        # Flags refletem a coordenada final de cada linha, com o mesmo acabamento
+        # da geocodificação (herdada inválida é apagada), para a reconstrução
+        # sobre a mesma entrada não gerar alterações no CDC
+        if {"Latitude", "Longitude"} <= set(df_unidades.columns):
+            aplicar_qualidade(df_unidades, corrigir_invertidas=False)
+            aplicar_validacao(df_unidades)
+
         # Salvar Dimensão CNES
         df_unidades.to_csv(
             os.path.join(PASTA_TRATADOS, "Dim_Unidades_Saude.csv"), index=False, sep=";"
         )
         print(f"✅ Dimensão Unidades de Saúde salva ({len(df_unidades)} registros).")
+        registrar_e_informar(df_unidades)
 
     except Exception as e:
         print(f"❌ Erro ao processar CNES: {e}")
@@ -0,0 +1,272 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from coordenadas import avaliar_coordenadas, coordenada_ausente
+from fila_geocodificacao import normalizar_cnes
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+PASTA_TRATADOS = "Dados_Tratados"
+ARQUIVO_DIM = os.path.join(PASTA_TRATADOS, "Dim_Unidades_Saude.csv")
+ARQUIVO_CACHE_GOOGLE = "cache_google_maps.csv"
+
+# Base compilada (somente leitura, aberta por memory-map)
+ARQUIVO_BASE = os.path.join(PASTA_TRATADOS, "coordenadas_cnes.bin")
+
+# Layout do arquivo:
+#   cabeçalho: ASSINATURA (8 bytes) + quantidade de registros (uint64)
+#   CNES int64[n] (ordenado) | latitude float64[n] | longitude float64[n]
+#   | município int32[n] (IBGE 6 dígitos, 0 se desconhecido) | origem uint8[n]
+ASSINATURA = b"COORDCN2"
+TAMANHO_CABECALHO = 16
+
+# Origem da coordenada (metadado de 1 byte)
+ORIGEM_DESCONHECIDA = 0
+ORIGEM_OFICIAL = 1  # veio do CNES/tbEstabelecimento
+ORIGEM_GOOGLE = 2
+ORIGEM_NOMINATIM = 3
+ORIGEM_GAZETTEER = 4
+
+# Coluna Provedor do cache de geocodificação -> origem
+ORIGENS_PROVEDOR = {
+    "Google": ORIGEM_GOOGLE,
+    "Nominatim": ORIGEM_NOMINATIM,
+    "Gazetteer": ORIGEM_GAZETTEER,
+}
+
+
+def chave_cnes(serie):
+    """CNES normalizado como inteiro (NaN quando não for numérico)."""
+    return pd.to_numeric(normalizar_cnes(serie), errors="coerce")
+
+
+# ============================
+# COMPILAÇÃO
+# ============================
+
+
+def compilar(cnes, latitudes, longitudes, origens, municipios=None,
+             caminho=ARQUIVO_BASE):
+    """
+    Grava a base binária a partir de arrays alinhados.
+
+    Registros sem CNES numérico ou sem coordenada são descartados; em CNES
+    repetido vale o último. Retorna a quantidade de registros gravados.
+    """
+    cnes = pd.Series(cnes)
+    if municipios is None:
+        municipios = np.zeros(len(cnes), dtype="int32")
+    df = pd.DataFrame(
+        {
+            "cnes": chave_cnes(cnes).to_numpy(),
+            "lat": np.asarray(latitudes, dtype="float64"),
+            "lon": np.asarray(longitudes, dtype="float64"),
+            "municipio": pd.to_numeric(
+                pd.Series(municipios).astype("string").str.strip().str[:6],
+                errors="coerce",
+            )
+            .fillna(0)
+            .to_numpy(dtype="int32"),
+            "origem": np.asarray(origens, dtype="uint8"),
+        }
+    )
+    df = df.dropna(subset=["cnes", "lat", "lon"])
+    df = df[(df["lat"] != 0) & (df["lon"] != 0)]
+    df = df.drop_duplicates(subset=["cnes"], keep="last").sort_values("cnes")
+    n = len(df)
+
+    caminho_tmp = caminho + ".tmp"
+    with open(caminho_tmp, "wb") as f:
+        f.write(ASSINATURA)
+        f.write(np.uint64(n).tobytes())
+        f.write(df["cnes"].to_numpy(dtype="int64").tobytes())
+        f.write(df["lat"].to_numpy(dtype="float64").tobytes())
+        f.write(df["lon"].to_numpy(dtype="float64").tobytes())
+        f.write(df["municipio"].to_numpy(dtype="int32").tobytes())
+        f.write(df["origem"].to_numpy(dtype="uint8").tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(caminho_tmp, caminho)
+    return n
+
+
+def compilar_da_dimensao(arquivo_dim=ARQUIVO_DIM, arquivo_cache=ARQUIVO_CACHE_GOOGLE,
+                         caminho=ARQUIVO_BASE):
+    """
+    Compila a base com as coordenadas da Dim_Unidades_Saude aprovadas na
+    qualidade (as mesmas que os consumidores da dimensão aceitam).
+
+    A origem vem do provedor do cache de geocodificação quando a coordenada
+    da dimensão é a mesma do cache; caso contrário é considerada oficial.
+    """
+    df = pd.read_csv(
+        arquivo_dim,
+        sep=";",
+        dtype=str,
+        usecols=["CNES", "ID_Municipio", "Latitude", "Longitude"],
+    )
+    df = df[~(coordenada_ausente(df["Latitude"]) | coordenada_ausente(df["Longitude"]))]
+    qualidade = avaliar_coordenadas(df)
+    valida = qualidade["Coord_Valida"]
+    df = df[valida]
+    lat = qualidade.loc[valida, "Lat"]
+    lon = qualidade.loc[valida, "Lon"]
+
+    origem = pd.Series(ORIGEM_OFICIAL, index=df.index, dtype="uint8")
+    if arquivo_cache and os.path.exists(arquivo_cache):
+        cache = pd.read_csv(arquivo_cache, sep=";", dtype=str)
+        if "Provedor" not in cache.columns:
+            cache["Provedor"] = None
+        cache = cache.assign(CNES=chave_cnes(cache["CNES"])).drop_duplicates(
+            subset=["CNES"], keep="last"
+        ).set_index("CNES")
+        chaves = chave_cnes(df["CNES"])
+        lat_cache = chaves.map(pd.to_numeric(cache["Lat_Google"], errors="coerce"))
+        lon_cache = chaves.map(pd.to_numeric(cache["Long_Google"], errors="coerce"))
+        # Registros antigos, sem provedor, vieram todos do Google
+        origem_cache = chaves.map(
+            cache["Provedor"].map(ORIGENS_PROVEDOR).fillna(ORIGEM_GOOGLE)
+        )
+        do_cache = (lat_cache == lat) & (lon_cache == lon)
+        origem[do_cache] = origem_cache[do_cache].astype("uint8")
+
+    return compilar(df["CNES"], lat, lon, origem, df["ID_Municipio"], caminho)
+
+
+def abrir_base(arquivo_dim=ARQUIVO_DIM, arquivo_cache=ARQUIVO_CACHE_GOOGLE,
+               caminho=ARQUIVO_BASE):
+    """
+    Abre a base, recompilando antes se ela não existir, for de outro formato
+    ou estiver mais velha que a dimensão ou o cache.
+    """
+    versao = os.stat(caminho).st_mtime_ns if os.path.exists(caminho) else -1
+    fontes = [a for a in (arquivo_dim, arquivo_cache) if a and os.path.exists(a)]
+    if any(os.stat(a).st_mtime_ns > versao for a in fontes):
+        compilar_da_dimensao(arquivo_dim, arquivo_cache, caminho)
+    try:
+        return BaseCoordenadas(caminho)
+    except ValueError:
+        # Base de um layout antigo: recompila
+        compilar_da_dimensao(arquivo_dim, arquivo_cache, caminho)
+        return BaseCoordenadas(caminho)
+
+
+# ============================
+# CONSULTA
+# ============================
+
+
+class BaseCoordenadas:
+    """
+    Base de coordenadas por CNES, aberta por memory-map (sem parse nem cópia).
+
+    A busca é binária sobre as chaves ordenadas, para um CNES (`buscar`) ou
+    vetorizada para um array inteiro (`buscar_varios`).
+    """
+
+    def __init__(self, caminho=ARQUIVO_BASE):
+        with open(caminho, "rb") as f:
+            cabecalho = f.read(TAMANHO_CABECALHO)
+        if cabecalho[:8] != ASSINATURA:
+            raise ValueError(f"{caminho} não é uma base de coordenadas compilada.")
+        n = int(np.frombuffer(cabecalho[8:], dtype="uint64")[0])
+
+        self.caminho = caminho
+        self.tamanho = n
+        inicio = TAMANHO_CABECALHO
+        self.cnes = self._mapear("int64", inicio, n)
+        self.latitudes = self._mapear("float64", inicio + 8 * n, n)
+        self.longitudes = self._mapear("float64", inicio + 16 * n, n)
+        self.municipios = self._mapear("int32", inicio + 24 * n, n)
+        self.origens = self._mapear("uint8", inicio + 28 * n, n)
+
+    def _mapear(self, dtype, deslocamento, n):
+        if n == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.caminho, dtype=dtype, mode="r", offset=deslocamento, shape=(n,))
+
+    def __len__(self):
+        return self.tamanho
+
+    def tabela(self):
+        """
+        Toda a base como DataFrame (CNES inteiro, ID_Municipio, Lat, Lon,
+        Origem), para os consumidores que juntam pelo CNES.
+        """
+        municipios = pd.Series(np.asarray(self.municipios)).astype(str)
+        return pd.DataFrame(
+            {
+                "CNES": np.asarray(self.cnes),
+                "ID_Municipio": municipios.mask(municipios == "0"),
+                "Lat": np.asarray(self.latitudes),
+                "Lon": np.asarray(self.longitudes),
+                "Origem": np.asarray(self.origens),
+            }
+        )
+
+    def posicoes(self, chaves):
+        """Posição de cada chave na base (-1 quando ausente)."""
+        chaves = np.asarray(chaves, dtype="int64")
+        if self.tamanho == 0:
+            return np.full(chaves.shape, -1, dtype="int64")
+        pos = np.minimum(np.searchsorted(self.cnes, chaves), self.tamanho - 1)
+        return np.where(self.cnes[pos] == chaves, pos, -1)
+
+    def buscar(self, cnes):
+        """(latitude, longitude, origem) do CNES, ou None se não estiver na base."""
+        chave = chave_cnes(pd.Series([cnes])).iloc[0]
+        if pd.isna(chave):
+            return None
+        pos = self.posicoes([int(chave)])[0]
+        if pos < 0:
+            return None
+        return float(self.latitudes[pos]), float(self.longitudes[pos]), int(self.origens[pos])
+
+    def buscar_varios(self, cnes):
+        """
+        Busca vetorizada. Aceita array de inteiros ou Series de CNES em texto.
+
+        Retorna (latitudes, longitudes, origens) alinhados à entrada, com NaN
+        e ORIGEM_DESCONHECIDA onde o CNES não foi encontrado.
+        """
+        if isinstance(cnes, pd.Series):
+            chaves = chave_cnes(cnes).fillna(-1).to_numpy(dtype="int64")
+        else:
+            chaves = np.asarray(cnes, dtype="int64")
+        pos = self.posicoes(chaves)
+        achou = pos >= 0
+        pos = np.where(achou, pos, 0)
+
+        latitudes = np.full(chaves.shape, np.nan)
+        longitudes = np.full(chaves.shape, np.nan)
+        origens = np.full(chaves.shape, ORIGEM_DESCONHECIDA, dtype="uint8")
+        latitudes[achou] = self.latitudes[pos[achou]]
+        longitudes[achou] = self.longitudes[pos[achou]]
+        origens[achou] = self.origens[pos[achou]]
+        return latitudes, longitudes, origens
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Base binária de coordenadas por CNES.")
+    parser.add_argument("--compilar", action="store_true", help="Compila a partir da dimensão")
+    parser.add_argument("--base", default=ARQUIVO_BASE)
+    parser.add_argument("cnes", nargs="*", help="CNES para consultar")
+    args = parser.parse_args()
+
+    if args.compilar:
+        qtd = compilar_da_dimensao(caminho=args.base)
+        print(f"✅ Base compilada com {qtd} coordenadas em '{args.base}'")
+
+    if args.cnes:
+        base = BaseCoordenadas(args.base)
+        for cnes in args.cnes:
+            resultado = base.buscar(cnes)
+            if resultado is None:
+                print(f"   {cnes}: não encontrado")
+            else:
+                print(f"   {cnes}: lat={resultado[0]} lon={resultado[1]} origem={resultado[2]}")
@@ -0,0 +1,148 @@
+import sqlite3
+import threading
+import time
+
+import requests
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+# Dados do CNES mudam no máximo uma vez por mês
+TTL_PADRAO = 30 * 24 * 3600  # segundos
+
+# Tamanho máximo dos corpos guardados; acima disso os menos usados saem primeiro
+TAMANHO_MAXIMO_PADRAO = 200 * 1024 * 1024  # bytes
+
+
+class CacheHTTP:
+    """
+    Cache persistente (SQLite) de respostas HTTP GET, chaveado pela URL.
+
+    Guarda o corpo, o horário da busca e os cabeçalhos ETag/Last-Modified.
+    Dentro do TTL a resposta sai do disco sem rede; depois dele é feita uma
+    requisição condicional e um 304 apenas renova a entrada. O total em
+    bytes é limitado com remoção LRU.
+    """
+
+    def __init__(self, caminho, ttl=TTL_PADRAO, tamanho_maximo=TAMANHO_MAXIMO_PADRAO):
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self._trava = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS respostas (
+                url TEXT PRIMARY KEY,
+                corpo BLOB NOT NULL,
+                buscado_em REAL NOT NULL,
+                ultimo_acesso REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                tamanho INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ultimo_acesso ON respostas (ultimo_acesso)"
+        )
+        self._conn.commit()
+        self._tamanho_total = self._conn.execute(
+            "SELECT COALESCE(SUM(tamanho), 0) FROM respostas"
+        ).fetchone()[0]
+
+    @staticmethod
+    def montar_chave(url, params=None):
+        """URL completa (com parâmetros ordenados) usada como chave."""
+        if params:
+            params = sorted(params.items())
+        return requests.Request("GET", url, params=params).prepare().url
+
+    def _ler(self, chave):
+        with self._trava:
+            return self._conn.execute(
+                "SELECT corpo, buscado_em, etag, last_modified FROM respostas WHERE url = ?",
+                (chave,),
+            ).fetchone()
+
+    def _tocar(self, chave, renovar=False):
+        agora = time.time()
+        with self._trava:
+            if renovar:
+                self._conn.execute(
+                    "UPDATE respostas SET ultimo_acesso = ?, buscado_em = ? WHERE url = ?",
+                    (agora, agora, chave),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE respostas SET ultimo_acesso = ? WHERE url = ?", (agora, chave)
+                )
+            self._conn.commit()
+
+    def _gravar(self, chave, resp):
+        agora = time.time()
+        corpo = resp.content
+        with self._trava:
+            anterior = self._conn.execute(
+                "SELECT tamanho FROM respostas WHERE url = ?", (chave,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    chave,
+                    corpo,
+                    agora,
+                    agora,
+                    resp.headers.get("ETag"),
+                    resp.headers.get("Last-Modified"),
+                    len(corpo),
+                ),
+            )
+            self._tamanho_total += len(corpo) - (anterior[0] if anterior else 0)
+            self._remover_excesso()
+            self._conn.commit()
+
+    def _remover_excesso(self):
+        """Remove as entradas menos usadas até caber no limite (chamar com a trava)."""
+        while self._tamanho_total > self.tamanho_maximo:
+            removidas = self._conn.execute(
+                "SELECT url, tamanho FROM respostas ORDER BY ultimo_acesso LIMIT 100"
+            ).fetchall()
+            if not removidas:
+                break
+            for url, tamanho in removidas:
+                self._conn.execute("DELETE FROM respostas WHERE url = ?", (url,))
+                self._tamanho_total -= tamanho
+                if self._tamanho_total <= self.tamanho_maximo:
+                    break
+
+    def get(self, sessao, url, params=None, **kwargs):
+        """
+        GET com cache. Retorna (status, corpo em bytes); corpo é None se não for 200.
+        """
+        chave = self.montar_chave(url, params)
+        registro = self._ler(chave)
+
+        if registro is not None:
+            corpo, buscado_em, etag, last_modified = registro
+            if time.time() - buscado_em < self.ttl:
+                self._tocar(chave)
+                return 200, corpo
+
+            cabecalhos = {}
+            if etag:
+                cabecalhos["If-None-Match"] = etag
+            if last_modified:
+                cabecalhos["If-Modified-Since"] = last_modified
+            resp = sessao.get(chave, headers=cabecalhos, **kwargs)
+            if resp.status_code == 304:
+                self._tocar(chave, renovar=True)
+                return 200, corpo
+        else:
+            resp = sessao.get(chave, **kwargs)
+
+        if resp.status_code != 200:
+            return resp.status_code, None
+
+        self._gravar(chave, resp)
+        return 200, resp.content
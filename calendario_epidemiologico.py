@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+# Fronteiras conhecidas do calendário epidemiológico (data -> semana AAAASS),
+# incluindo os anos com SE 53 (2008, 2014, 2020 e 2025)
+SEMANAS_CONHECIDAS = {
+    "2007-12-29": 200752,
+    "2007-12-30": 200801,
+    "2008-12-28": 200853,
+    "2009-01-03": 200853,
+    "2009-01-04": 200901,
+    "2013-12-29": 201401,
+    "2014-12-28": 201453,
+    "2015-01-03": 201453,
+    "2015-01-04": 201501,
+    "2019-12-29": 202001,
+    "2021-01-02": 202053,
+    "2021-01-03": 202101,
+    "2024-12-28": 202452,
+    "2024-12-29": 202501,
+    "2025-12-28": 202553,
+    "2026-01-03": 202553,
+    "2026-01-04": 202601,
+}
+
+
+# ============================
+# SEMANAS EPIDEMIOLÓGICAS
+# ============================
+
+
+def semana_epidemiologica(datas):
+    """
+    Semana epidemiológica (AAAASS) de cada data. A semana vai de domingo a
+    sábado e a SE 1 é a primeira com ao menos 4 dias em janeiro: o ano e o
+    número saem da quarta-feira da semana (não é a ISO deslocada um dia).
+    """
+    datas = pd.to_datetime(datas, errors="coerce").dt.normalize()
+    domingo = datas - pd.to_timedelta((datas.dt.weekday + 1) % 7, unit="D")
+    quarta = domingo + pd.Timedelta(days=3)
+    semana = (quarta.dt.dayofyear - 1) // 7 + 1
+    return (quarta.dt.year * 100 + semana).astype("Int32")
+
+
+def conferir_semanas(conhecidas=SEMANAS_CONHECIDAS):
+    """Confere semana_epidemiologica contra fronteiras conhecidas do calendário."""
+    datas = pd.Series(list(conhecidas))
+    obtidas = semana_epidemiologica(datas)
+    erradas = [
+        f"{data}: {obtida} (esperada {esperada})"
+        for data, obtida, esperada in zip(datas, obtidas, conhecidas.values())
+        if obtida != esperada
+    ]
+    if erradas:
+        raise ValueError("Calendário epidemiológico divergente: " + "; ".join(erradas))
+
+
+def inicio_semana(codigo):
+    """
+    Domingo que abre a semana epidemiológica AAAASS (None se ela não
+    existir, ex.: SE 53 num ano de 52 semanas). A SE 1 é a semana de
+    domingo a sábado que contém o dia 4 de janeiro.
+    """
+    ano, numero = divmod(int(codigo), 100)
+    if not 1 <= numero <= 53:
+        return None
+    quatro_janeiro = date(ano, 1, 4)
+    domingo = quatro_janeiro - timedelta(days=(quatro_janeiro.weekday() + 1) % 7)
+    domingo += timedelta(weeks=numero - 1)
+    # A SE 53 só existe se a quarta-feira dela ainda cai no mesmo ano
+    if (domingo + timedelta(days=3)).year != ano:
+        return None
+    return domingo
+
+
+def semanas_entre(primeira, ultima):
+    """Códigos AAAASS consecutivos de `primeira` a `ultima` (inclusive)."""
+    datas = pd.Series(
+        pd.date_range(inicio_semana(primeira), inicio_semana(ultima), freq="7D")
+    )
+    return semana_epidemiologica(datas).to_numpy(dtype="int32")
@@ -0,0 +1,133 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from resiliencia import (
+    ErroConfiguracao,
+    ErroCota,
+    ErroFatal,
+    ErroPermanente,
+    ErroTransitorio,
+    classificar_excecao,
+)
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+# Modo de operação, escolhido por variável de ambiente:
+#   MODO_CASSETE=gravar      -> chama os serviços e grava cada resposta
+#   MODO_CASSETE=reproduzir  -> responde só com o que foi gravado (sem rede)
+#   (vazio)                  -> desligado
+MODO = os.environ.get("MODO_CASSETE", "").strip().lower()
+ARQUIVO_CASSETE = os.environ.get("ARQUIVO_CASSETE", "cassete.sqlite")
+
+# Na reprodução, espera a latência gravada (útil para medir o pipeline)
+REPRODUZIR_LATENCIA = os.environ.get("REPRODUZIR_LATENCIA", "") not in ("", "0")
+
+GRAVAR = "gravar"
+REPRODUZIR = "reproduzir"
+
+_CLASSES_ERRO = {
+    c.__name__: c
+    for c in (ErroTransitorio, ErroPermanente, ErroCota, ErroConfiguracao)
+}
+
+
+class GravacaoAusente(ErroFatal, LookupError):
+    """
+    Requisição sem gravação correspondente no modo de reprodução.
+
+    A reprodução é hermética: uma gravação faltando interrompe a execução em
+    vez de virar "não encontrado" (ou ir à rede).
+    """
+
+
+_conn = None
+_trava = threading.Lock()
+
+
+def reproduzindo():
+    """Modo de reprodução ligado (os caches de produção não devem ser gravados)."""
+    return MODO == REPRODUZIR
+
+
+def _conexao():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(ARQUIVO_CASSETE, check_same_thread=False)
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS interacoes (
+                servico TEXT NOT NULL,
+                chave TEXT NOT NULL,
+                resposta BLOB NOT NULL,
+                latencia REAL NOT NULL,
+                PRIMARY KEY (servico, chave)
+            )
+            """
+        )
+        _conn.commit()
+    return _conn
+
+
+def _gravar(servico, chave, registro, latencia):
+    dados = zlib.compress(json.dumps(registro, ensure_ascii=False).encode("utf-8"))
+    with _trava:
+        conn = _conexao()
+        conn.execute(
+            "INSERT OR REPLACE INTO interacoes VALUES (?, ?, ?, ?)",
+            (servico, chave, dados, latencia),
+        )
+        conn.commit()
+
+
+def _ler(servico, chave):
+    with _trava:
+        linha = (
+            _conexao()
+            .execute(
+                "SELECT resposta, latencia FROM interacoes WHERE servico = ? AND chave = ?",
+                (servico, chave),
+            )
+            .fetchone()
+        )
+    if linha is None:
+        return None, None
+    return json.loads(zlib.decompress(linha[0])), linha[1]
+
+
+def interceptar(servico, chave, funcao, *args, **kwargs):
+    """
+    Passa a chamada `funcao(*args, **kwargs)` pelo cassete.
+
+    `chave` identifica a requisição (ex.: URL ou consulta normalizada) e o
+    resultado precisa ser serializável em JSON. Erros também são gravados,
+    já classificados, e reaparecem iguais na reprodução.
+    """
+    if MODO == REPRODUZIR:
+        registro, latencia = _ler(servico, chave)
+        if registro is None:
+            raise GravacaoAusente(f"Sem gravação para {servico}: {chave}")
+        if REPRODUZIR_LATENCIA:
+            time.sleep(latencia)
+        if "erro" in registro:
+            classe = _CLASSES_ERRO.get(registro["erro"], ErroPermanente)
+            raise classe(registro["mensagem"], servico=servico)
+        return registro["resultado"]
+
+    if MODO != GRAVAR:
+        return funcao(*args, **kwargs)
+
+    inicio = time.perf_counter()
+    try:
+        resultado = funcao(*args, **kwargs)
+    except Exception as exc:
+        registro = {"erro": classificar_excecao(exc).__name__, "mensagem": str(exc)}
+        _gravar(servico, chave, registro, time.perf_counter() - inicio)
+        raise
+    _gravar(servico, chave, {"resultado": resultado}, time.perf_counter() - inicio)
+    return resultado
@@ -0,0 +1,184 @@
+import argparse
+import glob
+import os
+
+import pandas as pd
+
+from arquivos import salvar_csv_atomico
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+PASTA_TRATADOS = "Dados_Tratados"
+ARQUIVO_DIM = os.path.join(PASTA_TRATADOS, "Dim_Unidades_Saude.csv")
+
+# Versão atual de cada linha da dimensão (hash do conteúdo)
+ARQUIVO_VERSOES = os.path.join(PASTA_TRATADOS, "versoes_dim_unidades.csv")
+
+# Feed de alterações: um arquivo por execução que mudou alguma linha
+PASTA_DELTAS = os.path.join(PASTA_TRATADOS, "cdc_dim_unidades")
+
+INSERIDO = "I"
+ATUALIZADO = "U"
+REMOVIDO = "D"
+
+COLUNAS_VERSOES = ["CNES", "Hash", "Versao", "Sequencia", "Removido"]
+
+
+# ============================
+# FUNÇÕES
+# ============================
+
+
+def hash_linhas(df):
+    """Hash hexadecimal do conteúdo completo de cada linha (todas as colunas, como texto)."""
+    texto = df.astype("string").fillna("")
+    return pd.util.hash_pandas_object(texto, index=False).map("{:016x}".format)
+
+
+def carregar_versoes(arquivo=ARQUIVO_VERSOES):
+    if os.path.exists(arquivo):
+        return pd.read_csv(
+            arquivo,
+            sep=";",
+            dtype={"CNES": str, "Hash": str},
+            keep_default_na=False,
+        )
+    return pd.DataFrame(columns=COLUNAS_VERSOES)
+
+
+def ultima_sequencia(versoes):
+    if versoes.empty:
+        return 0
+    return int(pd.to_numeric(versoes["Sequencia"]).max())
+
+
+def registrar_alteracoes(df_dim, arquivo_versoes=ARQUIVO_VERSOES, pasta_deltas=PASTA_DELTAS):
+    """
+    Compara a dimensão recém-gravada com as versões conhecidas e grava no
+    feed só as linhas inseridas (I), alteradas (U) ou removidas (D).
+
+    Cada execução com alteração ganha o próximo número de sequência e um
+    arquivo delta_<sequencia>.csv. Retorna (sequencia, contagem por operação)
+    ou (None, {}) quando nada mudou.
+    """
+    df_dim = df_dim.drop_duplicates(subset=["CNES"], keep="last").reset_index(drop=True)
+    atuais = pd.DataFrame({"CNES": df_dim["CNES"].astype(str), "Hash": hash_linhas(df_dim)})
+
+    versoes = carregar_versoes(arquivo_versoes)
+    ativas = versoes[versoes["Removido"].astype(str) != "1"].set_index("CNES")
+    anteriores = versoes.set_index("CNES")
+
+    hash_anterior = atuais["CNES"].map(ativas["Hash"])
+    mask_inserido = hash_anterior.isna()
+    mask_atualizado = hash_anterior.notna() & (hash_anterior != atuais["Hash"])
+    removidos = ativas.index.difference(pd.Index(atuais["CNES"]))
+
+    if not (mask_inserido.any() or mask_atualizado.any() or len(removidos)):
+        return None, {}
+
+    sequencia = ultima_sequencia(versoes) + 1
+
+    # Nova versão de cada linha tocada (reinserção continua a numeração antiga)
+    versao_anterior = pd.to_numeric(
+        atuais["CNES"].map(anteriores["Versao"]), errors="coerce"
+    ).fillna(0).astype("int64")
+    mask_tocado = mask_inserido | mask_atualizado
+
+    operacoes = pd.Series(ATUALIZADO, index=atuais.index)
+    operacoes[mask_inserido] = INSERIDO
+
+    df_feed = df_dim[mask_tocado].copy()
+    df_feed.insert(0, "Operacao", operacoes[mask_tocado])
+    df_feed.insert(1, "Versao", versao_anterior[mask_tocado] + 1)
+    df_feed.insert(0, "Sequencia", sequencia)
+
+    if len(removidos):
+        df_removidos = pd.DataFrame(
+            {
+                "Sequencia": sequencia,
+                "Operacao": REMOVIDO,
+                "Versao": pd.to_numeric(ativas.loc[removidos, "Versao"]).to_numpy() + 1,
+                "CNES": removidos,
+            }
+        )
+        df_feed = pd.concat([df_feed, df_removidos], ignore_index=True)
+
+    os.makedirs(pasta_deltas, exist_ok=True)
+    salvar_csv_atomico(
+        df_feed,
+        os.path.join(pasta_deltas, f"delta_{sequencia:06d}.csv"),
+        sep=";",
+        index=False,
+    )
+
+    # Atualiza as versões (removidos ficam como lápide para manter a numeração)
+    novas = atuais[mask_tocado].assign(
+        Versao=(versao_anterior[mask_tocado] + 1).to_numpy(),
+        Sequencia=sequencia,
+        Removido=0,
+    )
+    lapides = pd.DataFrame(
+        {
+            "CNES": removidos,
+            "Hash": ativas.loc[removidos, "Hash"].to_numpy(),
+            "Versao": pd.to_numeric(ativas.loc[removidos, "Versao"]).to_numpy() + 1,
+            "Sequencia": sequencia,
+            "Removido": 1,
+        }
+    )
+    versoes = pd.concat([versoes, novas, lapides], ignore_index=True)
+    versoes = versoes.drop_duplicates(subset=["CNES"], keep="last")
+    salvar_csv_atomico(versoes[COLUNAS_VERSOES], arquivo_versoes, sep=";", index=False)
+
+    contagem = df_feed["Operacao"].value_counts().to_dict()
+    return sequencia, contagem
+
+
+def registrar_e_informar(df_dim):
+    """Registra as alterações da dimensão e imprime o resumo (usado pelos scripts que a gravam)."""
+    sequencia, contagem = registrar_alteracoes(df_dim)
+    if sequencia is None:
+        print("   📭 CDC: nenhuma linha da dimensão mudou.")
+        return
+    resumo = ", ".join(f"{op}={qtd}" for op, qtd in sorted(contagem.items()))
+    print(f"   📨 CDC: sequência {sequencia} ({resumo}).")
+
+
+def ler_alteracoes(desde=0, pasta_deltas=PASTA_DELTAS):
+    """
+    Junta os deltas com sequência maior que `desde`, mantendo só a última
+    operação de cada CNES (o que um consumidor atrasado precisa aplicar).
+    """
+    arquivos = sorted(glob.glob(os.path.join(pasta_deltas, "delta_*.csv")))
+    lista = [
+        pd.read_csv(arquivo, sep=";", dtype=str)
+        for arquivo in arquivos
+        if int(os.path.basename(arquivo)[6:-4]) > desde
+    ]
+    if not lista:
+        return pd.DataFrame(columns=["Sequencia", "Operacao", "Versao", "CNES"])
+    df = pd.concat(lista, ignore_index=True)
+    return df.drop_duplicates(subset=["CNES"], keep="last").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Feed de alterações (CDC) da Dim_Unidades_Saude."
+    )
+    parser.add_argument(
+        "--desde",
+        type=int,
+        help="Em vez de registrar, exporta as alterações após esta sequência",
+    )
+    parser.add_argument("--saida", default="alteracoes_dim_unidades.csv")
+    args = parser.parse_args()
+
+    if args.desde is not None:
+        df_alteracoes = ler_alteracoes(args.desde)
+        df_alteracoes.to_csv(args.saida, sep=";", index=False)
+        print(f"✅ {len(df_alteracoes)} alterações após a sequência {args.desde} em '{args.saida}'")
+    else:
+        # Registro manual (ex.: depois de editar a dimensão fora do pipeline)
+        registrar_e_informar(pd.read_csv(ARQUIVO_DIM, sep=";", dtype=str))
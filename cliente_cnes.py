@@ -0,0 +1,304 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import cassete
+from cache_http import CacheHTTP
+from resiliencia import chamar_com_resiliencia, classe_para_status
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+# Endpoint de estabelecimentos da API de dados abertos do CNES
+# (pode ser trocado por variável de ambiente, ex.: servidor local de testes)
+CNES_API = os.environ.get(
+    "CNES_API", "https://apidadosabertos.saude.gov.br/cnes/estabelecimentos"
+).rstrip("/")
+
+# Índice local de estabelecimentos (um JSON por linha, chave = codigo_cnes)
+ARQUIVO_INDICE = "indice_estabelecimentos_cnes.jsonl"
+
+# Municípios/UFs já baixados em lote (JSON: "municipio:280030"/"uf:28" -> data)
+ARQUIVO_CARGAS = "cargas_lote_cnes.json"
+
+# Paginação da listagem em lote
+TAMANHO_PAGINA = 20
+TRABALHADORES = 8
+
+TIMEOUT = 30
+
+# Cache em disco das respostas HTTP (TTL em segundos, tamanho em bytes)
+ARQUIVO_CACHE_HTTP = "cache_http_cnes.sqlite"
+TTL_CACHE_HTTP = 30 * 24 * 3600
+TAMANHO_MAXIMO_CACHE_HTTP = 200 * 1024 * 1024
+
+_sessao = requests.Session()
+_cache_http = None
+_trava_cache_http = threading.Lock()
+_indice = None
+_trava_indice = threading.Lock()
+
+
+# ============================
+# ÍNDICE LOCAL
+# ============================
+
+
+def _chave_cnes(cnes):
+    return str(int(float(cnes)))
+
+
+def carregar_indice():
+    """Carrega o índice local em memória (dict CNES -> registro da API)."""
+    global _indice
+    if _indice is not None:
+        return _indice
+
+    _indice = {}
+    if os.path.exists(ARQUIVO_INDICE):
+        with open(ARQUIVO_INDICE, encoding="utf-8") as f:
+            for linha in f:
+                if linha.strip():
+                    est = json.loads(linha)
+                    _indice[_chave_cnes(est["codigo_cnes"])] = est
+    return _indice
+
+
+def _expirado(est):
+    """Registro do índice mais antigo que o TTL do cache HTTP."""
+    return time.time() - est.get("_atualizado_em", 0) >= TTL_CACHE_HTTP
+
+
+def salvar_no_indice(estabelecimentos):
+    """
+    Adiciona registros ao índice em memória e ao arquivo (append).
+
+    No modo de reprodução do cassete o arquivo não é tocado (só a memória).
+    """
+    indice = carregar_indice()
+    agora = time.time()
+    with _trava_indice:
+        for est in estabelecimentos:
+            est["_atualizado_em"] = agora
+            indice[_chave_cnes(est["codigo_cnes"])] = est
+        if cassete.reproduzindo():
+            return
+        with open(ARQUIVO_INDICE, "a", encoding="utf-8") as f:
+            for est in estabelecimentos:
+                f.write(json.dumps(est, ensure_ascii=False) + "\n")
+
+
+def compactar_indice():
+    """Regrava o índice com um registro por CNES (o mais recente)."""
+    if cassete.reproduzindo():
+        return
+    indice = carregar_indice()
+    caminho_tmp = ARQUIVO_INDICE + ".tmp"
+    with _trava_indice:
+        with open(caminho_tmp, "w", encoding="utf-8") as f:
+            for est in indice.values():
+                f.write(json.dumps(est, ensure_ascii=False) + "\n")
+        os.replace(caminho_tmp, ARQUIVO_INDICE)
+
+
+def carregar_cargas():
+    """Dict filtro -> instante (epoch) da última carga em lote completa."""
+    if not os.path.exists(ARQUIVO_CARGAS):
+        return {}
+    with open(ARQUIVO_CARGAS, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def registrar_cargas(chaves):
+    """Marca os filtros como baixados em lote agora."""
+    if cassete.reproduzindo():
+        return
+    cargas = carregar_cargas()
+    agora = time.time()
+    cargas.update({chave: agora for chave in chaves})
+    caminho_tmp = ARQUIVO_CARGAS + ".tmp"
+    with _trava_indice:
+        with open(caminho_tmp, "w", encoding="utf-8") as f:
+            json.dump(cargas, f, indent=1, sort_keys=True)
+        os.replace(caminho_tmp, ARQUIVO_CARGAS)
+
+
+# ============================
+# CONSULTAS À API
+# ============================
+
+
+def _obter_cache_http():
+    """Abre o cache HTTP na primeira requisição (importar o módulo não cria o arquivo)."""
+    global _cache_http
+    with _trava_cache_http:
+        if _cache_http is None:
+            _cache_http = CacheHTTP(
+                ARQUIVO_CACHE_HTTP,
+                ttl=TTL_CACHE_HTTP,
+                tamanho_maximo=TAMANHO_MAXIMO_CACHE_HTTP,
+            )
+        return _cache_http
+
+
+def _baixar(url, params=None):
+    status, corpo = _obter_cache_http().get(
+        _sessao, url, params=params, timeout=TIMEOUT
+    )
+    return [status, corpo.decode("utf-8") if corpo is not None else None]
+
+
+def _requisitar(url, params=None):
+    # Passa pelo cassete (gravação/reprodução) antes de ir ao cache HTTP e à rede
+    status, corpo = cassete.interceptar(
+        "cnes", CacheHTTP.montar_chave(url, params), _baixar, url, params=params
+    )
+    if status == 200:
+        return corpo
+    if status == 404:
+        # "Não encontrado" é uma resposta válida, não uma falha
+        return None
+    raise classe_para_status(status)(f"CNES HTTP {status}: {url}", servico="cnes")
+
+
+def _get_json(url, params=None):
+    """
+    GET na API do CNES (via cache HTTP, com retentativas e disjuntor).
+
+    Retorna o JSON ou None se não encontrado; falhas do serviço sobem como
+    ErroExterno para não virarem "não encontrado" nos caches.
+    """
+    corpo = chamar_com_resiliencia("cnes", _requisitar, url, params=params)
+    if corpo is None:
+        return None
+    return json.loads(corpo)
+
+
+def obter_estabelecimento(cnes):
+    """
+    Retorna o registro bruto do estabelecimento (dict da API).
+
+    Consulta primeiro o índice local; só vai à API (passando pelo cache HTTP)
+    se o CNES não estiver lá ou se o registro já passou do TTL.
+    """
+    chave = _chave_cnes(cnes)
+    indice = carregar_indice()
+    if chave in indice and not _expirado(indice[chave]):
+        return indice[chave]
+
+    est = _get_json(f"{CNES_API}/{chave}")
+    if not est:
+        return None
+    salvar_no_indice([est])
+    return est
+
+
+def _baixar_pagina(filtro, offset, tamanho_pagina):
+    params = dict(filtro, limit=tamanho_pagina, offset=offset)
+    dados = _get_json(CNES_API, params=params) or {}
+    return dados.get("estabelecimentos", [])
+
+
+def baixar_estabelecimentos(
+    municipios=(), ufs=(), tamanho_pagina=TAMANHO_PAGINA, trabalhadores=TRABALHADORES
+):
+    """
+    Baixa em lote todos os estabelecimentos dos municípios/UFs informados.
+
+    As páginas de cada filtro são pedidas em ondas concorrentes (uma página
+    por trabalhador) até aparecer uma página incompleta. Os registros vão
+    para o índice local e a quantidade baixada é retornada.
+    """
+    filtros = [{"codigo_municipio": str(m)[:6]} for m in municipios]
+    filtros += [{"codigo_uf": str(int(u))} for u in ufs]
+
+    total = 0
+    proximo_offset = {i: 0 for i in range(len(filtros))}
+
+    with ThreadPoolExecutor(max_workers=trabalhadores) as pool:
+        while proximo_offset:
+            tarefas = {}
+            for i, offset in proximo_offset.items():
+                for k in range(trabalhadores):
+                    pos = offset + k * tamanho_pagina
+                    tarefas[(i, pos)] = pool.submit(
+                        _baixar_pagina, filtros[i], pos, tamanho_pagina
+                    )
+
+            concluidos = set()
+            for (i, pos), tarefa in tarefas.items():
+                pagina = tarefa.result()
+                if pagina:
+                    salvar_no_indice(pagina)
+                    total += len(pagina)
+                if len(pagina) < tamanho_pagina:
+                    concluidos.add(i)
+
+            proximo_offset = {
+                i: offset + trabalhadores * tamanho_pagina
+                for i, offset in proximo_offset.items()
+                if i not in concluidos
+            }
+
+    compactar_indice()
+    # Só chega aqui se todas as páginas vieram: a carga de cada filtro está completa
+    registrar_cargas(
+        [f"municipio:{m}" for m in dict.fromkeys(str(m)[:6] for m in municipios)]
+        + [f"uf:{int(u)}" for u in ufs]
+    )
+    return total
+
+
+def garantir_municipios(municipios):
+    """
+    Baixa em lote apenas os municípios sem carga em lote (ou com carga vencida).
+
+    Registros avulsos do índice (consultas por CNES) não contam: só a carga
+    completa do município, ou da sua UF, dispensa um novo download.
+    """
+    cargas = carregar_cargas()
+    agora = time.time()
+
+    def carregado(chave):
+        return agora - cargas.get(chave, 0) < TTL_CACHE_HTTP
+
+    faltantes = list(
+        dict.fromkeys(
+            str(m)[:6]
+            for m in municipios
+            if not carregado(f"municipio:{str(m)[:6]}")
+            and not carregado(f"uf:{str(m)[:2]}")
+        )
+    )
+    if not faltantes:
+        return 0
+
+    print(f"Baixando estabelecimentos de {len(faltantes)} município(s) do CNES...")
+    total = baixar_estabelecimentos(municipios=faltantes)
+    print(f"{total} estabelecimentos adicionados ao índice local.")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Baixa em lote estabelecimentos do CNES para o índice local."
+    )
+    parser.add_argument("--municipios", nargs="*", default=[], help="Códigos IBGE")
+    parser.add_argument("--ufs", nargs="*", default=[], help="Códigos de UF")
+    parser.add_argument("--tamanho-pagina", type=int, default=TAMANHO_PAGINA)
+    parser.add_argument("--trabalhadores", type=int, default=TRABALHADORES)
+    args = parser.parse_args()
+
+    qtd = baixar_estabelecimentos(
+        municipios=args.municipios,
+        ufs=args.ufs,
+        tamanho_pagina=args.tamanho_pagina,
+        trabalhadores=args.trabalhadores,
+    )
+    print(f"✅ {qtd} estabelecimentos baixados. Índice: {ARQUIVO_INDICE}")
@@ -0,0 +1,62 @@
+import json
+import os
+import threading
+
+import googlemaps
+
+import cassete
+from coalescencia import Coalescedor, normalizar_consulta
+from resiliencia import chamar_com_resiliencia
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+# Chave padrão (os scripts também podem passar a sua)
+GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY", "preencher")
+
+_clientes = {}
+_trava_clientes = threading.Lock()
+
+# Consultas idênticas em andamento compartilham uma única requisição
+_coalescedor = Coalescedor()
+
+
+def obter_cliente(chave=GOOGLE_API_KEY):
+    """Cliente googlemaps para a chave informada (um por chave)."""
+    with _trava_clientes:
+        if chave not in _clientes:
+            # Cota estourada deve chegar na hora à camada de resiliência,
+            # em vez de ficar 60s em retentativas internas do cliente
+            _clientes[chave] = googlemaps.Client(
+                key=chave, retry_over_query_limit=False
+            )
+        return _clientes[chave]
+
+
+def geocodificar(query, chave=GOOGLE_API_KEY, **kwargs):
+    """
+    Geocodifica no Google com retentativas e disjuntor.
+
+    Chamadas concorrentes com a mesma consulta normalizada (e os mesmos
+    parâmetros) esperam uma única requisição. Retorna a lista de resultados
+    da API (vazia se nada foi achado) ou levanta ErroExterno (transitório,
+    permanente ou cota).
+    """
+    chave_consulta = (normalizar_consulta(query), tuple(sorted(kwargs.items())))
+    return _coalescedor.executar(
+        chave_consulta, chamar_com_resiliencia, "google", _geocode, chave, query, **kwargs
+    )
+
+
+def _geocode(chave, query, **kwargs):
+    """Chamada crua à API, passando pelo cassete (gravação/reprodução)."""
+    chave_cassete = json.dumps(
+        [normalizar_consulta(query), sorted(kwargs.items())], ensure_ascii=False
+    )
+    # Na reprodução o cliente nem é criado (a chave pode ser um placeholder)
+    return cassete.interceptar(
+        "google",
+        chave_cassete,
+        lambda: obter_cliente(chave).geocode(query, **kwargs),
+    )
@@ -0,0 +1,695 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from arquivos import salvar_csv_atomico
+from base_coordenadas import abrir_base, chave_cnes
+from coordenadas import RAIO_TERRA_KM, distancia_km
+from incidencia import assinatura_arquivo
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+PASTA_TRATADOS = "Dados_Tratados"
+ARQUIVO_FATO = os.path.join(PASTA_TRATADOS, "Fato_Dengue_Consolidada.csv")
+ARQUIVO_DIM = os.path.join(PASTA_TRATADOS, "Dim_Unidades_Saude.csv")
+
+# Estado entre execuções (nós já agrupados)
+ARQUIVO_ESTADO = os.path.join(PASTA_TRATADOS, "estado_clusters.bin")
+
+# Saídas para o BI
+ARQUIVO_NOS = os.path.join(PASTA_TRATADOS, "Cluster_Unidade_Dia.csv")
+ARQUIVO_RESUMO = os.path.join(PASTA_TRATADOS, "Resumo_Clusters.csv")
+
+# Layout do arquivo:
+#   cabeçalho: ASSINATURA (8 bytes) + quantidade de nós, próximo ID de cluster,
+#              tamanho/mtime da fato, raio (m), janela (dias) e mínimo (uint64 cada)
+#   CNES int64[n] | dia int32[n] | notificações int32[n] | núcleo uint8[n]
+#   | cluster int64[n]
+ASSINATURA = b"CLUSTST1"
+TAMANHO_CABECALHO = 64
+
+TAMANHO_BLOCO = 1_000_000
+MAXIMO_PARCIAIS = 20
+
+# ST-DBSCAN sobre nós (unidade, dia) pesados pelo número de notificações: um
+# nó é núcleo quando a vizinhança (RAIO_KM e JANELA_DIAS) soma ao menos
+# MINIMO_NOTIFICACOES
+RAIO_KM = 1.0
+JANELA_DIAS = 7
+MINIMO_NOTIFICACOES = 10
+
+# Dias mais recentes reagrupados a cada execução (notificação atrasada)
+REABERTURA_DIAS = 28
+
+# Dias agrupados por vez (limita as matrizes local × dia)
+FATIA_DIAS = 91
+
+# Pares por lote na busca de vizinhos (limita a memória)
+MAXIMO_PARES = 5_000_000
+
+RUIDO = -1
+EPOCA = pd.Timestamp("1970-01-01")
+KM_POR_GRAU = RAIO_TERRA_KM * np.pi / 180
+
+# Vizinhas na grade espacial: metade das 8 células ao redor, para cada par de
+# células ser visitado uma vez só; a própria célula é tratada à parte
+DESLOCAMENTOS = [
+    (dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) > (0, 0)
+]
+
+
+# ============================
+# VIZINHANÇA EM GRADE
+# ============================
+
+
+def _expandir(inicio, quantidade, limite=MAXIMO_PARES):
+    """
+    Expande intervalos [inicio, inicio + quantidade) em lotes de até `limite`
+    elementos. Gera (dono, posição): o intervalo de origem e a posição.
+    """
+    acumulado = np.cumsum(quantidade)
+    a = 0
+    while a < len(quantidade):
+        base = acumulado[a - 1] if a else 0
+        b = max(int(np.searchsorted(acumulado, base + limite, "right")), a + 1)
+        qtd = quantidade[a:b]
+        total = int(qtd.sum())
+        if total:
+            dono = np.repeat(np.arange(a, b), qtd)
+            salto = np.repeat(inicio[a:b] - (np.cumsum(qtd) - qtd), qtd)
+            yield dono, salto + np.arange(total)
+        a = b
+
+
+def pares_proximos(lat, lon, raio_km=RAIO_KM):
+    """
+    Pares (i, j), i < j, de pontos a até raio_km (haversine), em lotes.
+
+    Os pontos vão para uma grade uniforme de raio_km (a longitude alargada
+    pelo cosseno da maior latitude, para nunca perder vizinho) e só células
+    adjacentes são comparadas.
+    """
+    n = len(lat)
+    if n == 0:
+        return
+    tamanho_lat = raio_km / KM_POR_GRAU
+    tamanho_lon = tamanho_lat / np.cos(np.radians(min(np.abs(lat).max(), 89.0)))
+    cx = np.floor(lon / tamanho_lon).astype("int64")
+    cy = np.floor(lat / tamanho_lat).astype("int64")
+    # Margem de uma célula em cada ponta: os deslocamentos não saem da grade
+    cx -= cx.min() - 1
+    cy -= cy.min() - 1
+    ny = int(cy.max()) + 2
+
+    chave = cx * ny + cy
+    ordem = np.argsort(chave, kind="stable")
+    chave, cx, cy = chave[ordem], cx[ordem], cy[ordem]
+    lat_o, lon_o = lat[ordem], lon[ordem]
+    celulas, inicio = np.unique(chave, return_index=True)
+    fim = np.append(inicio[1:], n)
+
+    for dx, dy in [(0, 0), *DESLOCAMENTOS]:
+        if (dx, dy) == (0, 0):
+            # Na própria célula, só os pontos depois de cada um
+            primeiro = np.arange(1, n + 1)
+            quantidade = fim[np.searchsorted(celulas, chave)] - primeiro
+        else:
+            alvo = (cx + dx) * ny + (cy + dy)
+            pos = np.minimum(np.searchsorted(celulas, alvo), len(celulas) - 1)
+            achou = celulas[pos] == alvo
+            primeiro = np.where(achou, inicio[pos], 0)
+            quantidade = np.where(achou, fim[pos] - inicio[pos], 0)
+        for i, j in _expandir(primeiro, quantidade):
+            perto = distancia_km(lat_o[i], lon_o[i], lat_o[j], lon_o[j]) <= raio_km
+            yield ordem[i[perto]], ordem[j[perto]]
+
+
+# ============================
+# ST-DBSCAN COM UNION-FIND
+# ============================
+
+
+def _comprimir(pai):
+    """Aponta cada elemento direto para a raiz (saltos dobrados)."""
+    while True:
+        avo = pai[pai]
+        if np.array_equal(avo, pai):
+            return pai
+        pai[:] = avo
+
+
+def _unir(pai, a, b):
+    """União vetorizada: a raiz maior passa a apontar para a menor."""
+    while len(a):
+        _comprimir(pai)
+        ra, rb = pai[a], pai[b]
+        diferente = ra != rb
+        if not diferente.any():
+            return
+        a, b, ra, rb = a[diferente], b[diferente], ra[diferente], rb[diferente]
+        np.minimum.at(pai, np.maximum(ra, rb), np.minimum(ra, rb))
+
+
+def agrupar(
+    lat,
+    lon,
+    dia,
+    peso,
+    raio_km=RAIO_KM,
+    janela_dias=JANELA_DIAS,
+    minimo=MINIMO_NOTIFICACOES,
+    nucleo_fixo=None,
+):
+    """
+    ST-DBSCAN pesado. Retorna (núcleo, componente): a máscara de núcleos e,
+    para cada ponto, um inteiro que identifica o seu grupo (RUIDO se nenhum).
+
+    O espaço é resolvido uma vez, entre locais distintos (grade uniforme); o
+    tempo, com janelas deslizantes sobre matrizes local × dia (somas
+    acumuladas do peso e o próximo núcleo de cada dia). Assim o custo cresce
+    com nós × locais vizinhos, e não com pares de nós.
+
+    Núcleos vizinhos são unidos num union-find; cada ponto de borda vai para
+    o grupo de um núcleo vizinho. `nucleo_fixo` (0/1, ou -1 para calcular)
+    preserva a condição de pontos cuja vizinhança não está inteira no lote.
+    """
+    lat, lon = np.asarray(lat, dtype="float64"), np.asarray(lon, dtype="float64")
+    dia, peso = np.asarray(dia, dtype="int64"), np.asarray(peso, dtype="int64")
+    n = len(lat)
+    if n == 0:
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype="int64")
+
+    # Locais distintos e nós ordenados por (local, dia). Na matriz local × dia
+    # sobra uma janela de cada lado, para as janelas nunca saírem da linha
+    locais, local = np.unique(np.column_stack([lat, lon]), axis=0, return_inverse=True)
+    local = local.ravel()
+    ordem = np.lexsort((dia, local))
+    dia_o = dia[ordem] - dia.min() + janela_dias + 1
+    largura = int(dia_o.max()) + janela_dias + 2
+    celula = local[ordem] * largura + dia_o
+    inicio_local = np.searchsorted(local[ordem], np.arange(len(locais)))
+    nos_local = np.bincount(local, minlength=len(locais))
+
+    # Cada local é vizinho de si mesmo e dos locais a até raio_km
+    origem, destino = [np.arange(len(locais))], [np.arange(len(locais))]
+    for i, j in pares_proximos(locais[:, 0], locais[:, 1], raio_km):
+        origem += [i, j]
+        destino += [j, i]
+    origem, destino = np.concatenate(origem), np.concatenate(destino)
+
+    def janelas():
+        """(nó, célula do primeiro dia e do dia seguinte ao último da janela)."""
+        for par, k in _expandir(inicio_local[origem], nos_local[origem]):
+            base = destino[par] * largura + dia_o[k]
+            yield k, base - janela_dias, base + janela_dias + 1
+
+    # Peso acumulado por local ao longo dos dias (o índice seguinte ao último
+    # dia da janela menos o do primeiro dá a soma da janela)
+    acumulado = np.bincount(
+        celula, weights=peso[ordem], minlength=len(locais) * largura
+    )
+    acumulado = np.cumsum(acumulado.reshape(-1, largura), axis=1).ravel()
+    acumulado = np.concatenate([[0], acumulado.astype("int64")])
+    vizinhanca = np.zeros(n, dtype="int64")
+    for k, de, ate in janelas():
+        soma = acumulado[ate] - acumulado[de]
+        vizinhanca += np.bincount(k, weights=soma, minlength=n).astype("int64")
+    del acumulado
+    nucleo = vizinhanca >= minimo
+    if nucleo_fixo is not None:
+        fixo = np.asarray(nucleo_fixo)[ordem]
+        nucleo[fixo >= 0] = fixo[fixo >= 0] == 1
+
+    # Núcleos do mesmo local a até janela_dias um do outro formam uma
+    # sequência já unida; dentro de uma janela só começam poucas sequências
+    nucleos = np.flatnonzero(nucleo)
+    celula_nucleo = celula[nucleos]
+    continua = np.diff(celula_nucleo) <= janela_dias
+    continua &= np.diff(local[ordem][nucleos]) == 0
+    inicio_sequencia = np.concatenate([[True], ~continua])[: len(nucleos)]
+    proxima = np.where(inicio_sequencia, np.arange(len(nucleos)), len(nucleos))
+    proxima = np.minimum.accumulate(proxima[::-1])[::-1]
+    proxima = np.append(proxima[1:], len(nucleos))  # próxima sequência depois de m
+
+    # Primeiro núcleo (posição em `nucleos`) na célula ou depois dela
+    seguinte = np.full(len(locais) * largura + 1, len(nucleos), dtype="int64")
+    seguinte[celula_nucleo[::-1]] = np.arange(len(nucleos))[::-1]
+    seguinte = np.minimum.accumulate(seguinte[::-1])[::-1]
+
+    pai = np.arange(n)
+    _unir(pai, nucleos[:-1][continua], nucleos[1:][continua])
+    nucleo_vizinho = np.full(n, n)
+    for k, de, ate in janelas():
+        m, fim = seguinte[de], seguinte[ate]
+        tem = m < fim
+        k, m, fim = k[tem], m[tem], fim[tem]
+        borda = ~nucleo[k]
+        np.minimum.at(nucleo_vizinho, k[borda], nucleos[m[borda]])
+        k, m, fim = k[~borda], m[~borda], fim[~borda]
+        while len(k):
+            _unir(pai, k, nucleos[m])
+            m = proxima[m]
+            resta = m < fim
+            k, m, fim = k[resta], m[resta], fim[resta]
+
+    _comprimir(pai)
+    componente_o = np.full(n, RUIDO)
+    componente_o[nucleo] = pai[nucleo]
+    borda = ~nucleo & (nucleo_vizinho < n)
+    componente_o[borda] = pai[nucleo_vizinho[borda]]
+
+    nucleo_saida = np.empty(n, dtype=bool)
+    componente = np.empty(n, dtype="int64")
+    nucleo_saida[ordem] = nucleo
+    componente[ordem] = componente_o
+    return nucleo_saida, componente
+
+
+# ============================
+# ENTRADAS E ESTADO
+# ============================
+
+
+def unidades_geocodificadas(arquivo=ARQUIVO_DIM):
+    """
+    Lat/Lon aprovadas na qualidade e município, indexados pelo CNES inteiro,
+    lidos da base binária (recompilada só se a dimensão mudou).
+    """
+    tabela = abrir_base(arquivo).tabela()
+    return tabela.set_index("CNES")[["ID_Municipio", "Lat", "Lon"]]
+
+
+def _reduzir(parciais):
+    return pd.concat(parciais).groupby(level=[0, 1]).sum()
+
+
+def contar_por_unidade_dia(arquivo_fato=ARQUIVO_FATO, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Notificações por (CNES, dia dos primeiros sintomas), em blocos.
+
+    Sem Data_Sintomas (fatos antigas) usa a data de notificação. O dia é
+    contado desde 1970-01-01.
+    """
+    colunas = pd.read_csv(arquivo_fato, sep=";", nrows=0).columns
+    col_data = "Data_Sintomas" if "Data_Sintomas" in colunas else "Data_Notificacao"
+
+    parciais = []
+    for bloco in pd.read_csv(
+        arquivo_fato,
+        sep=";",
+        dtype=str,
+        usecols=["CNES", col_data],
+        chunksize=tamanho_bloco,
+    ):
+        parciais.append(bloco.groupby(["CNES", col_data]).size())
+        if len(parciais) >= MAXIMO_PARCIAIS:
+            parciais = [_reduzir(parciais)]
+    if not parciais:
+        return pd.DataFrame(columns=["CNES", "Dia", "Notificacoes"], dtype="int64")
+
+    contagem = _reduzir(parciais).rename("Notificacoes").reset_index()
+    # Datas convertidas uma vez cada; o código -1 (data nula) cai no NaN final
+    codigos, datas = pd.factorize(contagem[col_data])
+    dias = (pd.to_datetime(pd.Series(datas), errors="coerce") - EPOCA).dt.days
+    dias = np.append(dias.to_numpy(dtype="float64", na_value=np.nan), np.nan)
+    contagem = pd.DataFrame(
+        {
+            "CNES": chave_cnes(contagem["CNES"]),
+            "Dia": dias[codigos],
+            "Notificacoes": contagem["Notificacoes"],
+        }
+    ).dropna()
+    return (
+        contagem.astype("int64")
+        .groupby(["CNES", "Dia"], as_index=False)["Notificacoes"]
+        .sum()
+    )
+
+
+COLUNAS_ESTADO = [
+    ("CNES", "int64"),
+    ("Dia", "int32"),
+    ("Notificacoes", "int32"),
+    ("Nucleo", "uint8"),
+    ("ID_Cluster", "int64"),
+]
+
+
+def gravar_estado(nos, proximo_id, assinatura_fato, parametros, caminho=ARQUIVO_ESTADO):
+    cabecalho = np.array(
+        [len(nos), proximo_id, *assinatura_fato, *parametros], dtype="uint64"
+    )
+    caminho_tmp = caminho + ".tmp"
+    with open(caminho_tmp, "wb") as f:
+        f.write(ASSINATURA)
+        f.write(cabecalho.tobytes())
+        for coluna, dtype in COLUNAS_ESTADO:
+            f.write(nos[coluna].to_numpy(dtype=dtype).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(caminho_tmp, caminho)
+
+
+def ler_estado(caminho=ARQUIVO_ESTADO):
+    """(nós, próximo ID, assinatura da fato, parâmetros) da última execução."""
+    with open(caminho, "rb") as f:
+        dados = f.read()
+    if dados[:8] != ASSINATURA:
+        raise ValueError(f"{caminho} não é um estado de clusters.")
+    n, proximo_id, *resto = (
+        int(v) for v in np.frombuffer(dados, dtype="uint64", count=7, offset=8)
+    )
+    nos = {}
+    deslocamento = TAMANHO_CABECALHO
+    for coluna, dtype in COLUNAS_ESTADO:
+        nos[coluna] = np.frombuffer(dados, dtype, n, deslocamento)
+        deslocamento += np.dtype(dtype).itemsize * n
+    return pd.DataFrame(nos), proximo_id, tuple(resto[:2]), tuple(resto[2:])
+
+
+# ============================
+# ATUALIZAÇÃO INCREMENTAL
+# ============================
+
+
+def _identificar(componente, nucleo, anterior, proximo_id):
+    """
+    ID estável para cada componente do lote.
+
+    Componentes que contêm núcleos já rotulados herdam o menor ID entre
+    eles; IDs antigos ligados por um núcleo novo se fundem (devolvidos em
+    `fusao`). Os demais componentes recebem IDs novos.
+    """
+    herdado = nucleo & (anterior >= 0) & (componente >= 0)
+    ids = np.unique(anterior[herdado])
+    pai = np.arange(len(ids))
+    pos_id = np.searchsorted(ids, anterior[herdado])
+    grupos = pd.Series(pos_id).groupby(componente[herdado])
+    menor = grupos.transform("min").to_numpy()
+    _unir(pai, pos_id, menor)
+    fusao = pd.Series(ids[_comprimir(pai)], index=ids)
+
+    componentes = np.unique(componente[componente >= 0])
+    id_componente = pd.Series(RUIDO, index=componentes, dtype="int64")
+    id_componente[grupos.min().index] = fusao.to_numpy()[grupos.min().to_numpy()]
+    novos = id_componente.index[id_componente == RUIDO]
+    id_componente[novos] = np.arange(proximo_id, proximo_id + len(novos))
+
+    rotulo = np.full(len(componente), RUIDO, dtype="int64")
+    agrupado = componente >= 0
+    rotulo[agrupado] = id_componente.reindex(componente[agrupado]).to_numpy()
+    return rotulo, fusao[fusao.index != fusao.to_numpy()], proximo_id + len(novos)
+
+
+def _agrupar_fatia(
+    nos, novos, corte, unidades, proximo_id, raio_km, janela_dias, minimo
+):
+    """
+    Agrupa os nós `novos` (dias >= corte) sobre os `nos` anteriores.
+
+    Os nós até 2 janelas antes do corte entram como contexto (núcleo e ID já
+    gravados) e os mais antigos ficam como estão, então um cluster que
+    continua ativo mantém o ID. Retorna os nós, o próximo ID e as fusões.
+    """
+    dia_antigo = nos["Dia"].to_numpy()
+    congelados = nos[dia_antigo < corte - 2 * janela_dias]
+    contexto = nos[(dia_antigo >= corte - 2 * janela_dias) & (dia_antigo < corte)]
+    contexto = contexto[contexto["CNES"].isin(unidades.index)]
+    lote = pd.concat(
+        [contexto, novos.assign(Nucleo=0, ID_Cluster=RUIDO)], ignore_index=True
+    )
+
+    # Contexto mais antigo que 1 janela antes do corte: vizinhança incompleta
+    fixo = (lote.index < len(contexto)) & (lote["Dia"] < corte - janela_dias)
+    fixo = fixo.to_numpy()
+    local = unidades.reindex(lote["CNES"])
+    nucleo, componente = agrupar(
+        local["Lat"].to_numpy(),
+        local["Lon"].to_numpy(),
+        lote["Dia"].to_numpy(),
+        lote["Notificacoes"].to_numpy(),
+        raio_km,
+        janela_dias,
+        minimo,
+        np.where(fixo, lote["Nucleo"], -1),
+    )
+    anterior = lote["ID_Cluster"].to_numpy(dtype="int64")
+    rotulo, fusao, proximo_id = _identificar(componente, nucleo, anterior, proximo_id)
+
+    # Nó fixo continua com o rótulo gravado (a borda dele pode estar fora do lote)
+    manter = fixo & (anterior >= 0)
+    rotulo[manter] = anterior[manter]
+    lote["Nucleo"] = nucleo.astype("uint8")
+    lote["ID_Cluster"] = rotulo
+
+    nos = pd.concat([congelados, lote], ignore_index=True)
+    if len(fusao):
+        nos["ID_Cluster"] = nos["ID_Cluster"].map(fusao).fillna(nos["ID_Cluster"])
+        nos["ID_Cluster"] = nos["ID_Cluster"].astype("int64")
+    return nos, proximo_id, len(fusao)
+
+
+def atualizar_clusters(
+    unidades,
+    recalcular=False,
+    raio_km=RAIO_KM,
+    janela_dias=JANELA_DIAS,
+    minimo=MINIMO_NOTIFICACOES,
+    tamanho_bloco=TAMANHO_BLOCO,
+):
+    """
+    Reagrupa só os nós dos últimos REABERTURA_DIAS dias e os dias novos, em
+    fatias de FATIA_DIAS (a primeira execução percorre o histórico todo do
+    mesmo jeito). Retorna os nós e se algo foi recalculado.
+    """
+    parametros = (round(raio_km * 1000), janela_dias, minimo)
+    assinatura_fato = assinatura_arquivo(ARQUIVO_FATO)
+    antigos, proximo_id = None, 1
+    if os.path.exists(ARQUIVO_ESTADO) and not recalcular:
+        antigos, proximo_id, assinatura_antiga, parametros_antigos = ler_estado()
+        if parametros_antigos != parametros:
+            print("   Parâmetros mudaram: clusters refeitos do zero.")
+            antigos, proximo_id = None, 1
+        elif assinatura_antiga == assinatura_fato:
+            print("   Fato sem mudanças desde a última execução.")
+            return antigos, False
+
+    contagem = contar_por_unidade_dia(tamanho_bloco=tamanho_bloco)
+    localizada = contagem["CNES"].isin(unidades.index)
+    print(
+        f"   Notificações em unidades geocodificadas: "
+        f"{contagem.loc[localizada, 'Notificacoes'].sum()} de "
+        f"{contagem['Notificacoes'].sum()}"
+    )
+    contagem = contagem[localizada]
+
+    if antigos is None or antigos.empty:
+        corte = int(contagem["Dia"].min()) if len(contagem) else 0
+        antigos = pd.DataFrame({c: pd.Series(dtype=t) for c, t in COLUNAS_ESTADO})
+    else:
+        corte = int(antigos["Dia"].max()) - REABERTURA_DIAS + 1
+
+    nos = antigos[antigos["Dia"].to_numpy() < corte]
+    novos = contagem[contagem["Dia"] >= corte]
+    ultimo = int(novos["Dia"].max()) if len(novos) else corte
+    print(f"   Nós reagrupados: {len(novos)} (de {len(nos) + len(novos)})")
+
+    fusoes = 0
+    for inicio in range(corte, ultimo + 1, FATIA_DIAS):
+        dias = novos["Dia"]
+        fatia = novos[(dias >= inicio) & (dias < inicio + FATIA_DIAS)]
+        nos, proximo_id, fundidos = _agrupar_fatia(
+            nos, fatia, inicio, unidades, proximo_id, raio_km, janela_dias, minimo
+        )
+        fusoes += fundidos
+    if fusoes:
+        print(f"   🔗 {fusoes} clusters antigos fundidos por nós novos.")
+
+    nos = nos.sort_values(["Dia", "CNES"], ignore_index=True)
+    gravar_estado(nos, proximo_id, assinatura_fato, parametros)
+    return nos, True
+
+
+def resumir(nos, unidades, janela_dias=JANELA_DIAS):
+    """Tabela por cluster para o BI: período, tamanho, centro e raio."""
+    agrupados = nos[nos["ID_Cluster"] >= 0].join(unidades, on="CNES")
+    if agrupados.empty:
+        return pd.DataFrame()
+    peso = agrupados["Notificacoes"]
+    agrupados = agrupados.assign(
+        Lat_Peso=agrupados["Lat"] * peso, Lon_Peso=agrupados["Lon"] * peso
+    )
+    resumo = agrupados.groupby("ID_Cluster").agg(
+        Dia_Inicio=("Dia", "min"),
+        Dia_Fim=("Dia", "max"),
+        Notificacoes=("Notificacoes", "sum"),
+        Unidades=("CNES", "nunique"),
+        Municipios=("ID_Municipio", "nunique"),
+        Lat_Peso=("Lat_Peso", "sum"),
+        Lon_Peso=("Lon_Peso", "sum"),
+    )
+    resumo["Latitude"] = resumo.pop("Lat_Peso") / resumo["Notificacoes"]
+    resumo["Longitude"] = resumo.pop("Lon_Peso") / resumo["Notificacoes"]
+
+    centro = resumo.reindex(agrupados["ID_Cluster"])
+    agrupados["Distancia_km"] = distancia_km(
+        agrupados["Lat"], agrupados["Lon"], centro["Latitude"], centro["Longitude"]
+    )
+    resumo["Raio_km"] = agrupados.groupby("ID_Cluster")["Distancia_km"].max().round(2)
+    principal = (
+        agrupados.groupby(["ID_Cluster", "ID_Municipio"])["Notificacoes"]
+        .sum()
+        .reset_index()
+        .sort_values("Notificacoes")
+        .drop_duplicates(subset=["ID_Cluster"], keep="last")
+        .set_index("ID_Cluster")["ID_Municipio"]
+    )
+    resumo.insert(0, "ID_Municipio", principal)
+    resumo["Dias"] = resumo["Dia_Fim"] - resumo["Dia_Inicio"] + 1
+    resumo["Ativo"] = resumo["Dia_Fim"] >= nos["Dia"].max() - janela_dias
+    for coluna in ["Dia_Inicio", "Dia_Fim"]:
+        resumo[coluna.replace("Dia", "Data")] = pd.to_datetime(
+            resumo.pop(coluna), unit="D"
+        ).dt.date
+    resumo[["Latitude", "Longitude"]] = resumo[["Latitude", "Longitude"]].round(6)
+    return resumo.sort_values(["Ativo", "Notificacoes"], ascending=False).reset_index()
+
+
+def detectar_clusters(
+    recalcular=False,
+    raio_km=RAIO_KM,
+    janela_dias=JANELA_DIAS,
+    minimo=MINIMO_NOTIFICACOES,
+    tamanho_bloco=TAMANHO_BLOCO,
+):
+    print("--- 🦟 CLUSTERS ESPAÇO-TEMPORAIS ---")
+    for arquivo in (ARQUIVO_FATO, ARQUIVO_DIM):
+        if not os.path.exists(arquivo):
+            print(f"❌ Arquivo não encontrado: {arquivo}")
+            return None
+
+    inicio = time.perf_counter()
+    unidades = unidades_geocodificadas()
+    nos, mudou = atualizar_clusters(
+        unidades, recalcular, raio_km, janela_dias, minimo, tamanho_bloco
+    )
+    if not mudou and os.path.exists(ARQUIVO_RESUMO):
+        return pd.read_csv(ARQUIVO_RESUMO, sep=";")
+
+    resumo = resumir(nos, unidades, janela_dias)
+    agrupados = nos[nos["ID_Cluster"] >= 0]
+    saida = pd.DataFrame(
+        {
+            "CNES": agrupados["CNES"].astype(str).str.zfill(7),
+            "Data_Sintomas": pd.to_datetime(agrupados["Dia"], unit="D").dt.date,
+            "Notificacoes": agrupados["Notificacoes"],
+            "ID_Cluster": agrupados["ID_Cluster"],
+            "Nucleo": agrupados["Nucleo"].astype(bool),
+        }
+    )
+    salvar_csv_atomico(saida, ARQUIVO_NOS, sep=";", index=False)
+    salvar_csv_atomico(resumo, ARQUIVO_RESUMO, sep=";", index=False)
+
+    ativos = int(resumo["Ativo"].sum()) if len(resumo) else 0
+    print(f"   {len(resumo)} clusters ({ativos} ativos), {len(saida)} nós agrupados")
+    duracao = time.perf_counter() - inicio
+    print(f"✅ Resumo salvo em '{ARQUIVO_RESUMO}' ({duracao:.1f}s)")
+    return resumo
+
+
+# ============================
+# BENCHMARK
+# ============================
+
+
+def benchmark(n, raio_km=RAIO_KM, janela_dias=JANELA_DIAS, minimo=MINIMO_NOTIFICACOES):
+    """
+    Agrupa n nós sintéticos (unidade, dia) espalhados pelo Brasil, com focos
+    plantados, e mede o tempo. Não lê nem grava nada em disco.
+    """
+    print(f"--- ⏱️ BENCHMARK: {n} nós (unidade, dia) ---")
+    rng = np.random.default_rng(0)
+    n_cidades = max(n // 200, 10)
+    n_unidades = max(n // 20, 100)
+
+    # Unidades em torno de sedes (σ ≈ 3 km), sedes espalhadas pelo país
+    lat_cidade = rng.uniform(-30.0, 0.0, n_cidades)
+    lon_cidade = rng.uniform(-60.0, -36.0, n_cidades)
+    cidade = rng.integers(0, n_cidades, n_unidades)
+    lat_unidade = lat_cidade[cidade] + rng.normal(0, 0.03, n_unidades)
+    lon_unidade = lon_cidade[cidade] + rng.normal(0, 0.03, n_unidades)
+
+    # Nós distintos (unidade, dia) em um ano, 1 ou 2 notificações cada
+    chaves = np.unique(rng.integers(0, n_unidades * 365, int(n * 1.1)))[:n]
+    unidade, dia = np.divmod(chaves, 365)
+    peso = 1 + rng.poisson(0.3, len(chaves))
+
+    # Focos: unidades de 20 cidades com mais casos durante duas semanas
+    focos = rng.choice(n_cidades, 20, replace=False)
+    no_foco = np.isin(cidade[unidade], focos) & (dia >= 180) & (dia < 194)
+    peso[no_foco] += 5
+
+    inicio = time.perf_counter()
+    nucleo, componente = agrupar(
+        lat_unidade[unidade],
+        lon_unidade[unidade],
+        dia,
+        peso,
+        raio_km,
+        janela_dias,
+        minimo,
+    )
+    duracao = time.perf_counter() - inicio
+
+    agrupado = componente >= 0
+    print(
+        f"   Tempo de agrupamento: {duracao:.1f}s ({len(chaves) / duracao:,.0f} nós/s)"
+    )
+    print(
+        f"   {len(np.unique(componente[agrupado]))} clusters, "
+        f"{int(nucleo.sum())} núcleos, {int(agrupado.sum())} nós agrupados"
+    )
+    print(
+        f"   Nós dos focos plantados agrupados: {agrupado[no_foco].mean():.1%} "
+        f"(fora dos focos: {agrupado[~no_foco].mean():.1%})"
+    )
+    return duracao
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Clusters espaço-temporais (ST-DBSCAN) das notificações."
+    )
+    parser.add_argument(
+        "--recalcular",
+        action="store_true",
+        help="Ignora o estado gravado e agrupa todos os dias",
+    )
+    parser.add_argument("--raio-km", type=float, default=RAIO_KM)
+    parser.add_argument("--janela-dias", type=int, default=JANELA_DIAS)
+    parser.add_argument("--minimo", type=int, default=MINIMO_NOTIFICACOES)
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO)
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        metavar="N",
+        help="Mede o agrupamento com N nós sintéticos (ex.: 1000000)",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.raio_km, args.janela_dias, args.minimo)
+    else:
+        detectar_clusters(
+            args.recalcular,
+            args.raio_km,
+            args.janela_dias,
+            args.minimo,
+            args.tamanho_bloco,
+        )
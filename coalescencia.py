@@ -0,0 +1,53 @@
+import re
+import threading
+import unicodedata
+from concurrent.futures import Future
+
+
+def normalizar_consulta(query):
+    """Normaliza uma consulta de endereço (maiúsculas, sem acento, sem pontuação repetida)."""
+    texto = unicodedata.normalize("NFKD", str(query)).encode("ascii", "ignore").decode()
+    texto = re.sub(r"[^A-Z0-9]+", " ", texto.upper())
+    return texto.strip()
+
+
+class Coalescedor:
+    """
+    Junta chamadas idênticas em andamento (single-flight).
+
+    Enquanto a primeira chamada de uma chave não termina, as demais threads
+    com a mesma chave esperam por ela e recebem o mesmo resultado (ou a
+    mesma exceção), sem fazer uma nova requisição.
+    """
+
+    def __init__(self):
+        self._em_andamento = {}
+        self._trava = threading.Lock()
+        self.chamadas = 0
+        self.coalescidas = 0
+
+    def executar(self, chave, funcao, *args, **kwargs):
+        with self._trava:
+            futuro = self._em_andamento.get(chave)
+            lider = futuro is None
+            if lider:
+                futuro = Future()
+                self._em_andamento[chave] = futuro
+                self.chamadas += 1
+            else:
+                self.coalescidas += 1
+
+        if not lider:
+            return futuro.result()
+
+        try:
+            resultado = funcao(*args, **kwargs)
+        except BaseException as exc:
+            futuro.set_exception(exc)
+            raise
+        else:
+            futuro.set_result(resultado)
+            return resultado
+        finally:
+            with self._trava:
+                del self._em_andamento[chave]
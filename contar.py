@@ -1,9 +1,95 @@
+import argparse
 import os
+from datetime import datetime
 
 import pandas as pd
 
+from coordenadas import avaliar_coordenadas, coordenada_ausente
+
 # Caminho do arquivo
 ARQUIVO = os.path.join("Dados_Tratados", "Dim_Unidades_Saude.csv")
+ARQUIVO_ESTADOS = os.path.join("Dados_Auxiliares", "estados.csv")
+
+# Histórico de execuções do relatório (uma linha por nível/chave/execução)
+ARQUIVO_HISTORICO = os.path.join("Dados_Tratados", "historico_cobertura.csv")
+
+TAMANHO_BLOCO = 500_000
+
+# Níveis de quebra do relatório -> coluna usada como chave
+NIVEIS = {"UF": "UF", "Municipio": "ID_Municipio", "Tipo_Unidade": "Tipo_Unidade"}
+
+
+def calcular_cobertura(arquivo=ARQUIVO, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Conta unidades com e sem coordenada por BR, UF, município e tipo de unidade.
+
+    Lê a dimensão em blocos e só com as colunas necessárias.
+    Retorna um DataFrame longo: Nivel, Chave, Total, Sem_Coordenada.
+    """
+    colunas = {"ID_Municipio", "Tipo_Unidade", "Latitude", "Longitude", "Coord_Valida"}
+    parciais = []
+
+    for bloco in pd.read_csv(
+        arquivo,
+        sep=";",
+        dtype=str,
+        usecols=lambda c: c in colunas,
+        chunksize=tamanho_bloco,
+    ):
+        if "Coord_Valida" in bloco.columns:
+            # Flag gravada pela qualidade na dimensão: nula, zerada, invertida ou
+            # fora da UF/município conta como pendente
+            faltante = bloco["Coord_Valida"] != "True"
+        elif {"Longitude", "ID_Municipio"} <= set(bloco.columns):
+            # Dimensão antiga, sem as flags: avalia aqui
+            faltante = ~avaliar_coordenadas(bloco)["Coord_Valida"]
+        else:
+            faltante = coordenada_ausente(bloco["Latitude"])
+
+        chaves = pd.DataFrame({"BR": "BR"}, index=bloco.index)
+        chaves["ID_Municipio"] = bloco["ID_Municipio"].fillna("?")
+        chaves["UF"] = chaves["ID_Municipio"].str[:2]
+        if "Tipo_Unidade" in bloco.columns:
+            chaves["Tipo_Unidade"] = bloco["Tipo_Unidade"].fillna("?")
+
+        for nivel, coluna in {"BR": "BR", **NIVEIS}.items():
+            if coluna not in chaves.columns:
+                continue
+            contagem = (
+                pd.DataFrame({"Chave": chaves[coluna], "Sem_Coordenada": faltante})
+                .groupby("Chave")["Sem_Coordenada"]
+                .agg(Total="size", Sem_Coordenada="sum")
+                .reset_index()
+            )
+            contagem.insert(0, "Nivel", nivel)
+            parciais.append(contagem)
+
+    cobertura = pd.concat(parciais, ignore_index=True)
+    cobertura = cobertura.groupby(["Nivel", "Chave"], as_index=False)[
+        ["Total", "Sem_Coordenada"]
+    ].sum()
+    cobertura["Percentual_Pendente"] = (
+        100 * cobertura["Sem_Coordenada"] / cobertura["Total"]
+    ).round(2)
+
+    # Sigla da UF no lugar do código, quando disponível
+    if os.path.exists(ARQUIVO_ESTADOS):
+        estados = pd.read_csv(ARQUIVO_ESTADOS, dtype=str, encoding="utf-8-sig")
+        siglas = dict(zip(estados["codigo_uf"], estados["uf"]))
+        mask_uf = cobertura["Nivel"] == "UF"
+        cobertura.loc[mask_uf, "Chave"] = cobertura.loc[mask_uf, "Chave"].map(
+            lambda c: siglas.get(c, c)
+        )
+
+    return cobertura
+
+
+def salvar_snapshot(cobertura, arquivo=ARQUIVO_HISTORICO):
+    """Acrescenta o resultado desta execução ao histórico."""
+    snapshot = cobertura.copy()
+    snapshot.insert(0, "Execucao", datetime.now().isoformat(timespec="seconds"))
+    existe = os.path.exists(arquivo)
+    snapshot.to_csv(arquivo, sep=";", index=False, mode="a" if existe else "w", header=not existe)
 
 
 def contar_lat_long_faltantes():
@@ -11,39 +97,84 @@ def contar_lat_long_faltantes():
 
     if not os.path.exists(ARQUIVO):
         print(f"❌ Arquivo não encontrado: {ARQUIVO}")
-        return
+        return None
 
     try:
-        # Lê o arquivo como texto para garantir que '0' ou 'None' sejam lidos corretamente
-        df = pd.read_csv(ARQUIVO, sep=";", dtype=str)
-
-        total_registros = len(df)
-
-        # Critério de 'Sem Localização':
-        # 1. É Nulo (NaN)
-        # 2. É Vazio ('')
-        # 3. É a string 'None' ou 'nan'
-        # 4. É '0'
-        mask_faltante = (
-            (df["Latitude"].isna())
-            | (df["Latitude"] == "")
-            | (df["Latitude"].astype(str).str.lower() == "none")
-            | (df["Latitude"].astype(str).str.lower() == "nan")
-            | (df["Latitude"] == "0")
-        )
+        cobertura = calcular_cobertura()
+    except Exception as e:
+        print(f"❌ Erro ao ler o arquivo: {e}")
+        return None
 
-        qtd_faltante = mask_faltante.sum()
-        qtd_preenchido = total_registros - qtd_faltante
-        percentual = (qtd_faltante / total_registros) * 100
+    geral = cobertura[cobertura["Nivel"] == "BR"].iloc[0]
+    total_registros = geral["Total"]
+    qtd_faltante = geral["Sem_Coordenada"]
+    qtd_preenchido = total_registros - qtd_faltante
 
-        print(f"Total de Unidades:      {total_registros}")
-        print(f"✅ Com Latitude/Long:   {qtd_preenchido}")
-        print(f"⚠️  Sem Latitude/Long:   {qtd_faltante}")
-        print(f"📉 Percentual Pendente: {percentual:.2f}%")
+    print(f"Total de Unidades:      {total_registros}")
+    print(f"✅ Com Latitude/Long:   {qtd_preenchido}")
+    print(f"⚠️  Sem Latitude/Long:   {qtd_faltante}")
+    print(f"📉 Percentual Pendente: {geral['Percentual_Pendente']:.2f}%")
+    return cobertura
 
-    except Exception as e:
-        print(f"❌ Erro ao ler o arquivo: {e}")
+
+def relatorio_detalhado(top=15):
+    """Relatório por UF, município e tipo de unidade; grava o snapshot no histórico."""
+    cobertura = contar_lat_long_faltantes()
+    if cobertura is None:
+        return
+
+    for nivel in NIVEIS:
+        parte = cobertura[cobertura["Nivel"] == nivel]
+        if parte.empty:
+            continue
+        print(f"\n--- Pendências por {nivel} (top {top} em quantidade) ---")
+        parte = parte.sort_values("Sem_Coordenada", ascending=False).head(top)
+        print(parte[["Chave", "Total", "Sem_Coordenada", "Percentual_Pendente"]].to_string(index=False))
+
+    salvar_snapshot(cobertura)
+    print(f"\n💾 Snapshot salvo em {ARQUIVO_HISTORICO}")
+
+
+def mostrar_tendencia(nivel="BR", exportar=None):
+    """Evolução do percentual pendente entre execuções, lida só do histórico."""
+    if not os.path.exists(ARQUIVO_HISTORICO):
+        print(f"❌ Histórico não encontrado: {ARQUIVO_HISTORICO}")
+        return
+
+    historico = pd.read_csv(ARQUIVO_HISTORICO, sep=";", dtype={"Chave": str})
+    historico = historico[historico["Nivel"] == nivel]
+    tendencia = historico.pivot_table(
+        index="Execucao", columns="Chave", values="Percentual_Pendente", aggfunc="last"
+    )
+
+    print(f"--- 📈 TENDÊNCIA DO PERCENTUAL PENDENTE ({nivel}) ---")
+    print(tendencia.to_string())
+
+    if exportar:
+        tendencia.to_csv(exportar, sep=";")
+        print(f"💾 Tendência exportada para {exportar}")
 
 
 if __name__ == "__main__":
-    contar_lat_long_faltantes()
+    parser = argparse.ArgumentParser(description="Pendências de geolocalização das unidades.")
+    parser.add_argument(
+        "--relatorio",
+        action="store_true",
+        help="Quebra por UF, município e tipo de unidade (grava snapshot no histórico)",
+    )
+    parser.add_argument(
+        "--tendencia",
+        nargs="?",
+        const="BR",
+        choices=["BR", *NIVEIS],
+        help="Mostra a evolução entre execuções para o nível informado",
+    )
+    parser.add_argument("--exportar", help="Arquivo CSV para exportar a tendência")
+    args = parser.parse_args()
+
+    if args.tendencia:
+        mostrar_tendencia(args.tendencia, exportar=args.exportar)
+    elif args.relatorio:
+        relatorio_detalhado()
+    else:
+        contar_lat_long_faltantes()
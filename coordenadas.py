@@ -0,0 +1,235 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+ARQUIVO_MUNICIPIOS = os.path.join("Dados_Auxiliares", "municipios.csv")
+
+# Caixa do Brasil continental e ilhas oceânicas (Fernando de Noronha, Trindade)
+LAT_MIN_BRASIL, LAT_MAX_BRASIL = -33.8, 5.3
+LON_MIN_BRASIL, LON_MAX_BRASIL = -74.0, -28.8
+
+# municipios.csv só traz a sede. A caixa de cada município é a sede ± um raio
+# proporcional à distância até a sede vizinha mais próxima (municípios grandes
+# têm vizinhos longe), nunca menor que RAIO_MINIMO graus.
+FATOR_RAIO = 3.0
+RAIO_MINIMO = 0.2
+
+RAIO_TERRA_KM = 6371.0
+
+# Flags gravadas como colunas booleanas, na ordem em que são avaliadas
+FLAGS_QUALIDADE = [
+    "Coord_Nula",
+    "Coord_Zero",
+    "Coord_Invertida",
+    "Fora_Brasil",
+    "Fora_UF",
+    "Fora_Municipio",
+]
+
+# Flags que apagam a coordenada (ela não tem como estar certa). Fora_UF e
+# Fora_Municipio vêm das caixas aproximadas em torno da sede: só marcam, e a
+# coordenada oficial só é apagada se o polígono confirmar (validar_poligonos)
+FLAGS_APAGAR = ["Coord_Zero", "Coord_Invertida", "Fora_Brasil"]
+
+
+def converter_coordenada(serie):
+    """Converte coordenadas em texto ("-10,9", "None", "nan"...) para float (NaN se inválida)."""
+    texto = serie.astype("string").str.strip().str.replace(",", ".", regex=False)
+    return pd.to_numeric(texto, errors="coerce")
+
+
+def coordenada_ausente(serie):
+    """Máscara vetorizada de coordenadas ausentes: nulo, vazio, texto inválido ou zero."""
+    valores = converter_coordenada(serie)
+    return valores.isna() | (valores == 0)
+
+
+# ============================
+# CAIXAS DE UF E MUNICÍPIO
+# ============================
+
+
+def _distancia_vizinho(lat, lon, tamanho_bloco=1000):
+    """Distância (graus, aproximação plana) de cada ponto ao vizinho mais próximo."""
+    cos_lat = np.cos(np.radians(lat))
+    saida = np.empty(len(lat))
+    for inicio in range(0, len(lat), tamanho_bloco):
+        fim = inicio + tamanho_bloco
+        d_lat = lat[inicio:fim, None] - lat[None, :]
+        d_lon = (lon[inicio:fim, None] - lon[None, :]) * cos_lat[inicio:fim, None]
+        dist = np.hypot(d_lat, d_lon)
+        dist[np.arange(dist.shape[0]), np.arange(inicio, inicio + dist.shape[0])] = np.inf
+        saida[inicio:fim] = dist.min(axis=1)
+    return saida
+
+
+@lru_cache(maxsize=4)
+def limites_municipais(arquivo=ARQUIVO_MUNICIPIOS, fator_raio=FATOR_RAIO):
+    """
+    Caixa aproximada de cada município, indexada pelo código IBGE de 6 dígitos.
+
+    Colunas: UF (código), Lat_Min, Lat_Max, Lon_Min, Lon_Max.
+    """
+    df = pd.read_csv(arquivo, sep=",", dtype=str)
+    lat = converter_coordenada(df["latitude"]).to_numpy()
+    lon = converter_coordenada(df["longitude"]).to_numpy()
+
+    raio_lat = np.maximum(_distancia_vizinho(lat, lon) * fator_raio, RAIO_MINIMO)
+    raio_lon = raio_lat / np.cos(np.radians(lat))
+
+    limites = pd.DataFrame(
+        {
+            "UF": df["codigo_uf"].to_numpy(),
+            "Lat_Min": lat - raio_lat,
+            "Lat_Max": lat + raio_lat,
+            "Lon_Min": lon - raio_lon,
+            "Lon_Max": lon + raio_lon,
+        },
+        index=pd.Index(df["codigo_ibge"].str[:6], name="ID_Municipio"),
+    )
+    return limites[~limites.index.duplicated()]
+
+
+def limites_estaduais(limites_mun):
+    """Caixa de cada UF (código) como a união das caixas dos seus municípios."""
+    return limites_mun.groupby("UF").agg(
+        Lat_Min=("Lat_Min", "min"),
+        Lat_Max=("Lat_Max", "max"),
+        Lon_Min=("Lon_Min", "min"),
+        Lon_Max=("Lon_Max", "max"),
+    )
+
+
+def _dentro(lat, lon, caixas):
+    """Ponto dentro da caixa alinhada (NaN na caixa = sem referência = dentro)."""
+    fora = (
+        (lat < caixas["Lat_Min"].to_numpy())
+        | (lat > caixas["Lat_Max"].to_numpy())
+        | (lon < caixas["Lon_Min"].to_numpy())
+        | (lon > caixas["Lon_Max"].to_numpy())
+    )
+    return ~fora
+
+
+def _dentro_brasil(lat, lon):
+    return (
+        (lat >= LAT_MIN_BRASIL)
+        & (lat <= LAT_MAX_BRASIL)
+        & (lon >= LON_MIN_BRASIL)
+        & (lon <= LON_MAX_BRASIL)
+    )
+
+
+# ============================
+# AVALIAÇÃO DE QUALIDADE
+# ============================
+
+
+def avaliar_coordenadas(
+    df,
+    col_lat="Latitude",
+    col_lon="Longitude",
+    col_municipio="ID_Municipio",
+    arquivo_municipios=ARQUIVO_MUNICIPIOS,
+):
+    """
+    Passo único e vetorizado de qualidade das coordenadas.
+
+    Converte as coordenadas para float uma vez e devolve um DataFrame alinhado
+    a `df` com Lat/Lon (float64, já desinvertidas onde a troca cabe no
+    Brasil), uma coluna booleana por flag de FLAGS_QUALIDADE e Coord_Valida
+    (nenhuma flag ligada). Sem ID_Municipio conhecido, as checagens de UF e
+    município não se aplicam.
+    """
+    lat = converter_coordenada(df[col_lat]).to_numpy(dtype="float64", na_value=np.nan)
+    lon = converter_coordenada(df[col_lon]).to_numpy(dtype="float64", na_value=np.nan)
+
+    nula = np.isnan(lat) | np.isnan(lon)
+    zero = ~nula & ((lat == 0) | (lon == 0))
+    no_brasil = _dentro_brasil(lat, lon)
+    invertida = ~nula & ~zero & ~no_brasil & _dentro_brasil(lon, lat)
+
+    # Checagens regionais sobre a coordenada já desinvertida
+    lat_c = np.where(invertida, lon, lat)
+    lon_c = np.where(invertida, lat, lon)
+    fora_brasil = ~nula & ~zero & ~invertida & ~no_brasil
+
+    fora_uf = np.zeros(len(df), dtype=bool)
+    fora_mun = np.zeros(len(df), dtype=bool)
+    if col_municipio in df.columns:
+        limites_mun = limites_municipais(arquivo_municipios)
+        municipio = df[col_municipio].astype("string").str.strip().str[:6]
+        caixas_mun = limites_mun.reindex(municipio)
+        caixas_uf = limites_estaduais(limites_mun).reindex(municipio.str[:2])
+        avaliar = ~nula & ~zero & ~fora_brasil
+        fora_uf = avaliar & ~_dentro(lat_c, lon_c, caixas_uf)
+        fora_mun = avaliar & ~fora_uf & ~_dentro(lat_c, lon_c, caixas_mun)
+
+    qualidade = pd.DataFrame(
+        {
+            "Lat": lat_c,
+            "Lon": lon_c,
+            "Coord_Nula": nula,
+            "Coord_Zero": zero,
+            "Coord_Invertida": invertida,
+            "Fora_Brasil": fora_brasil,
+            "Fora_UF": fora_uf,
+            "Fora_Municipio": fora_mun,
+        },
+        index=df.index,
+    )
+    qualidade["Coord_Valida"] = ~qualidade[FLAGS_QUALIDADE].any(axis=1)
+    return qualidade
+
+
+def coordenada_pendente(qualidade):
+    """Unidades que precisam de geocodificação: sem coordenada ou com uma de FLAGS_APAGAR."""
+    return qualidade[["Coord_Nula", *FLAGS_APAGAR]].any(axis=1)
+
+
+def aplicar_qualidade(df, corrigir_invertidas=True, limpar_invalidas=True):
+    """
+    Roda a avaliação e grava as flags no próprio DataFrame (colunas booleanas).
+
+    Coordenadas invertidas que, desinvertidas, caem no município certo são
+    corrigidas; as de FLAGS_APAGAR são apagadas para voltarem à fila de
+    geocodificação. Fora_UF e Fora_Municipio ficam só como flag (Coord_Valida
+    desligada). Retorna a contagem de cada flag antes da correção.
+    """
+    qualidade = avaliar_coordenadas(df)
+    contagem = {f: int(qualidade[f].sum()) for f in FLAGS_QUALIDADE if qualidade[f].any()}
+
+    if corrigir_invertidas:
+        corrigir = qualidade["Coord_Invertida"] & ~(
+            qualidade["Fora_UF"] | qualidade["Fora_Municipio"]
+        )
+        df.loc[corrigir, "Latitude"] = qualidade.loc[corrigir, "Lat"].astype(str)
+        df.loc[corrigir, "Longitude"] = qualidade.loc[corrigir, "Lon"].astype(str)
+        qualidade.loc[corrigir, "Coord_Invertida"] = False
+        qualidade.loc[corrigir, "Coord_Valida"] = True
+
+    if limpar_invalidas:
+        limpar = qualidade[FLAGS_APAGAR].any(axis=1)
+        df.loc[limpar, ["Latitude", "Longitude"]] = None
+
+    for coluna in [*FLAGS_QUALIDADE, "Coord_Valida"]:
+        df[coluna] = qualidade[coluna].astype(bool)
+    return contagem
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distância haversine em km, vetorizada (aceita escalares ou arrays)."""
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(v, dtype="float64")) for v in (lat1, lon1, lat2, lon2)
+    )
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(a))
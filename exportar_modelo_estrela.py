@@ -0,0 +1,267 @@
+import argparse
+import os
+
+import pandas as pd
+
+from arquivos import salvar_csv_atomico
+from coordenadas import FLAGS_QUALIDADE, converter_coordenada
+from fila_geocodificacao import normalizar_cnes
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sem pyarrow o modelo sai em CSV
+    pa = pq = None
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+PASTA_TRATADOS = "Dados_Tratados"
+ARQUIVO_DIM_UNIDADES = os.path.join(PASTA_TRATADOS, "Dim_Unidades_Saude.csv")
+ARQUIVO_DIM_GEOGRAFIA = os.path.join(PASTA_TRATADOS, "Dim_Geografia.csv")
+ARQUIVO_FATO = os.path.join(PASTA_TRATADOS, "Fato_Dengue_Consolidada.csv")
+ARQUIVO_COORDENADAS_UF = os.path.join("scripts_auxiliares", "coordenadas_uf.csv")
+
+# Saída do modelo para o Power BI
+PASTA_MODELO = os.path.join(PASTA_TRATADOS, "Modelo_Estrela")
+
+# Mapas persistidos chave natural -> chave substituta (não mudam entre execuções)
+ARQUIVO_CHAVES_UNIDADES = os.path.join(PASTA_TRATADOS, "chaves_unidades.csv")
+ARQUIVO_CHAVES_MUNICIPIOS = os.path.join(PASTA_TRATADOS, "chaves_municipios.csv")
+
+# Chave reservada para "não informado / não encontrado na dimensão"
+CHAVE_DESCONHECIDA = 0
+
+TAMANHO_BLOCO = 1_000_000
+
+
+# ============================
+# CHAVES SUBSTITUTAS
+# ============================
+
+
+def atribuir_chaves(naturais, arquivo, coluna_natural, coluna_chave):
+    """
+    Devolve o mapa chave natural -> inteiro, criando chaves só para as novas.
+
+    As chaves já emitidas nunca mudam (o mapa fica em `arquivo`); as novas
+    recebem o próximo inteiro, em ordem de chave natural.
+    """
+    if os.path.exists(arquivo):
+        mapa = pd.read_csv(arquivo, sep=";", dtype={coluna_natural: str})
+    else:
+        mapa = pd.DataFrame(
+            {coluna_natural: pd.Series(dtype=str), coluna_chave: pd.Series(dtype="int64")}
+        )
+
+    novas = pd.Index(naturais.dropna().unique()).difference(mapa[coluna_natural]).sort_values()
+    if len(novas):
+        proxima = int(mapa[coluna_chave].max()) + 1 if len(mapa) else CHAVE_DESCONHECIDA + 1
+        mapa = pd.concat(
+            [
+                mapa,
+                pd.DataFrame(
+                    {coluna_natural: novas, coluna_chave: range(proxima, proxima + len(novas))}
+                ),
+            ],
+            ignore_index=True,
+        )
+        salvar_csv_atomico(mapa, arquivo, sep=";", index=False)
+        print(f"   🔑 {len(novas)} novas chaves em {os.path.basename(arquivo)}")
+
+    return mapa.set_index(coluna_natural)[coluna_chave]
+
+
+def substituir_chave(serie, mapa):
+    """Troca a chave natural pela substituta (desconhecidas viram CHAVE_DESCONHECIDA)."""
+    return serie.map(mapa).fillna(CHAVE_DESCONHECIDA).astype("int32")
+
+
+def normalizar_municipio(serie):
+    return serie.astype("string").str.strip().str[:6]
+
+
+# ============================
+# GRAVAÇÃO
+# ============================
+
+
+class Gravador:
+    """Grava uma tabela em Parquet (com pyarrow) ou CSV, bloco a bloco."""
+
+    def __init__(self, nome, pasta=PASTA_MODELO):
+        extensao = "parquet" if pq else "csv"
+        self.caminho = os.path.join(pasta, f"{nome}.{extensao}")
+        self._escritor = None
+        self._esquema = None
+        self._primeiro = True
+
+    def escrever(self, df):
+        if pq:
+            tabela = pa.Table.from_pandas(df, schema=self._esquema, preserve_index=False)
+            if self._escritor is None:
+                self._esquema = tabela.schema
+                self._escritor = pq.ParquetWriter(self.caminho, self._esquema, compression="zstd")
+            self._escritor.write_table(tabela)
+        else:
+            df.to_csv(
+                self.caminho,
+                sep=";",
+                index=False,
+                mode="w" if self._primeiro else "a",
+                header=self._primeiro,
+                date_format="%Y-%m-%d",
+            )
+        self._primeiro = False
+
+    def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+        return self.caminho
+
+
+def gravar_tabela(df, nome):
+    gravador = Gravador(nome)
+    gravador.escrever(df)
+    return gravador.fechar()
+
+
+# ============================
+# TABELAS DO MODELO
+# ============================
+
+
+def montar_dim_geografia(chaves_municipios):
+    """Dimensão de municípios com chave inteira e coordenadas da UF já unidas."""
+    df_geo = pd.read_csv(ARQUIVO_DIM_GEOGRAFIA, sep=";", dtype=str)
+    df_geo["ID_Municipio"] = normalizar_municipio(df_geo["ID_Municipio"])
+    df_geo = df_geo.drop_duplicates(subset=["ID_Municipio"])
+
+    df_geo = df_geo.rename(
+        columns={"Latitude": "Latitude_Municipio", "Longitude": "Longitude_Municipio"}
+    )
+    df_geo["UF"] = df_geo["UF"].str.strip().str.upper()
+
+    # O mesmo que scripts_auxiliares/add_lat_long_estados.py fazia à mão
+    if os.path.exists(ARQUIVO_COORDENADAS_UF):
+        df_uf = pd.read_csv(ARQUIVO_COORDENADAS_UF, sep=";", dtype=str)
+        df_uf.columns = df_uf.columns.str.replace('"', "").str.strip()
+        df_uf = df_uf.rename(
+            columns={"uf": "UF", "latitude": "Latitude_UF", "longitude": "Longitude_UF"}
+        )
+        df_uf["UF"] = df_uf["UF"].str.strip().str.upper()
+        df_geo = df_geo.merge(df_uf, on="UF", how="left")
+
+    for col in ["Latitude_Municipio", "Longitude_Municipio", "Latitude_UF", "Longitude_UF"]:
+        if col in df_geo.columns:
+            df_geo[col] = converter_coordenada(df_geo[col]).astype("float32")
+
+    df_geo.insert(0, "SK_Municipio", substituir_chave(df_geo["ID_Municipio"], chaves_municipios))
+    desconhecido = pd.DataFrame(
+        {"SK_Municipio": [CHAVE_DESCONHECIDA], "ID_Municipio": [""], "Municipio": ["Não informado"]}
+    ).astype({"SK_Municipio": "int32"})
+    return pd.concat([desconhecido, df_geo], ignore_index=True).sort_values("SK_Municipio")
+
+
+def montar_dim_unidades(chaves_unidades, chaves_municipios):
+    """Dimensão de unidades com chave inteira e o município como chave inteira."""
+    df_uni = pd.read_csv(ARQUIVO_DIM_UNIDADES, sep=";", dtype=str)
+    df_uni["CNES"] = normalizar_cnes(df_uni["CNES"])
+    df_uni = df_uni.drop_duplicates(subset=["CNES"], keep="last")
+
+    df_uni.insert(0, "SK_Unidade", substituir_chave(df_uni["CNES"], chaves_unidades))
+    df_uni["SK_Municipio"] = substituir_chave(
+        normalizar_municipio(df_uni["ID_Municipio"]), chaves_municipios
+    )
+    df_uni = df_uni.drop(columns=["ID_Municipio"])
+
+    for col in ["Latitude", "Longitude"]:
+        df_uni[col] = converter_coordenada(df_uni[col])
+    for col in [*FLAGS_QUALIDADE, "Coord_Valida"]:
+        if col in df_uni.columns:
+            df_uni[col] = df_uni[col].map({"True": True, "False": False}).astype("boolean")
+    if "Tipo_Unidade" in df_uni.columns:
+        df_uni["Tipo_Unidade"] = pd.to_numeric(df_uni["Tipo_Unidade"], errors="coerce").astype("Int16")
+
+    desconhecido = pd.DataFrame(
+        {
+            "SK_Unidade": [CHAVE_DESCONHECIDA],
+            "CNES": [""],
+            "Nome_Unidade": ["Não informado"],
+            "SK_Municipio": [CHAVE_DESCONHECIDA],
+        }
+    ).astype({"SK_Unidade": "int32", "SK_Municipio": "int32"})
+    return pd.concat([desconhecido, df_uni], ignore_index=True).sort_values("SK_Unidade")
+
+
+def tipar_fato(bloco, chaves_unidades, chaves_municipios):
+    """Troca CNES e ID_Municipio (texto) pelas chaves inteiras e tipa as demais colunas."""
+    df = pd.DataFrame(index=bloco.index)
+    df["SK_Unidade"] = substituir_chave(normalizar_cnes(bloco["CNES"]), chaves_unidades)
+    df["SK_Municipio"] = substituir_chave(
+        normalizar_municipio(bloco["ID_Municipio"]), chaves_municipios
+    )
+    if "ID_Municipio_Residencia" in bloco.columns:
+        df["SK_Municipio_Residencia"] = substituir_chave(
+            normalizar_municipio(bloco["ID_Municipio_Residencia"]), chaves_municipios
+        )
+    naturais = ["CNES", "ID_Municipio", "ID_Municipio_Residencia"]
+    for col in bloco.columns.difference(naturais, sort=False):
+        if col.startswith("Data_"):
+            df[col] = pd.to_datetime(bloco[col], errors="coerce")
+        elif col == "Ano":
+            df[col] = pd.to_numeric(bloco[col], errors="coerce").astype("Int16")
+        elif col == "Semana_Epidemiologica":
+            df[col] = pd.to_numeric(bloco[col], errors="coerce").astype("Int32")
+        else:
+            df[col] = bloco[col]
+    return df
+
+
+def exportar_modelo(tamanho_bloco=TAMANHO_BLOCO):
+    print("--- ⭐ EXPORTANDO MODELO ESTRELA PARA O BI ---")
+    os.makedirs(PASTA_MODELO, exist_ok=True)
+
+    # Chaves de todos os municípios e unidades conhecidos nas dimensões
+    df_geo = pd.read_csv(ARQUIVO_DIM_GEOGRAFIA, sep=";", dtype=str, usecols=["ID_Municipio"])
+    df_uni = pd.read_csv(
+        ARQUIVO_DIM_UNIDADES, sep=";", dtype=str, usecols=["CNES", "ID_Municipio"]
+    )
+    chaves_municipios = atribuir_chaves(
+        pd.concat(
+            [normalizar_municipio(df_geo["ID_Municipio"]), normalizar_municipio(df_uni["ID_Municipio"])]
+        ),
+        ARQUIVO_CHAVES_MUNICIPIOS,
+        "ID_Municipio",
+        "SK_Municipio",
+    )
+    chaves_unidades = atribuir_chaves(
+        normalizar_cnes(df_uni["CNES"]), ARQUIVO_CHAVES_UNIDADES, "CNES", "SK_Unidade"
+    )
+
+    caminho = gravar_tabela(montar_dim_geografia(chaves_municipios), "Dim_Geografia")
+    print(f"   ✅ {caminho}")
+    caminho = gravar_tabela(montar_dim_unidades(chaves_unidades, chaves_municipios), "Dim_Unidades")
+    print(f"   ✅ {caminho}")
+
+    # Fato em blocos: só inteiros, datas e códigos curtos
+    gravador = Gravador("Fato_Dengue")
+    total = sem_unidade = 0
+    for bloco in pd.read_csv(ARQUIVO_FATO, sep=";", dtype=str, chunksize=tamanho_bloco):
+        df = tipar_fato(bloco, chaves_unidades, chaves_municipios)
+        gravador.escrever(df)
+        total += len(df)
+        sem_unidade += int((df["SK_Unidade"] == CHAVE_DESCONHECIDA).sum())
+    print(f"   ✅ {gravador.fechar()} ({total} notificações, {sem_unidade} sem unidade na dimensão)")
+
+    if pq is None:
+        print("   ℹ️ pyarrow não instalado: modelo gravado em CSV.")
+    print("\n✅ Modelo exportado! Relacione as tabelas pelas colunas SK_*.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta o modelo estrela (chaves inteiras) para o BI.")
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO)
+    args = parser.parse_args()
+    exportar_modelo(args.tamanho_bloco)
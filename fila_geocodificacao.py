@@ -0,0 +1,144 @@
+import os
+import zlib
+from datetime import date
+
+import pandas as pd
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+PASTA_TRATADOS = "Dados_Tratados"
+ARQUIVO_FATO = os.path.join(PASTA_TRATADOS, "Fato_Dengue_Consolidada.csv")
+
+# Registro do consumo mensal de requisições pagas
+ARQUIVO_CONSUMO = "consumo_google.csv"
+
+TAMANHO_BLOCO = 1_000_000
+
+
+def normalizar_cnes(serie):
+    """Padroniza o CNES como texto sem zeros à esquerda ("0002372" e "2372.0" viram "2372")."""
+    texto = serie.astype("string").str.strip().str.replace(r"\.0$", "", regex=True)
+    return texto.str.lstrip("0").mask(texto.isna())
+
+
+def contar_notificacoes_por_cnes(arquivo_fato=ARQUIVO_FATO, tamanho_bloco=TAMANHO_BLOCO):
+    """Quantidade de notificações por CNES, lendo a fato em blocos (só a coluna CNES)."""
+    if not os.path.exists(arquivo_fato):
+        return pd.Series(dtype="int64")
+
+    parciais = [
+        normalizar_cnes(bloco["CNES"]).value_counts()
+        for bloco in pd.read_csv(
+            arquivo_fato, sep=";", dtype=str, usecols=["CNES"], chunksize=tamanho_bloco
+        )
+    ]
+    if not parciais:
+        return pd.Series(dtype="int64")
+    return pd.concat(parciais).groupby(level=0).sum()
+
+
+def particao_por_cnes(serie_cnes, n_particoes):
+    """
+    Número da partição (0..N-1) de cada CNES.
+
+    Usa o CRC32 do CNES normalizado: o mesmo CNES cai sempre na mesma
+    partição, em qualquer máquina e execução, sem coordenação entre workers.
+    """
+    chaves = normalizar_cnes(serie_cnes).fillna("")
+    return chaves.map(lambda c: zlib.crc32(c.encode("utf-8")) % n_particoes).astype("int64")
+
+
+def priorizar_pendentes(df_pendentes, contagem):
+    """Ordena os pendentes pelo volume de casos (desempate: ordem original do arquivo)."""
+    df = df_pendentes.copy()
+    df["Notificacoes"] = (
+        normalizar_cnes(df["CNES"]).map(contagem).fillna(0).astype("int64").to_numpy()
+    )
+    return df.sort_values("Notificacoes", ascending=False, kind="stable")
+
+
+class Orcamento:
+    """
+    Orçamento mensal de requisições pagas, persistido entre execuções.
+
+    O limite efetivo é o menor entre `max_requisicoes` e `max_custo` dividido
+    pelo custo por requisição. O consumo do mês fica em ARQUIVO_CONSUMO.
+    """
+
+    def __init__(
+        self,
+        max_requisicoes=None,
+        max_custo=None,
+        custo_por_requisicao=0.0,
+        arquivo=ARQUIVO_CONSUMO,
+    ):
+        self.arquivo = arquivo
+        self.custo_por_requisicao = custo_por_requisicao
+        self.mes = date.today().strftime("%Y-%m")
+
+        limites = []
+        if max_requisicoes is not None:
+            limites.append(int(max_requisicoes))
+        if max_custo is not None and custo_por_requisicao > 0:
+            limites.append(int(max_custo / custo_por_requisicao))
+        self.limite = min(limites) if limites else None
+
+        self.usadas = 0
+        if os.path.exists(arquivo):
+            consumo = pd.read_csv(arquivo, sep=";", dtype={"Mes": str})
+            self.usadas = int(consumo.loc[consumo["Mes"] == self.mes, "Requisicoes"].sum())
+
+    def particionar(self, arquivo, n_particoes):
+        """
+        Orçamento de um worker entre N: 1/N do que resta neste orçamento, com o
+        consumo próprio em `arquivo`. Como cada um só enxerga a sua fatia, a
+        soma das partições nunca passa do limite do mês.
+        """
+        fatia = Orcamento(custo_por_requisicao=self.custo_por_requisicao, arquivo=arquivo)
+        if self.limite is not None:
+            fatia.limite = self.restante() // n_particoes
+        return fatia
+
+    def restante(self):
+        if self.limite is None:
+            return float("inf")
+        return max(self.limite - self.usadas, 0)
+
+    def pode_gastar(self, n=1):
+        return self.restante() >= n
+
+    def registrar(self, n=1):
+        self.usadas += n
+
+    def custo(self):
+        return self.usadas * self.custo_por_requisicao
+
+    def salvar(self):
+        """Grava o consumo do mês atual (mantém os meses anteriores)."""
+        if os.path.exists(self.arquivo):
+            consumo = pd.read_csv(self.arquivo, sep=";", dtype={"Mes": str})
+            consumo = consumo[consumo["Mes"] != self.mes]
+        else:
+            consumo = pd.DataFrame(columns=["Mes", "Requisicoes"])
+        consumo = pd.concat(
+            [consumo, pd.DataFrame([{"Mes": self.mes, "Requisicoes": self.usadas}])],
+            ignore_index=True,
+        )
+        consumo.to_csv(self.arquivo, sep=";", index=False)
+
+
+def incorporar_consumo(arquivos, arquivo=ARQUIVO_CONSUMO):
+    """Soma os consumos das partições (por mês) ao consumo principal e apaga as partições."""
+    tabelas = [pd.read_csv(a, sep=";", dtype={"Mes": str}) for a in arquivos]
+    if os.path.exists(arquivo):
+        tabelas.append(pd.read_csv(arquivo, sep=";", dtype={"Mes": str}))
+    if not tabelas:
+        return
+    consumo = pd.concat(tabelas, ignore_index=True).groupby("Mes", as_index=False)[
+        "Requisicoes"
+    ].sum()
+    consumo.to_csv(arquivo, sep=";", index=False)
+    for a in arquivos:
+        os.remove(a)
@@ -0,0 +1,184 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from arquivos import salvar_csv_atomico
+from base_coordenadas import abrir_base
+from coordenadas import converter_coordenada, distancia_km
+from fila_geocodificacao import normalizar_cnes
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+PASTA_TRATADOS = "Dados_Tratados"
+ARQUIVO_FATO = os.path.join(PASTA_TRATADOS, "Fato_Dengue_Consolidada.csv")
+ARQUIVO_DIM = os.path.join(PASTA_TRATADOS, "Dim_Unidades_Saude.csv")
+ARQUIVO_MUNICIPIOS = os.path.join("Dados_Auxiliares", "municipios.csv")
+ARQUIVO_SAIDA = os.path.join(PASTA_TRATADOS, "Fluxo_Residencia_Notificacao.csv")
+
+TAMANHO_BLOCO = 1_000_000
+
+# Parciais acumulados antes de reduzir de novo (limita a memória)
+MAXIMO_PARCIAIS = 20
+
+CHAVES_FLUXO = ["ID_Municipio_Residencia", "ID_Municipio", "CNES"]
+
+# Destino do fluxo: coordenada da unidade ou, sem ela, a sede do município notificador
+DESTINO_UNIDADE = "Unidade"
+DESTINO_MUNICIPIO = "Municipio"
+
+
+# ============================
+# CONTAGEM EM FLUXO
+# ============================
+
+
+def _reduzir(parciais):
+    niveis = list(range(len(CHAVES_FLUXO)))
+    return pd.concat(parciais).groupby(level=niveis, dropna=False).sum()
+
+
+def contar_fluxos(arquivo_fato=ARQUIVO_FATO, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Notificações por (residência, município notificador, unidade), lendo a
+    fato em blocos e só com as três colunas.
+
+    Cada bloco é agregado com as chaves cruas (o número de combinações é bem
+    menor que o de linhas); a normalização de CNES e códigos IBGE roda uma
+    vez, sobre as combinações, no fim.
+    """
+    parciais = []
+    for bloco in pd.read_csv(
+        arquivo_fato,
+        sep=";",
+        dtype=str,
+        usecols=CHAVES_FLUXO,
+        chunksize=tamanho_bloco,
+    ):
+        parciais.append(bloco.groupby(CHAVES_FLUXO, dropna=False).size())
+        if len(parciais) >= MAXIMO_PARCIAIS:
+            parciais = [_reduzir(parciais)]
+
+    if not parciais:
+        return pd.DataFrame(columns=[*CHAVES_FLUXO, "Notificacoes"])
+
+    fluxos = _reduzir(parciais).rename("Notificacoes").reset_index()
+    for col in ["ID_Municipio_Residencia", "ID_Municipio"]:
+        fluxos[col] = fluxos[col].astype("string").str.strip().str[:6]
+    fluxos["CNES"] = normalizar_cnes(fluxos["CNES"])
+    return (
+        fluxos.groupby(CHAVES_FLUXO, dropna=False)["Notificacoes"].sum().reset_index()
+    )
+
+
+# ============================
+# COORDENADAS E DISTÂNCIAS
+# ============================
+
+
+def sedes_municipais(arquivo=ARQUIVO_MUNICIPIOS):
+    """Latitude/Longitude da sede de cada município, pelo código de 6 dígitos."""
+    df = pd.read_csv(arquivo, sep=",", dtype=str)
+    sedes = pd.DataFrame(
+        {
+            "Lat": converter_coordenada(df["latitude"]).to_numpy(),
+            "Lon": converter_coordenada(df["longitude"]).to_numpy(),
+        },
+        index=df["codigo_ibge"].str[:6],
+    )
+    return sedes[~sedes.index.duplicated()]
+
+
+def coordenadas_unidades(arquivo=ARQUIVO_DIM):
+    """
+    Coordenadas aprovadas na qualidade de cada unidade, pelo CNES normalizado,
+    lidas da base binária (recompilada só se a dimensão mudou).
+    """
+    tabela = abrir_base(arquivo).tabela()
+    return tabela[["Lat", "Lon"]].set_axis(tabela["CNES"].astype("string"))
+
+
+def montar_fluxos(fluxos, sedes, unidades):
+    """
+    Acrescenta origem (sede do município de residência), destino (unidade ou
+    sede do município notificador) e a distância haversine entre eles.
+    """
+    origem = sedes.reindex(fluxos["ID_Municipio_Residencia"])
+    destino_unidade = unidades.reindex(fluxos["CNES"])
+    destino_municipio = sedes.reindex(fluxos["ID_Municipio"])
+
+    tem_unidade = destino_unidade["Lat"].notna().to_numpy()
+    lat_destino = np.where(
+        tem_unidade,
+        destino_unidade["Lat"].to_numpy(),
+        destino_municipio["Lat"].to_numpy(),
+    )
+    lon_destino = np.where(
+        tem_unidade,
+        destino_unidade["Lon"].to_numpy(),
+        destino_municipio["Lon"].to_numpy(),
+    )
+
+    saida = fluxos.copy()
+    saida["Lat_Residencia"] = origem["Lat"].to_numpy()
+    saida["Lon_Residencia"] = origem["Lon"].to_numpy()
+    saida["Lat_Destino"] = lat_destino
+    saida["Lon_Destino"] = lon_destino
+    saida["Tipo_Destino"] = np.where(tem_unidade, DESTINO_UNIDADE, DESTINO_MUNICIPIO)
+    saida.loc[np.isnan(lat_destino), "Tipo_Destino"] = None
+    saida["Distancia_km"] = distancia_km(
+        saida["Lat_Residencia"], saida["Lon_Residencia"], lat_destino, lon_destino
+    ).round(2)
+    saida["Mesmo_Municipio"] = (
+        saida["ID_Municipio_Residencia"] == saida["ID_Municipio"]
+    ).fillna(False)
+    return saida.sort_values("Notificacoes", ascending=False, ignore_index=True)
+
+
+def gerar_fluxos(arquivo_saida=ARQUIVO_SAIDA, tamanho_bloco=TAMANHO_BLOCO):
+    print("--- 🚑 FLUXO RESIDÊNCIA → NOTIFICAÇÃO ---")
+    if not os.path.exists(ARQUIVO_FATO):
+        print(f"❌ Arquivo não encontrado: {ARQUIVO_FATO}")
+        return None
+
+    inicio = time.perf_counter()
+    colunas = pd.read_csv(ARQUIVO_FATO, sep=";", nrows=0).columns
+    if "ID_Municipio_Residencia" not in colunas:
+        print("❌ A fato não tem ID_Municipio_Residencia. Rode o atualizar_dados.py.")
+        return None
+
+    fluxos = contar_fluxos(tamanho_bloco=tamanho_bloco)
+    print(f"   {fluxos['Notificacoes'].sum()} notificações em {len(fluxos)} fluxos.")
+
+    unidades = coordenadas_unidades() if os.path.exists(ARQUIVO_DIM) else None
+    if unidades is None:
+        unidades = pd.DataFrame(columns=["Lat", "Lon"], dtype="float64")
+    saida = montar_fluxos(fluxos, sedes_municipais(), unidades)
+    salvar_csv_atomico(saida, arquivo_saida, sep=";", index=False)
+
+    # Resumo ponderado pelo número de notificações
+    com_distancia = saida[saida["Distancia_km"].notna()]
+    peso = com_distancia["Notificacoes"]
+    if peso.sum():
+        fora = 100 * peso[~com_distancia["Mesmo_Municipio"]].sum() / peso.sum()
+        media = np.average(com_distancia["Distancia_km"], weights=peso)
+        print(f"   Notificadas fora do município de residência: {fora:.1f}%")
+        print(f"   Distância média residência → atendimento: {media:.1f} km")
+    print(
+        f"✅ Fluxos salvos em '{arquivo_saida}' ({time.perf_counter() - inicio:.1f}s)"
+    )
+    return saida
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fluxo residência → unidade notificadora, com distâncias."
+    )
+    parser.add_argument("--saida", default=ARQUIVO_SAIDA)
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO)
+    args = parser.parse_args()
+    gerar_fluxos(args.saida, args.tamanho_bloco)
@@ -0,0 +1,345 @@
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from assinatura_endereco import normalizar_campo, normalizar_texto
+from coordenadas import avaliar_coordenadas, converter_coordenada
+from reaproveitar_coordenadas import MAPA_TB_ESTABELECIMENTO, TIPOS_REAPROVEITAMENTO
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+PASTA_TRATADOS = "Dados_Tratados"
+ARQUIVO_DIM = os.path.join(PASTA_TRATADOS, "Dim_Unidades_Saude.csv")
+ARQUIVO_MUNICIPIOS = os.path.join("Dados_Auxiliares", "municipios.csv")
+
+# Gazetteer compilado (Nivel;Chave;Latitude;Longitude;Pontos)
+ARQUIVO_GAZETTEER = os.path.join(PASTA_TRATADOS, "gazetteer.csv")
+
+# Níveis de precisão, do mais fino ao mais grosso
+NIVEL_ESTABELECIMENTO = "Estabelecimento"  # mesmo nome de unidade no município
+NIVEL_CEP = "CEP"
+NIVEL_RUA = "Rua"
+NIVEL_BAIRRO = "Bairro"
+NIVEL_MUNICIPIO = "Municipio"
+NIVEL_SEDE = "Sede_Municipal"  # coordenada da sede em municipios.csv (último recurso)
+NIVEIS = [
+    NIVEL_ESTABELECIMENTO,
+    NIVEL_CEP,
+    NIVEL_RUA,
+    NIVEL_BAIRRO,
+    NIVEL_MUNICIPIO,
+    NIVEL_SEDE,
+]
+
+# Níveis por nome dentro do município -> coluna de origem
+COLUNAS_LOCAIS = {
+    NIVEL_ESTABELECIMENTO: "Nome_Unidade",
+    NIVEL_RUA: "Rua",
+    NIVEL_BAIRRO: "Bairro",
+}
+
+# Mínimo de pontos para aceitar a mediana de um nível
+MINIMO_PONTOS = {
+    NIVEL_ESTABELECIMENTO: 1,
+    NIVEL_CEP: 1,
+    NIVEL_RUA: 1,
+    NIVEL_BAIRRO: 2,
+    NIVEL_MUNICIPIO: 3,
+}
+
+# Maior amplitude (graus) aceita entre os pontos de um centroide por nome:
+# nomes repetidos ("RUA A", "UBS") em pontas opostas da cidade são descartados
+DISPERSAO_MAXIMA = {NIVEL_ESTABELECIMENTO: 0.005, NIVEL_RUA: 0.02}
+
+# Coordenadas que vieram do próprio gazetteer não voltam a alimentá-lo
+PREFIXO_CORRESPONDENCIA = "Gazetteer_"
+
+# CEPs terminados em 000 cobrem a cidade inteira
+SUFIXO_CEP_GENERICO = "000"
+
+
+# ============================
+# CHAVES
+# ============================
+
+
+def chave_municipio(serie):
+    return serie.astype("string").str.strip().str[:6]
+
+
+def chave_cep(serie):
+    cep = serie.astype("string").str.replace(r"\.0$", "", regex=True)
+    cep = cep.str.replace(r"\D", "", regex=True).str.zfill(8)
+    return cep.mask(
+        cep.isna() | (cep == "00000000") | cep.str.endswith(SUFIXO_CEP_GENERICO)
+    )
+
+
+def chave_cep_texto(texto):
+    """Versão escalar de `chave_cep` (None para CEP genérico ou vazio)."""
+    cep = re.sub(r"\D", "", re.sub(r"\.0$", "", str(texto).strip())).zfill(8)
+    if cep == "00000000" or cep.endswith(SUFIXO_CEP_GENERICO):
+        return None
+    return cep
+
+
+def chave_local(nomes, id_municipio):
+    """Chave "município|nome normalizado" para bairro, rua ou estabelecimento."""
+    nome = normalizar_campo(nomes)
+    return (chave_municipio(id_municipio) + "|" + nome).mask(nome == "")
+
+
+# ============================
+# CONSTRUÇÃO
+# ============================
+
+
+def carregar_pontos(arquivo_dim=ARQUIVO_DIM, extras=()):
+    """
+    Pontos conhecidos (nome, rua, bairro, CEP, município e coordenadas).
+
+    Usa a dimensão e, opcionalmente, arquivos no formato do tbEstabelecimento.
+    """
+    colunas = [
+        "Nome_Unidade",
+        "Rua",
+        "CEP",
+        "Bairro",
+        "ID_Municipio",
+        "Latitude",
+        "Longitude",
+        "Tipo_Correspondencia",
+    ]
+    mapa = {
+        **MAPA_TB_ESTABELECIMENTO,
+        "NO_BAIRRO": "Bairro",
+        "NO_FANTASIA": "Nome_Unidade",
+    }
+    partes = []
+
+    if arquivo_dim and os.path.exists(arquivo_dim):
+        df = pd.read_csv(
+            arquivo_dim, sep=";", dtype=str, usecols=lambda c: c in colunas
+        )
+        # Só coordenadas oficiais ou de provedor: as do próprio gazetteer e as
+        # herdadas de irmãs (reaproveitamento) não são verdade de campo
+        if "Tipo_Correspondencia" in df.columns:
+            tipo = df["Tipo_Correspondencia"].fillna("")
+            derivada = tipo.str.startswith(PREFIXO_CORRESPONDENCIA) | tipo.isin(
+                TIPOS_REAPROVEITAMENTO
+            )
+            df = df[~derivada]
+        partes.append(df)
+
+    for arquivo in extras:
+        df = pd.read_csv(arquivo, sep=";", dtype=str, usecols=lambda c: c in mapa)
+        partes.append(df.rename(columns=mapa))
+
+    if not partes:
+        return pd.DataFrame(columns=colunas)
+
+    df = pd.concat(partes, ignore_index=True).reindex(columns=colunas)
+    # Só pontos aprovados na qualidade (um ponto fora do município puxaria o centroide)
+    qualidade = avaliar_coordenadas(df)
+    valida = qualidade["Coord_Valida"]
+    return df[valida].assign(
+        Latitude=qualidade.loc[valida, "Lat"], Longitude=qualidade.loc[valida, "Lon"]
+    )
+
+
+def _centroides(chaves, pontos, nivel):
+    agregado = (
+        pd.DataFrame(
+            {
+                "Chave": chaves,
+                "Latitude": pontos["Latitude"],
+                "Longitude": pontos["Longitude"],
+            }
+        )
+        .dropna(subset=["Chave"])
+        .groupby("Chave")
+        .agg(
+            Latitude=("Latitude", "median"),
+            Longitude=("Longitude", "median"),
+            Pontos=("Latitude", "size"),
+            Lat_Min=("Latitude", "min"),
+            Lat_Max=("Latitude", "max"),
+            Lon_Min=("Longitude", "min"),
+            Lon_Max=("Longitude", "max"),
+        )
+        .reset_index()
+    )
+    aceito = agregado["Pontos"] >= MINIMO_PONTOS[nivel]
+    if nivel in DISPERSAO_MAXIMA:
+        amplitude = np.maximum(
+            agregado["Lat_Max"] - agregado["Lat_Min"],
+            agregado["Lon_Max"] - agregado["Lon_Min"],
+        )
+        aceito &= amplitude <= DISPERSAO_MAXIMA[nivel]
+    agregado = agregado.loc[aceito, ["Chave", "Latitude", "Longitude", "Pontos"]]
+    agregado.insert(0, "Nivel", nivel)
+    return agregado
+
+
+def construir_gazetteer(pontos, arquivo_municipios=ARQUIVO_MUNICIPIOS):
+    """
+    Centroides robustos (mediana) por estabelecimento, CEP, rua, bairro e
+    município, mais as sedes municipais.
+    """
+    partes = [_centroides(chave_cep(pontos["CEP"]), pontos, NIVEL_CEP)]
+    for nivel, coluna in COLUNAS_LOCAIS.items():
+        chaves = chave_local(pontos[coluna], pontos["ID_Municipio"])
+        partes.append(_centroides(chaves, pontos, nivel))
+    partes.append(
+        _centroides(chave_municipio(pontos["ID_Municipio"]), pontos, NIVEL_MUNICIPIO)
+    )
+
+    if os.path.exists(arquivo_municipios):
+        df_mun = pd.read_csv(arquivo_municipios, sep=",", dtype=str)
+        partes.append(
+            pd.DataFrame(
+                {
+                    "Nivel": NIVEL_SEDE,
+                    "Chave": chave_municipio(df_mun["codigo_ibge"]),
+                    "Latitude": converter_coordenada(df_mun["latitude"]),
+                    "Longitude": converter_coordenada(df_mun["longitude"]),
+                    "Pontos": 1,
+                }
+            )
+        )
+
+    return pd.concat(partes, ignore_index=True)
+
+
+# ============================
+# CONSULTA
+# ============================
+
+
+class Gazetteer:
+    """
+    Consulta O(1) de coordenada aproximada, sem rede.
+
+    Tenta estabelecimento de mesmo nome, CEP, rua, bairro, município
+    (mediana das unidades) e por fim a sede municipal.
+    """
+
+    def __init__(self, df_gazetteer):
+        self.tabelas = {
+            nivel: {
+                chave: (lat, lon)
+                for chave, lat, lon in grupo[
+                    ["Chave", "Latitude", "Longitude"]
+                ].itertuples(index=False)
+            }
+            for nivel, grupo in df_gazetteer.groupby("Nivel")
+        }
+
+    @classmethod
+    def carregar(cls, arquivo=ARQUIVO_GAZETTEER, arquivo_dim=ARQUIVO_DIM):
+        """
+        Abre o gazetteer compilado, (re)construindo-o a partir da dimensão se
+        ele não existir ou se a dimensão for mais nova que ele.
+        """
+        desatualizado = not os.path.exists(arquivo) or (
+            os.path.exists(arquivo_dim)
+            and os.path.getmtime(arquivo_dim) > os.path.getmtime(arquivo)
+        )
+        if desatualizado:
+            salvar_gazetteer(construir_gazetteer(carregar_pontos(arquivo_dim)), arquivo)
+        return cls(pd.read_csv(arquivo, sep=";", dtype={"Chave": str}))
+
+    def buscar(self, nivel, chave):
+        """Coordenada (lat, lon) de uma chave já normalizada, ou None."""
+        return self.tabelas.get(nivel, {}).get(chave)
+
+    def localizar(self, id_municipio=None, cep=None, bairro=None, rua=None, nome=None):
+        """(latitude, longitude, nivel) da melhor aproximação, ou None."""
+        municipio = str(id_municipio or "").strip()[:6]
+        candidatos = []
+        # Chaves montadas em texto puro: criar Series a cada consulta custava ms
+        if cep:
+            chave = chave_cep_texto(cep)
+            if chave:
+                candidatos.append((NIVEL_CEP, chave))
+        if municipio:
+            locais = {NIVEL_ESTABELECIMENTO: nome, NIVEL_RUA: rua, NIVEL_BAIRRO: bairro}
+            for nivel, valor in locais.items():
+                texto = normalizar_texto(valor)
+                if texto:
+                    candidatos.append((nivel, f"{municipio}|{texto}"))
+            candidatos += [(NIVEL_MUNICIPIO, municipio), (NIVEL_SEDE, municipio)]
+
+        candidatos.sort(key=lambda c: NIVEIS.index(c[0]))
+        for nivel, chave in candidatos:
+            coordenada = self.buscar(nivel, chave)
+            if coordenada is not None:
+                return coordenada[0], coordenada[1], nivel
+        return None
+
+    def localizar_varios(self, df):
+        """
+        Versão vetorizada sobre um DataFrame com ID_Municipio e, se houver,
+        CEP, Rua, Bairro e Nome_Unidade. Retorna DataFrame com Latitude,
+        Longitude e Nivel.
+        """
+        resultado = pd.DataFrame(
+            {"Latitude": float("nan"), "Longitude": float("nan"), "Nivel": None},
+            index=df.index,
+        )
+        municipio = chave_municipio(df["ID_Municipio"])
+        chaves = {
+            NIVEL_CEP: chave_cep(df["CEP"]) if "CEP" in df.columns else None,
+            NIVEL_MUNICIPIO: municipio,
+            NIVEL_SEDE: municipio,
+        }
+        for nivel, coluna in COLUNAS_LOCAIS.items():
+            if coluna in df.columns:
+                chaves[nivel] = chave_local(df[coluna], df["ID_Municipio"])
+        for nivel in NIVEIS:
+            if chaves.get(nivel) is None or nivel not in self.tabelas:
+                continue
+            faltando = resultado["Nivel"].isna()
+            coordenadas = chaves[nivel][faltando].map(self.tabelas[nivel]).dropna()
+            if coordenadas.empty:
+                continue
+            resultado.loc[coordenadas.index, "Latitude"] = coordenadas.str[0]
+            resultado.loc[coordenadas.index, "Longitude"] = coordenadas.str[1]
+            resultado.loc[coordenadas.index, "Nivel"] = nivel
+        return resultado
+
+
+def salvar_gazetteer(df_gazetteer, arquivo=ARQUIVO_GAZETTEER):
+    df_gazetteer.to_csv(arquivo, sep=";", index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Constrói o gazetteer de centroides (CEP, rua, bairro, município)."
+    )
+    parser.add_argument(
+        "extras",
+        nargs="*",
+        help="Arquivos extras no formato do tbEstabelecimento (ex.: estabelecimentos_sergipe.csv)",
+    )
+    parser.add_argument(
+        "--sem-dimensao", action="store_true", help="Não usa a Dim_Unidades_Saude"
+    )
+    parser.add_argument("--saida", default=ARQUIVO_GAZETTEER)
+    args = parser.parse_args()
+
+    pontos = carregar_pontos(None if args.sem_dimensao else ARQUIVO_DIM, args.extras)
+    df_gazetteer = construir_gazetteer(pontos)
+    salvar_gazetteer(df_gazetteer, args.saida)
+
+    print(f"   Pontos usados: {len(pontos)}")
+    for nivel, qtd in (
+        df_gazetteer["Nivel"].value_counts().reindex(NIVEIS).fillna(0).items()
+    ):
+        print(f"   {nivel}: {int(qtd)} centroides")
+    print(f"✅ Gazetteer salvo em '{args.saida}'")
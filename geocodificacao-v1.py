@@ -1,10 +1,13 @@
+import os
 import pandas as pd
-import requests
 import time
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 from tqdm import tqdm
 
+from cliente_cnes import garantir_municipios, obter_estabelecimento
+from resiliencia import ErroExterno
+
 # ============================
 # CONFIGURAÇÕES
 # ============================
@@ -21,16 +24,24 @@ CODIGO_UF = 28
 # Codigo da cidade de Aracaju
 CODIGO_CIDADE = 2800308
 
-# API do CNES
-CNES_API = "https://apidadosabertos.saude.gov.br/cnes/estabelecimentos/"
+# Servidor Nominatim: o público (limite de 1 req/s) ou um compatível local,
+# ex.: NOMINATIM_DOMINIO=127.0.0.1:8080 NOMINATIM_LOCAL=1 com o servidor_nominatim.py
+# rodando. Só NOMINATIM_LOCAL=1 libera http e tira o limite de 1 req/s.
+NOMINATIM_DOMINIO = os.environ.get("NOMINATIM_DOMINIO", "nominatim.openstreetmap.org")
+NOMINATIM_LOCAL = os.environ.get("NOMINATIM_LOCAL", "") not in ("", "0")
 
 # Configura geocodificador
-geolocator = Nominatim(user_agent="geocoding_sus/1.0 (monitorasus@exemplo.com)", timeout=10)
+geolocator = Nominatim(
+    user_agent="geocoding_sus/1.0 (monitorasus@exemplo.com)",
+    timeout=10,
+    domain=NOMINATIM_DOMINIO,
+    scheme="http" if NOMINATIM_LOCAL else "https",
+)
 
-# 2) RateLimiter garante no mínimo 1 segundo entre chamadas (min_delay_seconds=1)
+# 2) RateLimiter garante no mínimo 1 segundo entre chamadas no servidor público
 geocode = RateLimiter(
     geolocator.geocode,
-    min_delay_seconds=1.0,   # respeita o limite público do Nominatim
+    min_delay_seconds=0 if NOMINATIM_LOCAL else 1.0,   # respeita o limite público do Nominatim
     max_retries=2,
     error_wait_seconds=2.0
 )
@@ -41,19 +52,13 @@ geocode = RateLimiter(
 # ============================
 
 def consulta_cnes(cnes):
-    """Consulta a API do CNES e retorna o endereço."""
+    """Consulta o CNES (índice local ou API) e retorna o endereço."""
     try:
-        uri_req = CNES_API + str(int(cnes))
-        resp = requests.get(uri_req)
-        if resp.status_code != 200:
-            return None
-        data = resp.json()
+        est = obter_estabelecimento(cnes)
 
-        if len(data) == 0:
+        if not est:
             return None
 
-        est = data
-
         return {
             "nome": est.get("nome_fantasia", ""),
             "logradouro": est.get("endereco_estabelecimento", ""),
@@ -63,7 +68,7 @@ def consulta_cnes(cnes):
             "municipio": est.get("codigo_municipio", ""),
             "uf": est.get("codigo_uf", "")
         }
-    except:
+    except (ValueError, ErroExterno):
         return None
 
 
@@ -108,6 +113,12 @@ cnes_unicos = df["ID_UNIDADE"].dropna().unique()
 
 print(f"Encontrados {len(cnes_unicos)} CNES em Aracaju.")
 
+# Baixa em lote os estabelecimentos de Aracaju (evita uma chamada por CNES)
+try:
+    garantir_municipios([CODIGO_CIDADE])
+except ErroExterno as e:
+    print(f"Download em lote do CNES falhou, consultando um a um: {e}")
+
 
 # ============================
 # ETAPA 2 — Baixar dados + Geocodificar
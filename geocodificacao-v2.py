@@ -1,10 +1,19 @@
 import pandas as pd
-import requests
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 from tqdm import tqdm
 import os
 
+import cassete
+from cliente_cnes import garantir_municipios, obter_estabelecimento
+from coalescencia import normalizar_consulta
+from resiliencia import (
+    ErroConfiguracao,
+    ErroExterno,
+    ErroPermanente,
+    chamar_com_resiliencia,
+)
+
 # ============================
 # CONFIGURAÇÕES
 # ============================
@@ -13,22 +22,32 @@ INPUT_FILE = "aracaju_sample.csv"
 OUTPUT_FILE = "coordenadas_aracaju.csv"
 CACHE_FILE = "cache_geocode.csv"
 
-CNES_API = "https://apidadosabertos.saude.gov.br/cnes/estabelecimentos/"
-
 # Codigo da UF Sergipe
 CODIGO_UF = 28
 
 # Codigo da cidade de Aracaju
 CODIGO_CIDADE = 2800308
 
+# Servidor Nominatim: o público (limite de 1 req/s) ou um compatível local,
+# ex.: NOMINATIM_DOMINIO=127.0.0.1:8080 NOMINATIM_LOCAL=1 com o servidor_nominatim.py
+# rodando. Só NOMINATIM_LOCAL=1 libera http e tira o limite de 1 req/s.
+NOMINATIM_DOMINIO = os.environ.get("NOMINATIM_DOMINIO", "nominatim.openstreetmap.org")
+NOMINATIM_LOCAL = os.environ.get("NOMINATIM_LOCAL", "") not in ("", "0")
+
 # Configura geocodificador
-geolocator = Nominatim(user_agent="geocoding_sus/1.0 (monitorasus@exemplo.com)", timeout=10)
+geolocator = Nominatim(
+    user_agent="geocoding_sus/1.0 (monitorasus@exemplo.com)",
+    timeout=10,
+    domain=NOMINATIM_DOMINIO,
+    scheme="http" if NOMINATIM_LOCAL else "https",
+)
 
+# Retentativas ficam com a camada de resiliência (erros não são engolidos)
 geocode = RateLimiter(
     geolocator.geocode,
-    min_delay_seconds=1.0,
-    max_retries=2,
-    error_wait_seconds=2.0
+    min_delay_seconds=0 if NOMINATIM_LOCAL else 1.0,
+    max_retries=0,
+    swallow_exceptions=False
 )
 
 # ============================
@@ -57,12 +76,11 @@ print(f"Cache carregado com {len(cache)} entradas.")
 # ============================
 
 def consulta_cnes(cnes):
-    """Consulta a API do CNES e retorna dados relevantes."""
+    """Consulta o CNES (índice local ou API) e retorna dados relevantes."""
     try:
-        resp = requests.get(CNES_API + str(int(cnes)))
-        if resp.status_code != 200:
+        est = obter_estabelecimento(cnes)
+        if not est:
             return None
-        est = resp.json()
 
         return {
             "nome": est.get("nome_fantasia", ""),
@@ -72,7 +90,8 @@ def consulta_cnes(cnes):
             "municipio": est.get("nome_municipio", est.get("codigo_municipio", "")),
             "uf": est.get("codigo_uf", "")
         }
-    except:
+    except ValueError:
+        # CNES inválido
         return None
 
 
@@ -93,14 +112,24 @@ def montar_endereco(info):
     return ", ".join(partes)
 
 
+def consultar_nominatim(endereco):
+    """Chamada ao Nominatim passando pelo cassete; retorna [lat, lon] ou None."""
+    def chamar():
+        loc = geocode(endereco)
+        return [float(loc.latitude), float(loc.longitude)] if loc else None
+
+    return cassete.interceptar("nominatim", normalizar_consulta(endereco), chamar)
+
+
 def geocodificar(endereco):
+    """Geocodifica no Nominatim; falhas do serviço sobem como ErroExterno."""
     try:
         if not endereco:
             return None, None
-        loc = geocode(str(endereco))
-        if loc:
-            return float(loc.latitude), float(loc.longitude)
-    except:
+        coordenadas = chamar_com_resiliencia("nominatim", consultar_nominatim, str(endereco))
+        if coordenadas:
+            return coordenadas[0], coordenadas[1]
+    except ErroPermanente:
         pass
     return None, None
 
@@ -148,6 +177,12 @@ cnes_unicos = df["ID_UNIDADE"].dropna().unique()
 
 print(f"Processando {len(cnes_unicos)} CNES únicos...")
 
+# Baixa em lote os estabelecimentos de Aracaju (evita uma chamada por CNES)
+try:
+    garantir_municipios([CODIGO_CIDADE])
+except ErroExterno as e:
+    print(f"Download em lote do CNES falhou, consultando um a um: {e}")
+
 resultados = []
 
 for cnes in tqdm(cnes_unicos):
@@ -163,7 +198,11 @@ for cnes in tqdm(cnes_unicos):
         continue
 
     # 2 — Consultar CNES
-    info = consulta_cnes(cnes)
+    try:
+        info = consulta_cnes(cnes)
+    except ErroExterno:
+        # Serviço fora do ar: tenta de novo na próxima execução
+        continue
     if info is None:
         continue
 
@@ -174,7 +213,15 @@ for cnes in tqdm(cnes_unicos):
         info['municipio'] = "Aracaju"
 
     # 3 — Geocodificar com fallback
-    lat, lon, usado = geocodificar_melhorado(info)
+    try:
+        lat, lon, usado = geocodificar_melhorado(info)
+    except ErroConfiguracao as e:
+        # Servidor recusou o acesso: para e salva o que já foi feito
+        print(f"Nominatim recusou o acesso: {e}")
+        break
+    except ErroExterno:
+        # Falha transitória/cota não vira "não encontrado" no cache
+        continue
 
     resultados.append({
         "ID_UNIDADE": cnes,
@@ -199,13 +246,15 @@ for cnes in tqdm(cnes_unicos):
 df_final = pd.DataFrame(resultados)
 df_final.to_csv(OUTPUT_FILE, index=False)
 
-# Atualizar cache
-cache_df = pd.DataFrame([
-    {"ID_UNIDADE": k, "lat": v["lat"], "lon": v["lon"], "endereco_usado": v["endereco_usado"]}
-    for k, v in cache.items()
-])
-cache_df.to_csv(CACHE_FILE, index=False)
+# Atualizar cache (no modo de reprodução do cassete o cache de produção fica intacto)
+if not cassete.reproduzindo():
+    cache_df = pd.DataFrame([
+        {"ID_UNIDADE": k, "lat": v["lat"], "lon": v["lon"], "endereco_usado": v["endereco_usado"]}
+        for k, v in cache.items()
+    ])
+    cache_df.to_csv(CACHE_FILE, index=False)
 
 print("\nProcesso concluído.")
 print(f"Arquivo gerado: {OUTPUT_FILE}")
-print(f"Cache atualizado: {CACHE_FILE}")
+if not cassete.reproduzindo():
+    print(f"Cache atualizado: {CACHE_FILE}")
@@ -1,8 +1,11 @@
 import pandas as pd
-import requests
-import googlemaps
 import os
 
+import cassete
+import cliente_google
+from cliente_cnes import garantir_municipios, obter_estabelecimento
+from resiliencia import ErroConfiguracao, ErroExterno, ErroPermanente
+
 # ============================
 # CONFIGURAÇÕES
 # ============================
@@ -11,10 +14,7 @@ INPUT_FILE = "aracaju_sample.csv"
 OUTPUT_FILE = "coordenadas_aracaju_google_maps.csv"
 CACHE_FILE = "cache_geocode.csv"
 
-CNES_API = "https://apidadosabertos.saude.gov.br/cnes/estabelecimentos/"
-
 GOOGLE_API_KEY = "preencher"
-gmaps = googlemaps.Client(key=GOOGLE_API_KEY)
 
 CODIGO_UF = 28        # Sergipe
 CODIGO_CIDADE = 2800308   # Aracaju
@@ -53,14 +53,16 @@ def valor_preenchido(v):
 
 
 def consulta_cnes(cnes):
-    """Consulta a API do CNES e retorna dados do estabelecimento."""
+    """
+    Consulta o CNES (índice local ou API) e retorna dados do estabelecimento.
+
+    Falhas do serviço sobem como ErroExterno (não são "não encontrado").
+    """
     try:
-        resp = requests.get(CNES_API + str(int(cnes)))
-        if resp.status_code != 200:
+        est = obter_estabelecimento(cnes)
+        if not est:
             return None
 
-        est = resp.json()
-
         return {
             "nome": est.get("nome_fantasia", ""),
             "logradouro": est.get("endereco_estabelecimento", ""),
@@ -69,7 +71,8 @@ def consulta_cnes(cnes):
             "municipio": est.get("nome_municipio", est.get("codigo_municipio", "")),
             "uf": est.get("codigo_uf", "")
         }
-    except:
+    except ValueError:
+        # CNES inválido
         return None
 
 
@@ -91,12 +94,16 @@ def montar_endereco(info):
 
 
 def geocodificar_google(endereco):
-    """Geocodifica usando a API do Google Maps."""
+    """
+    Geocodifica usando a API do Google Maps.
+
+    Erros transitórios, de cota ou disjuntor aberto sobem como ErroExterno.
+    """
     try:
         if not endereco:
             return None, None
 
-        resultado = gmaps.geocode(endereco)
+        resultado = cliente_google.geocodificar(endereco, chave=GOOGLE_API_KEY)
 
         if resultado and len(resultado) > 0:
             loc = resultado[0]["geometry"]["location"]
@@ -104,7 +111,7 @@ def geocodificar_google(endereco):
 
         return None, None
 
-    except Exception as e:
+    except ErroPermanente as e:
         print(f"[ERRO GOOGLE] {e} | Endereço: {endereco}")
         return None, None
 
@@ -146,6 +153,12 @@ cnes_unicos = df["ID_UNIDADE"].dropna().unique()
 
 print(f"Processando {len(cnes_unicos)} CNES únicos...\n")
 
+# Baixa em lote os estabelecimentos de Aracaju (evita uma chamada por CNES)
+try:
+    garantir_municipios([CODIGO_CIDADE])
+except ErroExterno as e:
+    print(f"[AVISO] Download em lote do CNES falhou, consultando um a um: {e}")
+
 resultados = []
 
 for cnes in cnes_unicos:
@@ -171,12 +184,17 @@ for cnes in cnes_unicos:
             print(f"[CACHE INCOMPLETO] CNES {cnes}: recalculando...")
 
     # 2 — Consulta CNES
-    info = consulta_cnes(cnes)
+    try:
+        info = consulta_cnes(cnes)
+    except ErroExterno as e:
+        # Falha do serviço: não grava nada, tenta de novo na próxima execução
+        print(f"[CNES INDISPONÍVEL] CNES {cnes}: {e}")
+        continue
 
     if info is None:
         print(f"[ERRO CNES] Não encontrado para CNES {cnes}")
         resultados.append({
-            "ID_UNIDADE": cnes, "nome": info['nome'], "lat": None, "lon": None, "endereco_usado": None
+            "ID_UNIDADE": cnes, "nome": None, "lat": None, "lon": None, "endereco_usado": None
         })
         continue
 
@@ -187,7 +205,16 @@ for cnes in cnes_unicos:
         info["municipio"] = "Aracaju"
 
     # 3 — Geocodificação
-    lat, lon, usado = geocodificar_melhorado(info)
+    try:
+        lat, lon, usado = geocodificar_melhorado(info)
+    except ErroConfiguracao as e:
+        # Chave recusada/API desabilitada: para e salva o que já foi feito
+        print(f"[GOOGLE RECUSOU A CHAVE] {e}")
+        break
+    except ErroExterno as e:
+        # Timeout/5xx/cota: não envenena o cache com "não encontrado"
+        print(f"[GOOGLE INDISPONÍVEL] CNES {cnes}: {e}")
+        continue
 
     if lat is None:
         print(f"[FALHA] CNES {cnes}: nenhuma tentativa funcionou")
@@ -216,18 +243,21 @@ for cnes in cnes_unicos:
 df_final = pd.DataFrame(resultados)
 df_final.to_csv(OUTPUT_FILE, index=False)
 
-cache_df = pd.DataFrame([
-    {
-        "ID_UNIDADE": k,
-        "nome": v.get("nome"),
-        "lat": v.get("lat"),
-        "lon": v.get("lon"),
-        "endereco_usado": v.get("endereco_usado")
-    }
-    for k, v in cache.items()
-])
-cache_df.to_csv(CACHE_FILE, index=False)
+# No modo de reprodução do cassete o cache de produção fica intacto
+if not cassete.reproduzindo():
+    cache_df = pd.DataFrame([
+        {
+            "ID_UNIDADE": k,
+            "nome": v.get("nome"),
+            "lat": v.get("lat"),
+            "lon": v.get("lon"),
+            "endereco_usado": v.get("endereco_usado")
+        }
+        for k, v in cache.items()
+    ])
+    cache_df.to_csv(CACHE_FILE, index=False)
 
 print("\nProcesso concluído.")
 print(f"Arquivo gerado: {OUTPUT_FILE}")
-print(f"Cache atualizado: {CACHE_FILE}")
+if not cassete.reproduzindo():
+    print(f"Cache atualizado: {CACHE_FILE}")
@@ -0,0 +1,415 @@
+import os
+import threading
+import time
+
+import cassete
+import cliente_google
+from coalescencia import normalizar_consulta
+from gazetteer import (
+    NIVEL_BAIRRO,
+    NIVEL_CEP,
+    NIVEL_ESTABELECIMENTO,
+    NIVEL_MUNICIPIO,
+    NIVEL_RUA,
+    NIVEL_SEDE,
+    PREFIXO_CORRESPONDENCIA,
+)
+from resiliencia import ErroCota, ErroExterno, ErroPermanente, chamar_com_resiliencia
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+# Confiança mínima para aceitar uma resposta sem escalar para o próximo provedor
+CONFIANCA_MINIMA = 0.8
+
+# Peso da última medida na latência média (média móvel exponencial)
+PESO_LATENCIA = 0.2
+
+# Confiança por nível do gazetteer. Nenhum nível chega à CONFIANCA_MINIMA: nomes
+# de rede e genéricos ("UBS", "FARMACIA ...") erram km, então o gazetteer nunca
+# dispensa o Google (a resposta dele só fica quando o Google não acha)
+CONFIANCA_GAZETTEER = {
+    NIVEL_ESTABELECIMENTO: 0.75,
+    NIVEL_CEP: 0.7,
+    NIVEL_RUA: 0.6,
+    NIVEL_BAIRRO: 0.4,
+    NIVEL_MUNICIPIO: 0.2,
+    NIVEL_SEDE: 0.1,
+}
+
+# Confiança pelo location_type do Google
+CONFIANCA_GOOGLE = {
+    "ROOFTOP": 0.95,
+    "RANGE_INTERPOLATED": 0.85,
+    "GEOMETRIC_CENTER": 0.7,
+    "APPROXIMATE": 0.3,
+}
+
+# Confiança pelo tamanho da boundingbox do Nominatim (maior lado, em graus)
+CONFIANCA_NOMINATIM = [(0.002, 0.9), (0.01, 0.7), (0.05, 0.4)]
+CONFIANCA_NOMINATIM_MINIMA = 0.2
+
+NOMINATIM_DOMINIO = os.environ.get("NOMINATIM_DOMINIO", "nominatim.openstreetmap.org")
+# Servidor local (servidor_nominatim.py): http e sem limite de taxa; só com opt-in
+NOMINATIM_LOCAL = os.environ.get("NOMINATIM_LOCAL", "") not in ("", "0")
+
+
+# ============================
+# RESULTADO E LIMITE DE TAXA
+# ============================
+
+
+class Resultado:
+    """Coordenada encontrada por um provedor."""
+
+    def __init__(self, lat, lon, confianca, provedor, tipo, endereco=None):
+        self.lat = lat
+        self.lon = lon
+        self.confianca = confianca
+        self.provedor = provedor
+        self.tipo = tipo  # como foi achada (ex.: "Nome + Endereco", "Gazetteer_CEP")
+        self.endereco = endereco
+        # False quando algum provedor foi pulado (cota, orçamento, falha):
+        # uma resposta fraca assim não deve ser gravada como definitiva
+        self.completo = True
+
+
+class LimitadorTaxa:
+    """Garante um intervalo mínimo entre chamadas (seguro entre threads)."""
+
+    def __init__(self, requisicoes_por_segundo=None):
+        self.intervalo = (
+            1.0 / requisicoes_por_segundo if requisicoes_por_segundo else 0.0
+        )
+        self._proxima = 0.0
+        self._trava = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self._trava:
+            agora = time.monotonic()
+            espera = self._proxima - agora
+            self._proxima = max(agora, self._proxima) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+# ============================
+# PROVEDORES
+# ============================
+
+
+class Provedor:
+    """
+    Interface de um provedor de geocodificação.
+
+    `consulta` é um dict com nome, rua, numero, bairro, cep, id_municipio,
+    cidade e uf (campos ausentes valem vazio). `geocodificar` devolve um
+    Resultado, None quando não acha, ou levanta ErroExterno.
+    """
+
+    nome = "?"
+    custo_por_requisicao = 0.0
+
+    def __init__(self, requisicoes_por_segundo=None):
+        self.limitador = LimitadorTaxa(requisicoes_por_segundo)
+        self.latencia_media = 0.0
+        self.chamadas = 0
+        self.respostas = 0
+        self.reprovadas = 0  # respostas recusadas pela validação do roteador
+        self.requisicoes = 0
+        self.esgotado = False  # cota ou orçamento acabou nesta execução
+
+    def disponivel(self, consulta):
+        return not self.esgotado
+
+    def geocodificar(self, consulta):
+        raise NotImplementedError
+
+    def registrar_latencia(self, segundos):
+        if self.chamadas == 1:
+            self.latencia_media = segundos
+        else:
+            self.latencia_media += PESO_LATENCIA * (segundos - self.latencia_media)
+
+    def custo(self):
+        return self.requisicoes * self.custo_por_requisicao
+
+
+class ProvedorGazetteer(Provedor):
+    """Centroides locais (gazetteer.py): grátis, sem rede, precisão variável."""
+
+    nome = "Gazetteer"
+
+    def __init__(self, gazetteer):
+        super().__init__()
+        self.gazetteer = gazetteer
+
+    def geocodificar(self, consulta):
+        localizado = self.gazetteer.localizar(
+            consulta.get("id_municipio"),
+            consulta.get("cep"),
+            consulta.get("bairro"),
+            rua=consulta.get("rua"),
+            nome=consulta.get("nome"),
+        )
+        if not localizado:
+            return None
+        lat, lon, nivel = localizado
+        return Resultado(
+            lat,
+            lon,
+            CONFIANCA_GAZETTEER[nivel],
+            self.nome,
+            PREFIXO_CORRESPONDENCIA + nivel,
+        )
+
+
+class ProvedorNominatim(Provedor):
+    """Nominatim público (1 req/s) ou compatível local (servidor_nominatim.py)."""
+
+    nome = "Nominatim"
+
+    def __init__(
+        self, dominio=NOMINATIM_DOMINIO, requisicoes_por_segundo=None, local=NOMINATIM_LOCAL
+    ):
+        from geopy.geocoders import Nominatim
+
+        if requisicoes_por_segundo is None and not local:
+            requisicoes_por_segundo = 1.0  # política do servidor público
+        super().__init__(requisicoes_por_segundo)
+        self.geolocator = Nominatim(
+            user_agent="geocoding_sus/1.0 (monitorasus@exemplo.com)",
+            timeout=10,
+            domain=dominio,
+            scheme="http" if local else "https",
+        )
+
+    def _consultar(self, endereco):
+        def chamar():
+            self.limitador.aguardar()
+            self.requisicoes += 1
+            loc = self.geolocator.geocode(endereco)
+            if not loc:
+                return None
+            return [
+                float(loc.latitude),
+                float(loc.longitude),
+                loc.raw.get("boundingbox"),
+            ]
+
+        return cassete.interceptar("nominatim", normalizar_consulta(endereco), chamar)
+
+    def geocodificar(self, consulta):
+        partes = [consulta.get(c) for c in ("rua", "numero", "bairro", "cidade", "uf")]
+        endereco = ", ".join(str(p).strip() for p in partes if p and str(p).strip())
+        if not consulta.get("rua") or not endereco:
+            return None
+        try:
+            achado = chamar_com_resiliencia("nominatim", self._consultar, endereco)
+        except ErroPermanente:
+            return None
+        if not achado:
+            return None
+
+        # Gravações antigas do cassete guardam só [lat, lon]
+        lat, lon = achado[0], achado[1]
+        caixa = achado[2] if len(achado) > 2 else None
+        confianca = CONFIANCA_NOMINATIM_MINIMA
+        if caixa:
+            lado = max(
+                abs(float(caixa[1]) - float(caixa[0])),
+                abs(float(caixa[3]) - float(caixa[2])),
+            )
+            confianca = next(
+                (c for limite, c in CONFIANCA_NOMINATIM if lado <= limite),
+                CONFIANCA_NOMINATIM_MINIMA,
+            )
+        return Resultado(lat, lon, confianca, self.nome, "Nominatim", endereco)
+
+
+class ProvedorGoogle(Provedor):
+    """
+    Google Geocoding (pago): até três tentativas por unidade, debitadas do
+    Orcamento mensal. A unidade só começa se houver orçamento para todas.
+    """
+
+    nome = "Google"
+    custo_por_requisicao = 0.005  # Geocoding API: US$ 5 por 1000
+
+    def __init__(self, chave, orcamento=None, requisicoes_por_segundo=None):
+        super().__init__(requisicoes_por_segundo)
+        self.chave = chave
+        self.orcamento = orcamento
+        if orcamento is not None:
+            self.custo_por_requisicao = orcamento.custo_por_requisicao
+
+    @staticmethod
+    def montar_tentativas(consulta):
+        nome = consulta.get("nome") or ""
+        rua = consulta.get("rua") or ""
+        numero = consulta.get("numero") or ""
+        bairro = consulta.get("bairro") or ""
+        cidade = consulta.get("cidade") or ""
+        uf = consulta.get("uf") or ""
+
+        tentativas = []
+        # Tentativa 1: Nome + Endereço + Cidade (O mais preciso)
+        if nome and rua:
+            tentativas.append(
+                (f"{nome}, {rua}, {numero}, {cidade} - {uf}, Brasil", "Nome + Endereco")
+            )
+        # Tentativa 2: Nome + Bairro + Cidade (Ótimo para Postos de Saúde conhecidos)
+        if nome and bairro:
+            tentativas.append(
+                (f"{nome}, {bairro}, {cidade} - {uf}, Brasil", "Nome + Bairro")
+            )
+        # Tentativa 3: Apenas Endereço (Se o nome estiver errado no Google)
+        if rua:
+            tentativas.append(
+                (
+                    f"{rua}, {numero}, {bairro}, {cidade} - {uf}, Brasil",
+                    "Apenas Endereco",
+                )
+            )
+        return tentativas
+
+    def disponivel(self, consulta):
+        if self.esgotado:
+            return False
+        necessarias = len(self.montar_tentativas(consulta))
+        if self.orcamento is not None and not self.orcamento.pode_gastar(necessarias):
+            self.esgotado = True
+            return False
+        return True
+
+    def geocodificar(self, consulta):
+        """
+        Primeira tentativa que acha vence. None só quando todas responderam
+        ZERO_RESULTS; se alguma foi recusada, o erro sobe para a unidade não
+        ser gravada como não encontrada. Chave recusada (ErroConfiguracao)
+        interrompe a execução.
+        """
+        if not consulta.get("cidade"):
+            return None  # sem cidade, impossível achar
+
+        recusa = None
+        for query, tipo in self.montar_tentativas(consulta):
+            self.limitador.aguardar()
+            if self.orcamento is not None:
+                self.orcamento.registrar()
+            self.requisicoes += 1
+            try:
+                # Region 'br' ajuda a priorizar resultados no Brasil
+                resultado = cliente_google.geocodificar(
+                    query, chave=self.chave, region="br", language="pt-BR"
+                )
+            except ErroPermanente as e:
+                print(f"\n[ERRO API] {e}")
+                recusa = e
+                continue
+            if resultado:
+                geometria = resultado[0]["geometry"]
+                confianca = CONFIANCA_GOOGLE.get(geometria.get("location_type"), 0.8)
+                return Resultado(
+                    geometria["location"]["lat"],
+                    geometria["location"]["lng"],
+                    confianca,
+                    self.nome,
+                    tipo,
+                    resultado[0].get("formatted_address", ""),
+                )
+        if recusa is not None:
+            raise recusa
+        return None
+
+
+# ============================
+# ROTEADOR
+# ============================
+
+
+class Roteador:
+    """
+    Escolhe o provedor: os mais baratos e rápidos primeiro (custo por
+    requisição, depois latência média observada). Escala para o próximo
+    quando não acha, quando a confiança fica abaixo do mínimo ou quando o
+    provedor falha. Devolve a melhor resposta obtida, marcando `completo`
+    como False se algum provedor teve de ser pulado.
+
+    Com `validar(consulta, resultado)`, a resposta reprovada (ex.: fora do
+    município) conta como não encontrada e a busca segue para o próximo.
+    """
+
+    def __init__(self, provedores, confianca_minima=CONFIANCA_MINIMA, validar=None):
+        self.provedores = list(provedores)
+        self.confianca_minima = confianca_minima
+        self.validar = validar
+        self.consultas = 0
+        self.tempo_total = 0.0
+
+    def ordenados(self):
+        return sorted(
+            self.provedores, key=lambda p: (p.custo_por_requisicao, p.latencia_media)
+        )
+
+    def geocodificar(self, consulta):
+        inicio = time.perf_counter()
+        self.consultas += 1
+        melhor = None
+        completo = True
+
+        for provedor in self.ordenados():
+            if not provedor.disponivel(consulta):
+                completo = False
+                continue
+
+            provedor.chamadas += 1
+            t0 = time.perf_counter()
+            try:
+                resultado = provedor.geocodificar(consulta)
+            except ErroCota as e:
+                print(f"\n[COTA] {provedor.nome}: {e}")
+                provedor.esgotado = True
+                completo = False
+                continue
+            except ErroExterno as e:
+                print(f"\n[INDISPONÍVEL] {provedor.nome}: {e}")
+                completo = False
+                continue
+            finally:
+                provedor.registrar_latencia(time.perf_counter() - t0)
+
+            if resultado is None:
+                continue
+            if self.validar is not None and not self.validar(consulta, resultado):
+                provedor.reprovadas += 1
+                continue
+            provedor.respostas += 1
+            if melhor is None or resultado.confianca > melhor.confianca:
+                melhor = resultado
+            if resultado.confianca >= self.confianca_minima:
+                break
+
+        self.tempo_total += time.perf_counter() - inicio
+        if melhor is not None:
+            melhor.completo = completo or melhor.confianca >= self.confianca_minima
+        return melhor, completo
+
+    def resumo(self):
+        """Estatísticas por provedor: chamadas, respostas, latência e custo."""
+        linhas = []
+        for p in self.ordenados():
+            linhas.append(
+                f"   {p.nome}: {p.chamadas} consultas, {p.respostas} respostas, "
+                f"{p.reprovadas} reprovadas, "
+                f"{p.requisicoes} requisições, "
+                f"latência média {p.latencia_media * 1000:.0f} ms, "
+                f"US$ {p.custo():.2f}"
+            )
+        if self.consultas:
+            media = self.tempo_total / self.consultas * 1000
+            linhas.append(f"   Tempo médio por unidade: {media:.0f} ms")
+        return linhas
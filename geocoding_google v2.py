@@ -1,10 +1,13 @@
 import os
-import time
 
-import googlemaps
 import pandas as pd
 from tqdm import tqdm
 
+import cliente_google
+from arquivos import salvar_csv_atomico
+from assinatura_endereco import calcular_assinatura
+from resiliencia import ErroConfiguracao, ErroCota, ErroExterno, ErroPermanente
+
 # ============================
 # CONFIGURAÇÕES
 # ============================
@@ -26,8 +29,6 @@ def executar_geocodificacao_segura():
         print("❌ Configure sua API KEY no script.")
         return
 
-    gmaps = googlemaps.Client(key=GOOGLE_API_KEY)
-
     # 1. Ler arquivo original (Somente Leitura)
     print("   Lendo arquivo original...")
     df_cnes = pd.read_csv(ARQUIVO_ORIGINAL, sep=";", dtype=str)
@@ -37,17 +38,39 @@ def executar_geocodificacao_segura():
     dict_cidades = dict(zip(df_mun["ID_Municipio"], df_mun["Municipio"]))
     dict_ufs = dict(zip(df_mun["ID_Municipio"], df_mun["UF"]))
 
+    # Assinatura do endereço atual de cada unidade
+    df_cnes["Assinatura"] = calcular_assinatura(df_cnes)
+
     # 3. Carregar o que já fizemos no arquivo Delta (para não repetir)
-    cnes_ja_processados = set()
+    # Um CNES só conta como processado se o endereço não mudou desde então
+    chaves_ja_processadas = set()
     if os.path.exists(ARQUIVO_SAIDA_DELTA):
         df_delta = pd.read_csv(ARQUIVO_SAIDA_DELTA, sep=";", dtype=str)
-        cnes_ja_processados = set(df_delta["CNES"].unique())
+        if "Assinatura" not in df_delta.columns:
+            df_delta["Assinatura"] = None
+        # Delta antigo (sem assinatura): adota uma única vez a assinatura atual,
+        # para que mudanças de endereço a partir de agora invalidem o registro
+        mask_sem_assinatura = df_delta["Assinatura"].isna()
+        if mask_sem_assinatura.any():
+            assinatura_atual = df_cnes.drop_duplicates(
+                subset=["CNES"], keep="last"
+            ).set_index("CNES")["Assinatura"]
+            df_delta.loc[mask_sem_assinatura, "Assinatura"] = df_delta.loc[
+                mask_sem_assinatura, "CNES"
+            ].map(assinatura_atual)
+            salvar_csv_atomico(df_delta, ARQUIVO_SAIDA_DELTA, sep=";", index=False)
+        # CNES fora da dimensão continua sem assinatura e não casa com nenhuma
+        # chave, ou seja, é tratado como obsoleto
+        validas = df_delta["Assinatura"].notna()
+        chaves_ja_processadas = set(
+            df_delta.loc[validas, "CNES"] + "|" + df_delta.loc[validas, "Assinatura"]
+        )
         print(
-            f"   Já existem {len(cnes_ja_processados)} registros processados no arquivo de saída."
+            f"   Já existem {df_delta['CNES'].nunique()} registros processados no arquivo de saída."
         )
 
     # 4. Filtrar Pendentes
-    # Critério: Lat vazia no original E CNES não está no arquivo Delta
+    # Critério: Lat vazia no original E (CNES, Assinatura) não está no arquivo Delta
     mask_vazio = (
         (df_cnes["Latitude"].isna())
         | (df_cnes["Latitude"] == "")
@@ -55,8 +78,9 @@ def executar_geocodificacao_segura():
     )
     df_pendentes = df_cnes[mask_vazio].copy()
 
-    # Remove os que já estão no Delta
-    df_pendentes = df_pendentes[~df_pendentes["CNES"].isin(cnes_ja_processados)]
+    # Remove os que já estão no Delta com o mesmo endereço
+    chaves = df_pendentes["CNES"] + "|" + df_pendentes["Assinatura"]
+    df_pendentes = df_pendentes[~chaves.isin(chaves_ja_processadas)]
 
     total = len(df_pendentes)
     print(f"   Total para processar agora: {total}")
@@ -98,19 +122,30 @@ def executar_geocodificacao_segura():
             queries.append(f"{rua}, {numero}, {bairro}, {cidade} - {uf}, Brasil")
 
         lat_found, long_found, end_found = None, None, None
-
-        for q in queries:
-            try:
-                res = gmaps.geocode(q, region="br")
+        interromper = False
+
+        # Retentativas com backoff e disjuntor ficam no cliente_google
+        try:
+            for q in queries:
+                try:
+                    res = cliente_google.geocodificar(q, chave=GOOGLE_API_KEY, region="br")
+                except ErroPermanente:
+                    continue  # Consulta recusada: tenta a próxima
                 if res:
                     loc = res[0]["geometry"]["location"]
                     lat_found = str(loc["lat"])
                     long_found = str(loc["lng"])
                     end_found = res[0]["formatted_address"]
                     break
-            except:
-                time.sleep(1)  # Backoff simples em caso de erro
-                continue
+        except ErroCota as e:
+            print(f"\n[COTA] {e}. Interrompendo; o restante fica para a próxima execução.")
+            interromper = True
+        except ErroConfiguracao as e:
+            print(f"\n❌ [CONFIGURAÇÃO] {e}. Verifique a chave e a API habilitada.")
+            interromper = True
+        except ErroExterno as e:
+            # Falha transitória ou disjuntor aberto: a unidade continua pendente
+            print(f"\n[INDISPONÍVEL] CNES {row['CNES']}: {e}")
 
         if lat_found:
             novos_achados.append(
@@ -119,6 +154,7 @@ def executar_geocodificacao_segura():
                     "Latitude_Nova": lat_found,
                     "Longitude_Nova": long_found,
                     "Endereco_Google": end_found,
+                    "Assinatura": row["Assinatura"],
                 }
             )
 
@@ -136,6 +172,9 @@ def executar_geocodificacao_segura():
 
             novos_achados = []  # Limpa buffer
 
+        if interromper:
+            break
+
     # Salva o resto do buffer no final
     if novos_achados:
         df_temp = pd.DataFrame(novos_achados)
@@ -1,10 +1,37 @@
+import argparse
+import glob
 import os
 import time
+from datetime import datetime
 
-import googlemaps
 import pandas as pd
 from tqdm import tqdm
 
+import cassete
+import cliente_google
+from arquivos import salvar_csv_atomico
+from assinatura_endereco import calcular_assinatura, comparar_assinaturas
+from base_coordenadas import compilar_da_dimensao
+from cdc_dim_unidades import registrar_e_informar
+from coordenadas import aplicar_qualidade, avaliar_coordenadas, coordenada_pendente
+from fila_geocodificacao import (
+    ARQUIVO_CONSUMO,
+    Orcamento,
+    contar_notificacoes_por_cnes,
+    incorporar_consumo,
+    particao_por_cnes,
+    priorizar_pendentes,
+)
+from gazetteer import PREFIXO_CORRESPONDENCIA, Gazetteer
+from geocodificador import (
+    ProvedorGazetteer,
+    ProvedorGoogle,
+    ProvedorNominatim,
+    Roteador,
+)
+from resiliencia import ErroConfiguracao
+from validar_poligonos import aplicar_validacao, fora_do_poligono
+
 # ============================
 # CONFIGURAÇÕES
 # ============================
@@ -15,6 +42,7 @@ GOOGLE_API_KEY = "preencher"
 PASTA_TRATADOS = "Dados_Tratados"
 ARQUIVO_CNES_ENTRADA = os.path.join(PASTA_TRATADOS, "Dim_Unidades_Saude.csv")
 ARQUIVO_MUNICIPIOS = os.path.join(PASTA_TRATADOS, "Dim_Geografia.csv")
+ARQUIVO_FATO = os.path.join(PASTA_TRATADOS, "Fato_Dengue_Consolidada.csv")
 ARQUIVO_SAIDA_DELTA = "novas_coordenadas_google.csv"
 ARQUIVO_CACHE = (
     "cache_google_maps.csv"  # Cache separado para não misturar com Nominatim
@@ -23,24 +51,94 @@ ARQUIVO_CACHE = (
 # Salvar a cada X registros para garantir segurança
 TAMANHO_LOTE_SALVAMENTO = 50
 
+# Orçamento mensal do Google (None = sem limite). A fila é ordenada pelo
+# número de notificações de cada unidade e para quando o orçamento acaba.
+ORCAMENTO_REQUISICOES_MES = 10000
+ORCAMENTO_CUSTO_MES_USD = None
+CUSTO_POR_REQUISICAO_USD = 0.005  # Geocoding API: US$ 5 por 1000
+
+# Unidade buscada sem sucesso (não é repetida enquanto o endereço não mudar)
+TIPO_NAO_ENCONTRADO = "Nao_Encontrado"
+
+# Provedores consultados antes do Google, do mais barato para o mais caro.
+# O gazetteer (sem custo e sem rede) responde primeiro; o Google só é pago
+# quando os gratuitos não acham ou acham com confiança abaixo do mínimo.
+USAR_GAZETTEER = True
+# Nominatim só entra com um servidor configurado
+# (ex.: NOMINATIM_DOMINIO=127.0.0.1:8080 NOMINATIM_LOCAL=1)
+USAR_NOMINATIM = bool(os.environ.get("NOMINATIM_DOMINIO"))
+
+# Modo particionado (--shard i/N): cada worker grava só a sua partição e o seu
+# diário; o --mesclar junta tudo no cache e na Dim_Unidades_Saude
+PASTA_PARTICOES = os.path.join(PASTA_TRATADOS, "particoes")
+
 # ============================
 # PREPARAÇÃO
 # ============================
 
-if not GOOGLE_API_KEY or GOOGLE_API_KEY == "SUA_CHAVE_AQUI_VC_PEGA_NO_GOOGLE_CLOUD":
-    print("❌ ERRO: Você precisa editar o script e colocar sua GOOGLE_API_KEY.")
-    exit()
 
-try:
-    gmaps = googlemaps.Client(key=GOOGLE_API_KEY)
-except Exception as e:
-    print(f"❌ Erro ao iniciar cliente Google: {e}")
-    exit()
+def preparar_cliente(chave):
+    if not chave or chave == "SUA_CHAVE_AQUI_VC_PEGA_NO_GOOGLE_CLOUD":
+        print("❌ ERRO: Você precisa editar o script e colocar sua GOOGLE_API_KEY.")
+        exit()
+
+    # No modo de reprodução (MODO_CASSETE=reproduzir) nenhuma chamada real é feita
+    if not cassete.reproduzindo():
+        try:
+            cliente_google.obter_cliente(chave)
+        except Exception as e:
+            print(f"❌ Erro ao iniciar cliente Google: {e}")
+            exit()
+
+
+def arquivos_particao(indice, total):
+    """Caminhos da partição de resultados, do diário e do consumo do worker i/N."""
+    base = os.path.join(PASTA_PARTICOES, f"google_{indice}de{total}")
+    return f"{base}_cache.csv", f"{base}_diario.csv", f"{base}_consumo.csv"
+
+
+def registrar_no_diario(arquivo, cnes, resultado, tipo_busca=""):
+    """Acrescenta uma linha ao diário do worker (gravada na hora, sobrevive a quedas)."""
+    novo = not os.path.exists(arquivo)
+    with open(arquivo, "a", encoding="utf-8") as f:
+        if novo:
+            f.write("CNES;Resultado;Tipo_Busca;Horario\n")
+        f.write(f"{cnes};{resultado};{tipo_busca or ''};{datetime.now().isoformat(timespec='seconds')}\n")
+
+
+def salvar_dimensao(df_cnes):
+    """Grava a Dim_Unidades_Saude com as flags de qualidade recalculadas."""
+    aplicar_qualidade(df_cnes, corrigir_invertidas=False)
+    aplicar_validacao(df_cnes)
+    df_cnes.to_csv(ARQUIVO_CNES_ENTRADA, sep=";", index=False)
+
+
+def informar_base_coordenadas():
+    """Recompila a base binária de coordenadas a partir da dimensão e do cache gravados."""
+    qtd = compilar_da_dimensao(ARQUIVO_CNES_ENTRADA, ARQUIVO_CACHE)
+    print(f"   🗂️ Base de coordenadas compilada: {qtd} unidades.")
+
+
+def coordenada_aprovada(df_cache, id_municipio):
+    """Coordenadas do cache aprovadas na qualidade (caixa e, havendo malha, polígono)."""
+    df = df_cache.assign(ID_Municipio=id_municipio)
+    aprovada = avaliar_coordenadas(df, col_lat="Lat_Google", col_lon="Long_Google")[
+        "Coord_Valida"
+    ]
+    return aprovada & ~fora_do_poligono(df, col_lat="Lat_Google", col_lon="Long_Google")
+
+
+def resultado_aprovado(consulta, resultado):
+    """Resposta do roteador passa na mesma qualidade do cache (antes de ir para ele)."""
+    df = pd.DataFrame(
+        {"Lat_Google": [str(resultado.lat)], "Long_Google": [str(resultado.lon)]}
+    )
+    return bool(coordenada_aprovada(df, consulta.get("id_municipio")).iloc[0])
 
 
-def carregar_cache():
-    if os.path.exists(ARQUIVO_CACHE):
-        return pd.read_csv(ARQUIVO_CACHE, sep=";", dtype=str)
+def carregar_cache(caminho=ARQUIVO_CACHE):
+    if os.path.exists(caminho):
+        return pd.read_csv(caminho, sep=";", dtype=str)
     return pd.DataFrame(
         columns=[
             "CNES",
@@ -48,29 +146,128 @@ def carregar_cache():
             "Long_Google",
             "Endereco_Formatado_Google",
             "Tipo_Busca",
+            "Assinatura",
+            "Provedor",
+            "Confianca",
         ]
     )
 
 
-def geocodificar_google_try(query):
-    """Tenta geocodificar uma string de busca."""
-    try:
-        # Region 'br' ajuda a priorizar resultados no Brasil
-        resultado = gmaps.geocode(query, region="br", language="pt-BR")
+def gravar_cache(novos_cache, caminho=ARQUIVO_CACHE):
+    """
+    Acrescenta registros ao cache (o último registro de cada CNES prevalece).
+
+    No modo de reprodução do cassete nada é gravado: o cache é de produção.
+    """
+    if cassete.reproduzindo():
+        return
+    df_full = pd.concat([carregar_cache(caminho), pd.DataFrame(novos_cache)], ignore_index=True)
+    df_full = df_full.drop_duplicates(subset=["CNES"], keep="last")
+    salvar_csv_atomico(df_full, caminho, sep=";", index=False)
+
+
+def aplicar_cache(df_cnes, df_cache=None, assinaturas=None, adotar_assinaturas=False):
+    """
+    Aplica no df_cnes (Latitude, Longitude e Tipo_Correspondencia) as
+    coordenadas do cache cujo endereço não mudou e que passam na qualidade.
+
+    Retorna as máscaras (aplicadas, nao_encontradas): unidades que receberam
+    a coordenada do cache e unidades já buscadas sem sucesso com o mesmo
+    endereço. Resultados do cache reprovados na qualidade não entram em
+    nenhuma das duas: voltam para a fila. Com `adotar_assinaturas`, registros
+    antigos sem assinatura adotam a atual e o cache principal é regravado.
+    """
+    if df_cache is None:
+        df_cache = carregar_cache()
+    if assinaturas is None:
+        assinaturas = calcular_assinatura(df_cnes)
+    mask_google = pd.Series(False, index=df_cnes.index)
+    mask_nao_encontrado = pd.Series(False, index=df_cnes.index)
+    if df_cache.empty:
+        return mask_google, mask_nao_encontrado
+
+    print(f"   Carregando {len(df_cache)} registros do cache Google...")
+    # Remove duplicatas
+    df_cache = df_cache.drop_duplicates(subset=["CNES"], keep="last")
+    if "Assinatura" not in df_cache.columns:
+        df_cache["Assinatura"] = None
+
+    # Alinha o cache com o dataframe principal pelo CNES
+    cache_alinhado = (
+        df_cache.set_index("CNES")
+        .reindex(df_cnes["CNES"])
+        .set_index(df_cnes.index)
+    )
+
+    # Endereço mudou desde a geocodificação? Então a coordenada do cache não vale mais
+    mask_alterado = comparar_assinaturas(assinaturas, cache_alinhado["Assinatura"])
+    if mask_alterado.any():
+        print(
+            f"   🔁 {mask_alterado.sum()} unidades com endereço alterado serão re-geocodificadas."
+        )
+
+    # Coordenada do cache que cai fora do município da unidade não é aplicada e
+    # a unidade volta para a fila (o roteador agora valida antes de gravar)
+    mask_rejeitada = (
+        cache_alinhado["Lat_Google"].notna()
+        & ~coordenada_aprovada(cache_alinhado, df_cnes["ID_Municipio"])
+        & ~mask_alterado
+    )
+    if mask_rejeitada.any():
+        print(
+            f"   🧭 {mask_rejeitada.sum()} coordenadas do cache reprovadas na qualidade "
+            "voltam para a fila."
+        )
 
-        if resultado and len(resultado) > 0:
-            loc = resultado[0]["geometry"]["location"]
-            formatted_address = resultado[0].get("formatted_address", "")
-            return loc["lat"], loc["lng"], formatted_address
-        return None, None, None
-    except Exception as e:
-        print(f"\n[ERRO API] {e}")
-        return None, None, None
+    # Onde tiver dado do Google válido, atualiza a coluna oficial Latitude/Longitude
+    mask_google = cache_alinhado["Lat_Google"].notna() & ~mask_alterado & ~mask_rejeitada
+    df_cnes.loc[mask_google, "Latitude"] = cache_alinhado.loc[mask_google, "Lat_Google"]
+    df_cnes.loc[mask_google, "Longitude"] = cache_alinhado.loc[mask_google, "Long_Google"]
+    df_cnes.loc[mask_google, "Tipo_Correspondencia"] = cache_alinhado.loc[
+        mask_google, "Tipo_Busca"
+    ]
+
+    # Já buscadas sem sucesso com este mesmo endereço: não gasta requisição de novo
+    mask_nao_encontrado = (
+        cache_alinhado["Tipo_Busca"] == TIPO_NAO_ENCONTRADO
+    ).fillna(False) & ~mask_alterado
+
+    # Cache antigo (sem assinatura): adota a assinatura atual
+    mask_sem_assinatura = mask_google & cache_alinhado["Assinatura"].isna()
+    if mask_sem_assinatura.any() and adotar_assinaturas:
+        adotadas = dict(
+            zip(df_cnes.loc[mask_sem_assinatura, "CNES"], assinaturas[mask_sem_assinatura])
+        )
+        df_cache["Assinatura"] = df_cache["Assinatura"].fillna(
+            df_cache["CNES"].map(adotadas)
+        )
+        salvar_csv_atomico(df_cache, ARQUIVO_CACHE, sep=";", index=False)
+
+    return mask_google, mask_nao_encontrado
 
 
-def executar_geocodificacao_google():
+def executar_geocodificacao_google(chave=GOOGLE_API_KEY, shard=None):
+    """
+    Geocodifica as unidades pendentes.
+
+    Com `shard=(i, N)` o worker processa só os CNES da partição i, grava os
+    resultados em PASTA_PARTICOES (cache, diário e consumo próprios) e não
+    mexe na Dim_Unidades_Saude nem no cache principal. O orçamento do worker
+    é 1/N do que resta no consumo principal.
+    """
     print("--- 🌍 INICIANDO GEOCODIFICAÇÃO VIA GOOGLE MAPS ---")
 
+    arquivo_cache_saida = ARQUIVO_CACHE
+    arquivo_diario = None
+    arquivo_consumo = ARQUIVO_CONSUMO
+    if shard:
+        indice, n_particoes = shard
+        os.makedirs(PASTA_PARTICOES, exist_ok=True)
+        arquivo_cache_saida, arquivo_diario, arquivo_consumo = arquivos_particao(
+            indice, n_particoes
+        )
+        print(f"   Partição {indice}/{n_particoes} -> {arquivo_cache_saida}")
+
     # 1. Carregar Dados
     if not os.path.exists(ARQUIVO_CNES_ENTRADA):
         print("❌ Arquivo Dim_Unidades_Saude.csv não encontrado.")
@@ -83,37 +280,30 @@ def executar_geocodificacao_google():
     dict_cidades = dict(zip(df_mun["ID_Municipio"], df_mun["Municipio"]))
     dict_ufs = dict(zip(df_mun["ID_Municipio"], df_mun["UF"]))
 
+    # Assinatura do endereço atual de cada unidade (vinda do tbEstabelecimento mais recente)
+    assinaturas = calcular_assinatura(df_cnes)
+
     # 3. Carregar e Aplicar Cache
     df_cache = carregar_cache()
-    if not df_cache.empty:
-        print(f"   Carregando {len(df_cache)} registros do cache Google...")
-        # Remove duplicatas
-        df_cache = df_cache.drop_duplicates(subset=["CNES"], keep="last")
-
-        # Merge com o dataframe principal
-        df_cnes = pd.merge(
-            df_cnes,
-            df_cache[["CNES", "Lat_Google", "Long_Google"]],
-            on="CNES",
-            how="left",
-        )
-
-        # Onde tiver dado do Google, atualiza a coluna oficial Latitude/Longitude
-        mask_google = df_cnes["Lat_Google"].notna()
-        df_cnes.loc[mask_google, "Latitude"] = df_cnes.loc[mask_google, "Lat_Google"]
-        df_cnes.loc[mask_google, "Longitude"] = df_cnes.loc[mask_google, "Long_Google"]
+    if shard:
+        # Retomada do worker: o que ele já gravou na própria partição também conta
+        df_cache = pd.concat([df_cache, carregar_cache(arquivo_cache_saida)], ignore_index=True)
+    _, mask_nao_encontrado = aplicar_cache(
+        df_cnes,
+        df_cache,
+        assinaturas,
+        adotar_assinaturas=not shard and not cassete.reproduzindo(),
+    )
 
-        # Limpa colunas auxiliares do merge
-        df_cnes = df_cnes.drop(columns=["Lat_Google", "Long_Google"])
+    # 4. Filtrar Pendentes (sem coordenada ou com coordenada impossível). Fora da
+    # caixa aproximada do município não basta: a oficial só sai se o polígono reprovar
+    mask_pendente = coordenada_pendente(avaliar_coordenadas(df_cnes))
+    df_pendentes = df_cnes[mask_pendente & ~mask_nao_encontrado].copy()
 
-    # 4. Filtrar Pendentes (Quem não tem Latitude)
-    mask_pendente = (
-        (df_cnes["Latitude"].isna())
-        | (df_cnes["Latitude"] == "")
-        | (df_cnes["Latitude"] == "None")
-        | (df_cnes["Latitude"] == "0")
-    )
-    df_pendentes = df_cnes[mask_pendente].copy()
+    if shard:
+        df_pendentes = df_pendentes[
+            particao_por_cnes(df_pendentes["CNES"], n_particoes) == indice
+        ]
 
     total = len(df_pendentes)
     print(f"   Unidades pendentes: {total}")
@@ -122,14 +312,37 @@ def executar_geocodificacao_google():
         print("✅ Tudo resolvido!")
         return
 
-    # ALERTA DE CUSTO
-    if total > 1000:
-        print(f"⚠️  ATENÇÃO: Você tem {total} registros para processar.")
-        print("   O Google Maps cobra por requisição. Verifique sua cota.")
-        input("   Pressione ENTER para continuar ou CTRL+C para cancelar...")
+    # 5. Fila por volume de casos: cada requisição paga cobre o máximo de notificações
+    df_pendentes = priorizar_pendentes(df_pendentes, contar_notificacoes_por_cnes(ARQUIVO_FATO))
+
+    # CONTROLE DE CUSTO
+    orcamento = Orcamento(
+        max_requisicoes=ORCAMENTO_REQUISICOES_MES,
+        max_custo=ORCAMENTO_CUSTO_MES_USD,
+        custo_por_requisicao=CUSTO_POR_REQUISICAO_USD,
+        arquivo=ARQUIVO_CONSUMO,
+    )
+    if shard:
+        # Cada worker gasta só a sua fatia: juntos nunca passam do orçamento do mês
+        orcamento = orcamento.particionar(arquivo_consumo, n_particoes)
+    print(
+        f"   Orçamento do mês: {orcamento.usadas} requisições usadas, "
+        f"{orcamento.restante()} disponíveis."
+    )
+
+    google = ProvedorGoogle(chave, orcamento)
+    provedores = [google]
+    if USAR_GAZETTEER:
+        provedores.append(ProvedorGazetteer(Gazetteer.carregar()))
+    if USAR_NOMINATIM:
+        provedores.append(ProvedorNominatim())
+    # Resposta fora do município não vai para o cache: o roteador segue para o
+    # próximo provedor (ex.: gazetteer) como se ela não tivesse vindo
+    roteador = Roteador(provedores, validar=resultado_aprovado)
 
     novos_cache = []
     contador = 0
+    aproximadas = 0
 
     print("   Iniciando processamento...")
 
@@ -138,92 +351,221 @@ def executar_geocodificacao_google():
         # Prepara dados básicos
         id_mun = str(row.get("ID_Municipio", ""))[:6]
         cidade = dict_cidades.get(id_mun, "")
-        uf = dict_ufs.get(id_mun, "")
 
         if not cidade:
             # Sem cidade, impossível achar
             continue
 
-        nome = str(row.get("Nome_Unidade", "")).strip()
-        rua = str(row.get("Rua", "")).replace("S/N", "").strip()
-        numero = str(row.get("Numero", "")).replace("S/N", "").strip()
-        bairro = str(row.get("Bairro", "")).strip()
-
-        lat_found, long_found, end_found, tipo_busca = None, None, None, None
-
-        # --- ESTRATÉGIA DE 3 TENTATIVAS (Baseada no seu código) ---
-
-        tentativas = []
-
-        # Tentativa 1: Nome + Endereço + Cidade (O mais preciso)
-        if nome and rua:
-            t1 = f"{nome}, {rua}, {numero}, {cidade} - {uf}, Brasil"
-            tentativas.append((t1, "Nome + Endereco"))
-
-        # Tentativa 2: Nome + Bairro + Cidade (Ótimo para Postos de Saúde conhecidos)
-        if nome and bairro:
-            t2 = f"{nome}, {bairro}, {cidade} - {uf}, Brasil"
-            tentativas.append((t2, "Nome + Bairro"))
-
-        # Tentativa 3: Apenas Endereço (Se o nome estiver errado no Google)
-        if rua:
-            t3 = f"{rua}, {numero}, {bairro}, {cidade} - {uf}, Brasil"
-            tentativas.append((t3, "Apenas Endereco"))
-
-        # Executa tentativas
-        for query, tipo in tentativas:
-            lat, lng, address = geocodificar_google_try(query)
-            if lat:
-                lat_found = lat
-                long_found = lng
-                end_found = address
-                tipo_busca = tipo
-                break  # Achou? Para de tentar.
-
-        # --- SALVAMENTO ---
-        if lat_found:
-            # Atualiza DF em memória
-            df_cnes.at[index, "Latitude"] = str(lat_found)
-            df_cnes.at[index, "Longitude"] = str(long_found)
-
-            # Adiciona ao buffer do cache
-            novos_cache.append(
-                {
-                    "CNES": row["CNES"],
-                    "Lat_Google": str(lat_found),
-                    "Long_Google": str(long_found),
-                    "Endereco_Formatado_Google": end_found,
-                    "Tipo_Busca": tipo_busca,
-                }
-            )
-
-            contador += 1
+        consulta = {
+            "nome": str(row.get("Nome_Unidade", "")).strip(),
+            "rua": str(row.get("Rua", "")).replace("S/N", "").strip(),
+            "numero": str(row.get("Numero", "")).replace("S/N", "").strip(),
+            "bairro": str(row.get("Bairro", "")).strip(),
+            "cep": row.get("CEP"),
+            "id_municipio": id_mun,
+            "cidade": cidade,
+            "uf": dict_ufs.get(id_mun, ""),
+        }
+
+        # Gratuitos primeiro; o Google só entra se eles não bastarem
+        try:
+            resultado, completo = roteador.geocodificar(consulta)
+        except ErroConfiguracao as e:
+            # Chave recusada ou API desabilitada: nenhuma unidade seria achada,
+            # então para aqui em vez de marcar a fila inteira como não encontrada
+            print(f"\n❌ [CONFIGURAÇÃO] {e}. Verifique a chave e a API habilitada.")
+            break
+
+        # Resposta fraca com o Google fora do ar ou sem orçamento: não grava,
+        # a unidade continua pendente e tenta o Google na próxima execução
+        if resultado is not None and not resultado.completo:
+            resultado = None
+        if resultado is None and not completo:
+            if arquivo_diario:
+                registrar_no_diario(arquivo_diario, row["CNES"], "indisponivel")
+        elif resultado is not None or ProvedorGoogle.montar_tentativas(consulta):
+            if arquivo_diario:
+                registrar_no_diario(
+                    arquivo_diario,
+                    row["CNES"],
+                    "encontrado" if resultado else "nao_encontrado",
+                    resultado.tipo if resultado else None,
+                )
+
+            # --- SALVAMENTO ---
+            if resultado is not None:
+                # Atualiza DF em memória
+                df_cnes.at[index, "Latitude"] = str(resultado.lat)
+                df_cnes.at[index, "Longitude"] = str(resultado.lon)
+                df_cnes.at[index, "Tipo_Correspondencia"] = resultado.tipo
+
+                # Adiciona ao buffer do cache
+                novos_cache.append(
+                    {
+                        "CNES": row["CNES"],
+                        "Lat_Google": str(resultado.lat),
+                        "Long_Google": str(resultado.lon),
+                        "Endereco_Formatado_Google": resultado.endereco,
+                        "Tipo_Busca": resultado.tipo,
+                        "Assinatura": assinaturas.at[index],
+                        "Provedor": resultado.provedor,
+                        "Confianca": f"{resultado.confianca:.2f}",
+                    }
+                )
+
+                if resultado.tipo.startswith(PREFIXO_CORRESPONDENCIA):
+                    aproximadas += 1
+                else:
+                    contador += 1
+            else:
+                # Nenhum provedor achou: registra para não pagar de novo pelo mesmo endereço
+                novos_cache.append(
+                    {
+                        "CNES": row["CNES"],
+                        "Tipo_Busca": TIPO_NAO_ENCONTRADO,
+                        "Assinatura": assinaturas.at[index],
+                    }
+                )
 
         # Salva em disco a cada X registros
         if len(novos_cache) >= TAMANHO_LOTE_SALVAMENTO:
-            df_novos = pd.DataFrame(novos_cache)
-            df_antigo = carregar_cache()
-            df_full = pd.concat([df_antigo, df_novos], ignore_index=True)
-            df_full = df_full.drop_duplicates(subset=["CNES"], keep="last")
-
-            df_full.to_csv(ARQUIVO_CACHE, sep=";", index=False)
-            df_cnes.to_csv(ARQUIVO_CNES_ENTRADA, sep=";", index=False)
+            gravar_cache(novos_cache, arquivo_cache_saida)
+            if not shard:
+                salvar_dimensao(df_cnes)
             # df_cnes.to_csv('Dim_Unidades_Saude_TESTE.csv', sep=';', index=False)
+            if not cassete.reproduzindo():
+                orcamento.salvar()
 
             novos_cache = []  # Limpa buffer
 
+        # Cota estourada ou orçamento do mês no fim: para aqui (retoma na próxima execução)
+        if google.esgotado:
+            print(
+                f"\n[ORÇAMENTO] Google indisponível ({orcamento.usadas} requisições no mês). "
+                "O restante da fila fica para a próxima execução."
+            )
+            break
+
     # Salvamento final
     if novos_cache:
-        df_novos = pd.DataFrame(novos_cache)
-        df_full = pd.concat([carregar_cache(), df_novos], ignore_index=True)
-        df_full.drop_duplicates(subset=["CNES"], keep="last").to_csv(
-            ARQUIVO_CACHE, sep=";", index=False
-        )
-        df_cnes.to_csv(ARQUIVO_CNES_ENTRADA, sep=";", index=False)
+        gravar_cache(novos_cache, arquivo_cache_saida)
+        if not shard:
+            salvar_dimensao(df_cnes)
         # df_cnes.to_csv('Dim_Unidades_Saude_TESTE.csv', sep=';', index=False)
-
+    if not cassete.reproduzindo():
+        # Na reprodução nenhuma requisição foi paga
+        orcamento.salvar()
+    if not shard and (contador or aproximadas):
+        registrar_e_informar(df_cnes)
+    if not shard:
+        informar_base_coordenadas()
+
+    print(f"   Unidades geocodificadas nesta execução: {contador}")
+    if aproximadas:
+        print(f"   Unidades com coordenada aproximada (gazetteer): {aproximadas}")
+    print("   Provedores:")
+    for linha in roteador.resumo():
+        print(linha)
+    print(
+        f"   Requisições no mês: {orcamento.usadas} "
+        f"(≈ US$ {orcamento.custo():.2f})"
+    )
+    if shard:
+        print("   Rode com --mesclar depois que todas as partições terminarem.")
     print("\n✅ Processo Google Maps finalizado!")
 
 
+def mesclar_particoes():
+    """
+    Junta as partições dos workers no cache principal e aplica as
+    coordenadas na Dim_Unidades_Saude.
+
+    Só preenche unidades ainda sem coordenada e cuja assinatura de endereço
+    continua a mesma da geocodificação. As partições mescladas são apagadas
+    (os diários ficam como registro) e o consumo de cada worker entra no
+    consumo principal.
+    """
+    print("--- 🧩 MESCLANDO PARTIÇÕES DO GOOGLE ---")
+
+    incorporar_consumo(
+        sorted(glob.glob(os.path.join(PASTA_PARTICOES, "google_*_consumo.csv")))
+    )
+
+    arquivos = sorted(glob.glob(os.path.join(PASTA_PARTICOES, "google_*_cache.csv")))
+    if not arquivos:
+        print("   Nenhuma partição encontrada.")
+        return
+
+    df_particoes = pd.concat(
+        [carregar_cache(arquivo) for arquivo in arquivos], ignore_index=True
+    )
+    print(f"   {len(arquivos)} partições, {len(df_particoes)} registros.")
+
+    gravar_cache(df_particoes.to_dict("records"), ARQUIVO_CACHE)
+
+    df_cnes = pd.read_csv(ARQUIVO_CNES_ENTRADA, sep=";", dtype=str)
+    novos = (
+        df_particoes[df_particoes["Lat_Google"].notna()]
+        .drop_duplicates(subset=["CNES"], keep="last")
+        .set_index("CNES")
+        .reindex(df_cnes["CNES"])
+        .set_index(df_cnes.index)
+    )
+
+    mask_vazio = coordenada_pendente(avaliar_coordenadas(df_cnes))
+    mask_valido = ~comparar_assinaturas(calcular_assinatura(df_cnes), novos["Assinatura"])
+    mask_valido &= coordenada_aprovada(novos, df_cnes["ID_Municipio"])
+    mask = mask_vazio & novos["Lat_Google"].notna() & mask_valido
+
+    df_cnes.loc[mask, "Latitude"] = novos.loc[mask, "Lat_Google"]
+    df_cnes.loc[mask, "Longitude"] = novos.loc[mask, "Long_Google"]
+    df_cnes.loc[mask, "Tipo_Correspondencia"] = novos.loc[mask, "Tipo_Busca"]
+    aplicar_qualidade(df_cnes, corrigir_invertidas=False)
+    aplicar_validacao(df_cnes)
+    salvar_csv_atomico(df_cnes, ARQUIVO_CNES_ENTRADA, sep=";", index=False)
+
+    registrar_e_informar(df_cnes)
+    informar_base_coordenadas()
+
+    for arquivo in arquivos:
+        os.remove(arquivo)
+
+    print(f"   Unidades atualizadas na dimensão: {mask.sum()}")
+    print("\n✅ Partições mescladas!")
+
+
+def ler_shard(texto):
+    """Converte "i/N" em (i, N), com 0 <= i < N."""
+    try:
+        indice, total = (int(parte) for parte in texto.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("use o formato i/N, ex.: 0/4")
+    if total < 1 or not 0 <= indice < total:
+        raise argparse.ArgumentTypeError("precisa valer 0 <= i < N")
+    return indice, total
+
+
 if __name__ == "__main__":
-    executar_geocodificacao_google()
+    parser = argparse.ArgumentParser(description="Geocodificação das unidades via Google Maps.")
+    parser.add_argument(
+        "--shard",
+        type=ler_shard,
+        help="Processa só a partição i de N (ex.: 0/4), gravando em arquivos próprios",
+    )
+    parser.add_argument(
+        "--chave",
+        default=GOOGLE_API_KEY,
+        help="Chave do Google deste worker (padrão: GOOGLE_API_KEY)",
+    )
+    parser.add_argument(
+        "--mesclar",
+        action="store_true",
+        help="Junta as partições no cache e na Dim_Unidades_Saude",
+    )
+    args = parser.parse_args()
+
+    if args.mesclar:
+        mesclar_particoes()
+    else:
+        preparar_cliente(args.chave)
+        executar_geocodificacao_google(chave=args.chave, shard=args.shard)
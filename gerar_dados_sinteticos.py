@@ -0,0 +1,371 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from calendario_epidemiologico import semana_epidemiologica
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+PASTA_AUXILIARES = "Dados_Auxiliares"
+ARQUIVO_AMOSTRA_SINAN = "aracaju_sample.csv"
+ARQUIVO_AMOSTRA_CNES = os.path.join(PASTA_AUXILIARES, "estabelecimentos_sergipe.csv")
+ARQUIVO_MUNICIPIOS = os.path.join(PASTA_AUXILIARES, "municipios.csv")
+ARQUIVO_ESTADOS = os.path.join(PASTA_AUXILIARES, "estados.csv")
+
+# Saída com a mesma estrutura de pastas do pipeline real
+PASTA_SAIDA = "Dados_Sinteticos"
+
+# Linhas gravadas por bloco (memória constante mesmo para 10^8 linhas)
+TAMANHO_BLOCO = 1_000_000
+
+# Grade fixa de sorteio: cada fatia de N notificações tem o próprio gerador,
+# derivado só da semente e da posição da fatia. Assim o --tamanho-bloco muda
+# apenas a memória usada, nunca os dados gerados
+LINHAS_POR_SORTEIO = 100_000
+
+# Colunas do SINAN sorteadas juntas para manter a coerência entre elas
+GRUPOS_SINAN = [
+    ["DT_NOTIFIC", "SEM_NOT", "NU_ANO"],
+    ["ANO_NASC", "NU_IDADE_N"],
+]
+
+# Colunas do SINAN derivadas de outras (nunca sorteadas de forma independente):
+# início dos sintomas = notificação menos um atraso sorteado, a UF de
+# residência sai do município de residência e as colunas geográficas seguem a
+# linha (regional do município, local de internação e de infecção)
+COLUNAS_SINAN_DERIVADAS = [
+    "ID_MUNICIP",
+    "ID_UNIDADE",
+    "ID_MN_RESI",
+    "SG_UF_NOT",
+    "SG_UF",
+    "DT_SIN_PRI",
+    "SEM_PRI",
+    "ID_REGIONA",
+    "ID_RG_RESI",
+    "UF",
+    "MUNICIPIO",
+    "COUFINF",
+    "COMUNINF",
+    "COPAISINF",
+]
+
+# Colunas de estabelecimento geradas a partir do município/posição
+COLUNAS_CNES_DERIVADAS = [
+    "CO_CNES",
+    "CO_UNIDADE",
+    "CO_UF",
+    "CO_IBGE",
+    "NU_LATITUDE",
+    "NU_LONGITUDE",
+]
+
+
+# ============================
+# MODELO (DISTRIBUIÇÕES APRENDIDAS)
+# ============================
+
+
+def distribuicao(df, colunas):
+    """Distribuição empírica conjunta (valores, probabilidades) de um grupo de colunas."""
+    contagem = df[colunas].value_counts(dropna=False, normalize=True)
+    return contagem.index.to_frame(index=False), contagem.to_numpy()
+
+
+def sortear(rng, modelo, n):
+    """Sorteia n linhas de uma distribuição empírica."""
+    valores, probs = modelo
+    idx = rng.choice(len(probs), size=n, p=probs)
+    return valores.iloc[idx].reset_index(drop=True)
+
+
+def aprender_modelo():
+    """Aprende as distribuições das amostras locais."""
+    sinan = pd.read_csv(ARQUIVO_AMOSTRA_SINAN, dtype=str)
+    cnes = pd.read_csv(ARQUIVO_AMOSTRA_CNES, sep=";", dtype=str)
+    municipios = pd.read_csv(ARQUIVO_MUNICIPIOS, dtype=str)
+
+    # SINAN: grupos correlacionados + colunas independentes
+    agrupadas = {c for g in GRUPOS_SINAN for c in g}
+    modelo_sinan = {
+        tuple(g): distribuicao(sinan, g) for g in GRUPOS_SINAN if set(g) <= set(sinan.columns)
+    }
+    for c in sinan.columns:
+        if c not in agrupadas and c not in COLUNAS_SINAN_DERIVADAS:
+            modelo_sinan[(c,)] = distribuicao(sinan, [c])
+
+    # Atraso (dias) entre o início dos sintomas e a notificação
+    atrasos = (
+        pd.to_datetime(sinan["DT_NOTIFIC"], errors="coerce")
+        - pd.to_datetime(sinan["DT_SIN_PRI"], errors="coerce")
+    ).dt.days
+    atrasos = atrasos[atrasos >= 0].astype("int64").to_frame("Atraso")
+
+    # Regional de saúde de cada município visto na amostra (notificação e residência)
+    pares = pd.concat(
+        [
+            sinan[[a, b]].set_axis(["Municipio", "Regional"], axis=1)
+            for a, b in (("ID_MUNICIP", "ID_REGIONA"), ("ID_MN_RESI", "ID_RG_RESI"))
+            if {a, b} <= set(sinan.columns)
+        ]
+        or [pd.DataFrame(columns=["Municipio", "Regional"])]
+    ).dropna()
+    regionais = pares.groupby("Municipio")["Regional"].agg(lambda s: s.mode().iloc[0])
+
+    # Concentração de casos por unidade (peso relativo de cada unidade)
+    pesos_unidades = sinan["ID_UNIDADE"].value_counts().to_numpy(dtype=float)
+
+    # Fração de casos notificados no próprio município de residência
+    frac_mesmo_municipio = float((sinan["ID_MN_RESI"] == sinan["ID_MUNICIP"]).mean())
+
+    # CNES: colunas independentes + deslocamento em relação ao centro do município
+    modelo_cnes = {
+        (c,): distribuicao(cnes, [c]) for c in cnes.columns if c not in COLUNAS_CNES_DERIVADAS
+    }
+    centros = municipios.assign(ID=municipios["codigo_ibge"].str[:6]).set_index("ID")
+    lat = pd.to_numeric(cnes["NU_LATITUDE"].str.replace(",", "."), errors="coerce")
+    lon = pd.to_numeric(cnes["NU_LONGITUDE"].str.replace(",", "."), errors="coerce")
+    centro = centros.reindex(cnes["CO_IBGE"].str[:6])
+    desloc = pd.DataFrame(
+        {
+            "dlat": lat.to_numpy() - centro["latitude"].astype(float).to_numpy(),
+            "dlon": lon.to_numpy() - centro["longitude"].astype(float).to_numpy(),
+        }
+    ).dropna()
+    # Descarta coordenadas claramente erradas (> ~1 grau do centro)
+    desloc = desloc[(desloc.abs() < 1.0).all(axis=1)].to_numpy()
+
+    return {
+        "sinan": modelo_sinan,
+        "colunas_sinan": list(sinan.columns),
+        "pesos_unidades": pesos_unidades,
+        "frac_mesmo_municipio": frac_mesmo_municipio,
+        "regionais": regionais,
+        "atrasos_sintomas": distribuicao(atrasos, ["Atraso"]),
+        "cnes": modelo_cnes,
+        "colunas_cnes": list(cnes.columns),
+        "deslocamentos": desloc,
+        "frac_sem_coordenada": float(lat.isna().mean()),
+    }
+
+
+# ============================
+# GERAÇÃO
+# ============================
+
+
+def gerar_municipios(rng, n):
+    """Tabela de municípios com n linhas (reais se couber, sintéticos acima disso)."""
+    reais = pd.read_csv(ARQUIVO_MUNICIPIOS, dtype=str)
+    if n <= len(reais):
+        return reais.iloc[np.sort(rng.choice(len(reais), size=n, replace=False))].reset_index(
+            drop=True
+        )
+
+    extras = reais.iloc[rng.integers(0, len(reais), size=n - len(reais))].reset_index(drop=True)
+    # Novos códigos únicos dentro da UF original, usando os números livres
+    # (a chave do pipeline tem 6 dígitos: até ~10 mil municípios por UF)
+    codigos = extras["codigo_ibge"].copy()
+    for uf, linhas in extras.groupby("codigo_uf").groups.items():
+        usados = set(reais.loc[reais["codigo_uf"] == uf, "codigo_ibge"].str[2:6].astype(int))
+        livres = np.setdiff1d(np.arange(10000), list(usados))[: len(linhas)]
+        codigos[linhas[: len(livres)]] = [f"{uf}{x:04d}0" for x in livres]
+        codigos[linhas[len(livres) :]] = None
+    extras["codigo_ibge"] = codigos
+    extras = extras.dropna(subset=["codigo_ibge"]).reset_index(drop=True)
+    seq = np.arange(len(extras))
+    extras["nome"] = extras["nome"] + " " + pd.Series((seq + 1).astype(str))
+    for c in ["latitude", "longitude"]:
+        extras[c] = (
+            extras[c].astype(float) + rng.normal(0, 0.2, size=len(extras))
+        ).round(4).astype(str)
+    extras["capital"] = "0"
+    return pd.concat([reais, extras], ignore_index=True)
+
+
+def gerar_estabelecimentos(rng, modelo, municipios, n):
+    """Extrato no formato do tbEstabelecimento com n estabelecimentos."""
+    idx_mun = rng.integers(0, len(municipios), size=n)
+    mun = municipios.iloc[idx_mun].reset_index(drop=True)
+
+    df = pd.DataFrame(index=range(n))
+    for (coluna,), dist in modelo["cnes"].items():
+        df[coluna] = sortear(rng, dist, n)[coluna]
+
+    co_cnes = np.arange(1, n + 1) + 1_000_000
+    df["CO_CNES"] = co_cnes.astype(str)
+    df["CO_UF"] = mun["codigo_uf"]
+    df["CO_IBGE"] = mun["codigo_ibge"].str[:6]
+    df["CO_UNIDADE"] = df["CO_IBGE"] + df["CO_CNES"].str.zfill(7)
+
+    desloc = modelo["deslocamentos"][rng.integers(0, len(modelo["deslocamentos"]), size=n)]
+    lat = mun["latitude"].astype(float).to_numpy() + desloc[:, 0]
+    lon = mun["longitude"].astype(float).to_numpy() + desloc[:, 1]
+    sem_coord = rng.random(n) < modelo["frac_sem_coordenada"]
+    df["NU_LATITUDE"] = pd.Series(np.round(lat, 7).astype(str)).mask(sem_coord)
+    df["NU_LONGITUDE"] = pd.Series(np.round(lon, 7).astype(str)).mask(sem_coord)
+
+    return df[modelo["colunas_cnes"]]
+
+
+def sortear_pesos_unidades(rng, modelo, n_estabelecimentos):
+    """Peso de casos de cada unidade, sorteado da concentração observada na amostra."""
+    pesos = modelo["pesos_unidades"][
+        rng.integers(0, len(modelo["pesos_unidades"]), size=n_estabelecimentos)
+    ]
+    return pesos / pesos.sum()
+
+
+def sortear_municipio_na_uf(rng, municipios, ufs):
+    """Um município (código de 6 dígitos) sorteado dentro da UF de cada linha."""
+    cod_mun = municipios["codigo_ibge"].str[:6].to_numpy()
+    uf_mun = municipios["codigo_uf"].to_numpy()
+    sorteados = pd.Series(None, index=ufs.index, dtype=object)
+    for uf in np.unique(ufs.dropna()):
+        alvo = (ufs == uf).to_numpy()
+        candidatos = cod_mun[uf_mun == uf]
+        sorteados[alvo] = candidatos[rng.integers(0, len(candidatos), size=alvo.sum())]
+    return sorteados
+
+
+def gerar_notificacoes(rng, modelo, estabelecimentos, pesos, municipios, n):
+    """Bloco de n notificações no formato do SINAN."""
+    df = pd.DataFrame(index=range(n))
+    for grupo, dist in modelo["sinan"].items():
+        valores = sortear(rng, dist, n)
+        for coluna in grupo:
+            df[coluna] = valores[coluna]
+
+    idx_und = rng.choice(len(estabelecimentos), size=n, p=pesos)
+    und = estabelecimentos.iloc[idx_und].reset_index(drop=True)
+    df["ID_UNIDADE"] = und["CO_CNES"].str.zfill(7)
+    df["ID_MUNICIP"] = und["CO_IBGE"]
+    df["SG_UF_NOT"] = und["CO_UF"]
+
+    # Residência: mesmo município na fração observada; senão outro da mesma UF
+    resi = df["ID_MUNICIP"].copy()
+    outro = rng.random(n) >= modelo["frac_mesmo_municipio"]
+    resi[outro] = sortear_municipio_na_uf(rng, municipios, df.loc[outro, "SG_UF_NOT"])
+    df["ID_MN_RESI"] = resi
+    df["SG_UF"] = resi.str[:2]
+
+    # Regional de saúde do município (vazia para municípios fora da amostra)
+    df["ID_REGIONA"] = df["ID_MUNICIP"].map(modelo["regionais"])
+    df["ID_RG_RESI"] = resi.map(modelo["regionais"])
+
+    # Internação (UF/MUNICIPIO) no município de notificação, só para internados
+    if "HOSPITALIZ" in df.columns:
+        internado = df["HOSPITALIZ"] == "1"
+        df["UF"] = df["SG_UF_NOT"].where(internado)
+        df["MUNICIPIO"] = df["ID_MUNICIP"].where(internado)
+
+    # Infecção: autóctone na residência; importado em outro município da UF dela
+    if "TPAUTOCTO" in df.columns:
+        infeccao = resi.where(df["TPAUTOCTO"] == "1")
+        importado = df["TPAUTOCTO"] == "2"
+        infeccao[importado] = sortear_municipio_na_uf(
+            rng, municipios, df.loc[importado, "SG_UF"]
+        )
+        df["COMUNINF"] = infeccao
+        df["COUFINF"] = infeccao.str[:2]
+        df["COPAISINF"] = pd.Series("1", index=df.index).where(infeccao.notna())
+
+    # Sintomas nunca depois da notificação
+    atraso = sortear(rng, modelo["atrasos_sintomas"], n)["Atraso"].to_numpy()
+    dt_sin_pri = pd.to_datetime(df["DT_NOTIFIC"], errors="coerce") - pd.to_timedelta(
+        atraso, unit="D"
+    )
+    df["DT_SIN_PRI"] = dt_sin_pri.dt.strftime("%Y-%m-%d")
+    df["SEM_PRI"] = semana_epidemiologica(dt_sin_pri).astype("string")
+
+    return df[[c for c in modelo["colunas_sinan"] if c in df.columns]]
+
+
+def gerar_dados(
+    n_notificacoes,
+    n_estabelecimentos,
+    n_municipios,
+    semente=42,
+    pasta_saida=PASTA_SAIDA,
+    tamanho_bloco=TAMANHO_BLOCO,
+):
+    """Gera o conjunto sintético completo de forma determinística a partir da semente."""
+    sementes = np.random.SeedSequence(semente)
+    rng_geo, rng_cnes, rng_sinan = (np.random.default_rng(s) for s in sementes.spawn(3))
+
+    pasta_brutos = os.path.join(pasta_saida, "Dados_Brutos")
+    pasta_aux = os.path.join(pasta_saida, "Dados_Auxiliares")
+    os.makedirs(pasta_brutos, exist_ok=True)
+    os.makedirs(pasta_aux, exist_ok=True)
+
+    print("   Aprendendo distribuições das amostras...")
+    modelo = aprender_modelo()
+
+    print(f"   Gerando {n_municipios} municípios...")
+    municipios = gerar_municipios(rng_geo, n_municipios)
+    municipios.to_csv(os.path.join(pasta_aux, "municipios.csv"), index=False)
+    pd.read_csv(ARQUIVO_ESTADOS, dtype=str).to_csv(
+        os.path.join(pasta_aux, "estados.csv"), index=False
+    )
+
+    print(f"   Gerando {n_estabelecimentos} estabelecimentos...")
+    estabelecimentos = gerar_estabelecimentos(rng_cnes, modelo, municipios, n_estabelecimentos)
+    estabelecimentos.to_csv(
+        os.path.join(pasta_aux, "tbEstabelecimento.csv"),
+        sep=";",
+        index=False,
+        encoding="latin1",
+        errors="replace",
+    )
+
+    print(f"   Gerando {n_notificacoes} notificações...")
+    pesos = sortear_pesos_unidades(rng_cnes, modelo, len(estabelecimentos))
+    arquivo_sinan = os.path.join(pasta_brutos, "DENG_SINTETICO.csv")
+    n_fatias = (n_notificacoes + LINHAS_POR_SORTEIO - 1) // LINHAS_POR_SORTEIO
+    rngs_fatias = rng_sinan.spawn(n_fatias)
+    fatias_por_bloco = max(1, tamanho_bloco // LINHAS_POR_SORTEIO)
+    for i, primeira in enumerate(range(0, n_fatias, fatias_por_bloco)):
+        fatias = range(primeira, min(primeira + fatias_por_bloco, n_fatias))
+        bloco = pd.concat(
+            [
+                gerar_notificacoes(
+                    rngs_fatias[k],
+                    modelo,
+                    estabelecimentos,
+                    pesos,
+                    municipios,
+                    min(LINHAS_POR_SORTEIO, n_notificacoes - k * LINHAS_POR_SORTEIO),
+                )
+                for k in fatias
+            ],
+            ignore_index=True,
+        )
+        bloco.to_csv(arquivo_sinan, index=False, mode="w" if i == 0 else "a", header=(i == 0))
+
+    print(f"✅ Dados sintéticos gerados em '{pasta_saida}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gera SINAN, tbEstabelecimento e tabelas de geografia sintéticos."
+    )
+    parser.add_argument("--notificacoes", type=int, default=100_000)
+    parser.add_argument("--estabelecimentos", type=int, default=10_000)
+    parser.add_argument("--municipios", type=int, default=5570)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default=PASTA_SAIDA)
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO)
+    args = parser.parse_args()
+
+    gerar_dados(
+        args.notificacoes,
+        args.estabelecimentos,
+        args.municipios,
+        semente=args.semente,
+        pasta_saida=args.saida,
+        tamanho_bloco=args.tamanho_bloco,
+    )
@@ -0,0 +1,520 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from arquivos import salvar_csv_atomico
+from calendario_epidemiologico import (
+    inicio_semana,
+    semana_epidemiologica,
+    semanas_entre,
+)
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+PASTA_TRATADOS = "Dados_Tratados"
+ARQUIVO_FATO = os.path.join(PASTA_TRATADOS, "Fato_Dengue_Consolidada.csv")
+ARQUIVO_GEOGRAFIA = os.path.join(PASTA_TRATADOS, "Dim_Geografia.csv")
+
+# População por município, fornecida localmente (CSV com vírgula):
+#   codigo_ibge (6 ou 7 dígitos), ano (opcional), populacao
+ARQUIVO_POPULACAO = os.path.join("Dados_Auxiliares", "populacao.csv")
+
+# Série compilada município × semana (reaproveitada entre execuções)
+ARQUIVO_SERIE = os.path.join(PASTA_TRATADOS, "serie_municipio_semana.bin")
+
+# Saídas para o BI
+ARQUIVO_INCIDENCIA = os.path.join(PASTA_TRATADOS, "Fato_Incidencia_Semana.csv")
+ARQUIVO_ALERTAS = os.path.join(PASTA_TRATADOS, "Alertas_Municipio.csv")
+
+# Layout do arquivo:
+#   cabeçalho: ASSINATURA (8 bytes) + municípios e semanas (uint64 cada)
+#              + tamanho/mtime da fato e da população (uint64 cada)
+#   municípios int32[m] (ordenado) | semanas int32[s] (AAAASS, consecutivas)
+#   casos int32[m, s] | incidência, incidência 4 semanas, média histórica e
+#   limiar float32[m, s] cada
+ASSINATURA = b"SERIEMS1"
+TAMANHO_CABECALHO = 56
+
+TAMANHO_BLOCO = 1_000_000
+
+# Parciais acumulados antes de reduzir de novo (limita a memória)
+MAXIMO_PARCIAIS = 20
+
+# Semanas mais recentes recontadas a cada execução (notificação atrasada)
+REABERTURA_SEMANAS = 4
+
+JANELA_SEMANAS = 4
+POR_HABITANTES = 100_000
+
+# Canal endêmico: média e desvio da incidência em 4 semanas, na mesma semana
+# epidemiológica dos anos anteriores
+ANOS_HISTORICO = 5
+ANOS_MINIMOS_HISTORICO = 3
+Z_LIMIAR = 1.96
+
+# Abaixo disso o município não sai do Normal (evita alarme com 1 ou 2 casos)
+CASOS_MINIMOS_ALERTA = 5
+
+SITUACOES = ["Sem_Historico", "Normal", "Alerta", "Epidemia"]
+
+
+def assinatura_arquivo(caminho):
+    """(tamanho, mtime em ns) do arquivo, ou (0, 0) se ele não existir."""
+    if not os.path.exists(caminho):
+        return 0, 0
+    info = os.stat(caminho)
+    return info.st_size, info.st_mtime_ns
+
+
+# ============================
+# SÉRIE COMPILADA
+# ============================
+
+
+class SerieSemanal:
+    """
+    Casos, incidência e limiares por município (linha) e semana (coluna).
+
+    Fica inteira em memória (5.570 municípios × 10 anos ≈ 50 MB) e é gravada
+    em binário; cada execução só recalcula as colunas que mudaram.
+    """
+
+    MATRIZES = ["incidencia", "incidencia_4sem", "media_historica", "limiar"]
+
+    def __init__(self, municipios, semanas=None):
+        self.municipios = np.asarray(municipios, dtype="int32")
+        self.semanas = np.empty(0, dtype="int32") if semanas is None else semanas
+        forma = (len(self.municipios), len(self.semanas))
+        self.casos = np.zeros(forma, dtype="int32")
+        for nome in self.MATRIZES:
+            setattr(self, nome, np.full(forma, np.nan, dtype="float32"))
+        self.assinatura_fato = (0, 0)
+        self.assinatura_populacao = (0, 0)
+
+    @classmethod
+    def ler(cls, caminho=ARQUIVO_SERIE):
+        with open(caminho, "rb") as f:
+            dados = f.read()
+        if dados[:8] != ASSINATURA:
+            raise ValueError(f"{caminho} não é uma série compilada.")
+        m, s, *assinaturas = np.frombuffer(dados, dtype="uint64", count=6, offset=8)
+        m, s = int(m), int(s)
+
+        deslocamento = TAMANHO_CABECALHO
+        municipios = np.frombuffer(dados, "int32", m, deslocamento)
+        deslocamento += 4 * m
+        serie = cls(municipios, np.frombuffer(dados, "int32", s, deslocamento).copy())
+        deslocamento += 4 * s
+        serie.casos = (
+            np.frombuffer(dados, "int32", m * s, deslocamento).reshape(m, s).copy()
+        )
+        for nome in cls.MATRIZES:
+            deslocamento += 4 * m * s
+            matriz = np.frombuffer(dados, "float32", m * s, deslocamento)
+            setattr(serie, nome, matriz.reshape(m, s).copy())
+        serie.assinatura_fato = (int(assinaturas[0]), int(assinaturas[1]))
+        serie.assinatura_populacao = (int(assinaturas[2]), int(assinaturas[3]))
+        return serie
+
+    def gravar(self, caminho=ARQUIVO_SERIE):
+        cabecalho = np.array(
+            [
+                len(self.municipios),
+                len(self.semanas),
+                *self.assinatura_fato,
+                *self.assinatura_populacao,
+            ],
+            dtype="uint64",
+        )
+        caminho_tmp = caminho + ".tmp"
+        with open(caminho_tmp, "wb") as f:
+            f.write(ASSINATURA)
+            f.write(cabecalho.tobytes())
+            f.write(self.municipios.tobytes())
+            f.write(self.semanas.tobytes())
+            f.write(np.ascontiguousarray(self.casos).tobytes())
+            for nome in self.MATRIZES:
+                f.write(np.ascontiguousarray(getattr(self, nome)).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(caminho_tmp, caminho)
+
+    def _estender(self, primeira, ultima):
+        """Amplia o eixo de semanas para cobrir [primeira, ultima]."""
+        if len(self.semanas):
+            primeira = min(primeira, int(self.semanas[0]))
+            ultima = max(ultima, int(self.semanas[-1]))
+        semanas = semanas_entre(primeira, ultima)
+        if np.array_equal(semanas, self.semanas):
+            return
+        inicio = (
+            int(np.searchsorted(semanas, self.semanas[0])) if len(self.semanas) else 0
+        )
+        colunas = slice(inicio, inicio + len(self.semanas))
+        forma = (len(self.municipios), len(semanas))
+
+        casos = np.zeros(forma, dtype="int32")
+        casos[:, colunas] = self.casos
+        self.casos = casos
+        for nome in self.MATRIZES:
+            matriz = np.full(forma, np.nan, dtype="float32")
+            matriz[:, colunas] = getattr(self, nome)
+            setattr(self, nome, matriz)
+        self.semanas = semanas
+
+    def registrar(self, contagem, semana_inicial=None):
+        """
+        Substitui os casos das semanas >= `semana_inicial` (todas, se None)
+        pela `contagem` (ID_Municipio, Semana, Casos em inteiros).
+
+        Retorna a primeira coluna alterada, ou None se nada mudou.
+        """
+        if semana_inicial is not None:
+            contagem = contagem[contagem["Semana"] >= semana_inicial]
+        if contagem.empty and semana_inicial is None:
+            return None
+        if not contagem.empty:
+            self._estender(int(contagem["Semana"].min()), int(contagem["Semana"].max()))
+
+        coluna_inicial = (
+            0
+            if semana_inicial is None
+            else int(np.searchsorted(self.semanas, semana_inicial))
+        )
+        self.casos[:, coluna_inicial:] = 0
+        linhas = np.searchsorted(self.municipios, contagem["ID_Municipio"].to_numpy())
+        colunas = np.searchsorted(self.semanas, contagem["Semana"].to_numpy())
+        np.add.at(self.casos, (linhas, colunas), contagem["Casos"].to_numpy())
+        return coluna_inicial
+
+    def recalcular(self, populacao, coluna_inicial=0):
+        """Incidência, janela móvel e canal endêmico a partir de `coluna_inicial`."""
+        if coluna_inicial >= len(self.semanas):
+            return
+        colunas = slice(coluna_inicial, None)
+        pop = populacao_por_semana(populacao, self.municipios, self.semanas[colunas])
+
+        # Soma móvel pela diferença de somas acumuladas (inclui as 3 anteriores)
+        inicio_janela = max(coluna_inicial - (JANELA_SEMANAS - 1), 0)
+        acumulado = np.cumsum(self.casos[:, inicio_janela:], axis=1, dtype="int64")
+        acumulado = np.pad(acumulado, ((0, 0), (JANELA_SEMANAS, 0)))
+        casos_janela = acumulado[:, JANELA_SEMANAS:] - acumulado[:, :-JANELA_SEMANAS]
+        casos_janela = casos_janela[:, coluna_inicial - inicio_janela :]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.incidencia[:, colunas] = self.casos[:, colunas] / pop * POR_HABITANTES
+            self.incidencia_4sem[:, colunas] = casos_janela / pop * POR_HABITANTES
+        self._canal_endemico(coluna_inicial)
+
+    def _canal_endemico(self, coluna_inicial):
+        """
+        Média e limiar (média + Z·desvio) da mesma semana nos anos anteriores.
+        A SE 53 usa a SE 52 dos anos que não têm semana 53.
+        """
+        semanas = self.semanas[coluna_inicial:].astype("int64")
+        anteriores = semanas[:, None] - 100 * np.arange(1, ANOS_HISTORICO + 1)[None, :]
+        sem_53 = (anteriores % 100 == 53) & ~np.isin(anteriores, self.semanas)
+        anteriores = np.where(sem_53, anteriores - 1, anteriores)
+        posicoes = np.minimum(
+            np.searchsorted(self.semanas, anteriores), len(self.semanas) - 1
+        )
+        existe = self.semanas[posicoes] == anteriores
+
+        historico = self.incidencia_4sem[:, posicoes]
+        historico[:, ~existe] = np.nan
+        validos = ~np.isnan(historico)
+        n = validos.sum(axis=2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            media = np.nansum(historico, axis=2) / n
+            desvio = np.sqrt(
+                np.nansum((historico - media[:, :, None]) ** 2, axis=2) / (n - 1)
+            )
+        suficiente = n >= ANOS_MINIMOS_HISTORICO
+        self.media_historica[:, coluna_inicial:] = np.where(suficiente, media, np.nan)
+        self.limiar[:, coluna_inicial:] = np.where(
+            suficiente, media + Z_LIMIAR * desvio, np.nan
+        )
+
+    def casos_janela(self):
+        acumulado = np.cumsum(self.casos, axis=1, dtype="int64")
+        anterior = np.pad(acumulado, ((0, 0), (JANELA_SEMANAS, 0)))
+        return acumulado - anterior[:, :-JANELA_SEMANAS]
+
+
+# ============================
+# ENTRADAS
+# ============================
+
+
+def municipios_da_geografia(arquivo=ARQUIVO_GEOGRAFIA):
+    """Dim_Geografia indexada pelo código IBGE (int), ordenada."""
+    geo = pd.read_csv(arquivo, sep=";", dtype=str)
+    geo["Codigo"] = pd.to_numeric(geo["ID_Municipio"], errors="coerce")
+    geo = geo.dropna(subset=["Codigo"]).drop_duplicates(subset=["Codigo"])
+    return geo.set_index(geo["Codigo"].astype("int32")).sort_index()
+
+
+def carregar_populacao(arquivo=ARQUIVO_POPULACAO):
+    """
+    População por município (linhas) e ano (colunas). Anos sem estimativa
+    herdam o ano vizinho.
+    """
+    df = pd.read_csv(arquivo, sep=",", dtype=str)
+    codigo = pd.to_numeric(df["codigo_ibge"].str.strip().str[:6], errors="coerce")
+    ano = pd.to_numeric(df["ano"], errors="coerce") if "ano" in df.columns else 0
+    tabela = pd.DataFrame(
+        {
+            "Codigo": codigo,
+            "Ano": ano,
+            "Populacao": pd.to_numeric(df["populacao"], errors="coerce"),
+        }
+    ).dropna()
+    tabela = tabela[tabela["Populacao"] > 0]
+    populacao = tabela.pivot_table(
+        index="Codigo", columns="Ano", values="Populacao", aggfunc="last"
+    )
+    return populacao.ffill(axis=1).bfill(axis=1)
+
+
+def populacao_por_semana(populacao, municipios, semanas):
+    """Matriz município × semana com a população do ano (ou do mais próximo)."""
+    anos = populacao.columns.to_numpy(dtype="int64")
+    por_ano = populacao.reindex(municipios).to_numpy(dtype="float64")
+    indice = np.searchsorted(anos, semanas.astype("int64") // 100, side="right") - 1
+    return por_ano[:, np.clip(indice, 0, len(anos) - 1)]
+
+
+def _reduzir(parciais):
+    return pd.concat(parciais).groupby(level=[0, 1]).sum()
+
+
+def contar_casos(arquivo_fato=ARQUIVO_FATO, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Casos por (município, semana) da fato, lendo só as duas colunas em blocos.
+
+    Sem Semana_Epidemiologica (fatos antigas), a semana vem da data de
+    notificação. As chaves cruas são agregadas primeiro e convertidas no fim.
+    """
+    colunas = pd.read_csv(arquivo_fato, sep=";", nrows=0).columns
+    col_semana = (
+        "Semana_Epidemiologica"
+        if "Semana_Epidemiologica" in colunas
+        else "Data_Notificacao"
+    )
+
+    parciais = []
+    for bloco in pd.read_csv(
+        arquivo_fato,
+        sep=";",
+        dtype=str,
+        usecols=["ID_Municipio", col_semana],
+        chunksize=tamanho_bloco,
+    ):
+        parciais.append(bloco.groupby(["ID_Municipio", col_semana]).size())
+        if len(parciais) >= MAXIMO_PARCIAIS:
+            parciais = [_reduzir(parciais)]
+    if not parciais:
+        return pd.DataFrame(columns=["ID_Municipio", "Semana", "Casos"], dtype="int64")
+
+    contagem = _reduzir(parciais).rename("Casos").reset_index()
+    if col_semana == "Data_Notificacao":
+        semana = semana_epidemiologica(contagem[col_semana])
+    else:
+        semana = pd.to_numeric(contagem[col_semana], errors="coerce")
+    contagem = pd.DataFrame(
+        {
+            "ID_Municipio": pd.to_numeric(contagem["ID_Municipio"], errors="coerce"),
+            "Semana": semana,
+            "Casos": contagem["Casos"],
+        }
+    ).dropna()
+    # Só semanas que existem no calendário: uma SE 53 inexistente cairia, no
+    # searchsorted, na coluna da SE 1 seguinte
+    existentes = [s for s in contagem["Semana"].unique() if inicio_semana(s)]
+    contagem = contagem[contagem["Semana"].isin(existentes)].astype("int64")
+    return contagem.groupby(["ID_Municipio", "Semana"], as_index=False)["Casos"].sum()
+
+
+# ============================
+# ATUALIZAÇÃO E ALERTAS
+# ============================
+
+
+def classificar(casos_4sem, incidencia_4sem, media, limiar):
+    """Situação de cada célula: Sem_Historico, Normal, Alerta ou Epidemia."""
+    casos_suficientes = casos_4sem >= CASOS_MINIMOS_ALERTA
+    codigo = np.select(
+        [
+            np.isnan(limiar),
+            casos_suficientes & (incidencia_4sem > limiar),
+            casos_suficientes & (incidencia_4sem > media),
+        ],
+        [0, 3, 2],
+        default=1,
+    )
+    return np.asarray(SITUACOES, dtype=object)[codigo]
+
+
+def atualizar_serie(
+    geografia, populacao, recalcular=False, tamanho_bloco=TAMANHO_BLOCO
+):
+    """
+    Abre a série compilada e aplica só o que mudou desde a última execução.
+    Retorna a série e se algo foi recalculado.
+
+    A fato é regravada inteira pelo atualizar_dados.py, então ela é lida de
+    novo (duas colunas), mas só as últimas REABERTURA_SEMANAS semanas da
+    série e as semanas novas são recontadas e recalculadas.
+    """
+    municipios = geografia.index.to_numpy(dtype="int32")
+    serie = None
+    if os.path.exists(ARQUIVO_SERIE) and not recalcular:
+        serie = SerieSemanal.ler()
+        if not np.array_equal(serie.municipios, municipios):
+            print("   Municípios da Dim_Geografia mudaram: série refeita do zero.")
+            serie = None
+        elif len(serie.semanas) and not np.array_equal(
+            serie.semanas, semanas_entre(serie.semanas[0], serie.semanas[-1])
+        ):
+            # Série gravada com o calendário antigo (ISO deslocada, sem SE 53)
+            print("   Semanas fora do calendário epidemiológico: série refeita do zero.")
+            serie = None
+    if serie is None:
+        serie = SerieSemanal(municipios)
+
+    assinatura_fato = assinatura_arquivo(ARQUIVO_FATO)
+    assinatura_populacao = assinatura_arquivo(ARQUIVO_POPULACAO)
+    coluna_inicial = None
+
+    if serie.assinatura_fato != assinatura_fato:
+        semana_inicial = (
+            int(serie.semanas[-min(REABERTURA_SEMANAS, len(serie.semanas))])
+            if len(serie.semanas)
+            else None
+        )
+        contagem = contar_casos(tamanho_bloco=tamanho_bloco)
+        conhecido = contagem["ID_Municipio"].isin(municipios)
+        if (~conhecido).any():
+            print(
+                f"   ⚠️ {int(contagem.loc[~conhecido, 'Casos'].sum())} casos com "
+                "município fora da Dim_Geografia foram ignorados."
+            )
+        coluna_inicial = serie.registrar(contagem[conhecido], semana_inicial)
+        serie.assinatura_fato = assinatura_fato
+
+    if serie.assinatura_populacao != assinatura_populacao:
+        coluna_inicial = 0
+        serie.assinatura_populacao = assinatura_populacao
+
+    if coluna_inicial is None:
+        print("   Fato e população sem mudanças desde a última execução.")
+    else:
+        print(
+            f"   Semanas recalculadas: {len(serie.semanas) - coluna_inicial} "
+            f"de {len(serie.semanas)}"
+        )
+        serie.recalcular(populacao, coluna_inicial)
+        serie.gravar()
+    return serie, coluna_inicial is not None
+
+
+def montar_tabelas(serie, geografia, populacao):
+    """Fato de incidência (com casos na janela) e alertas da última semana."""
+    casos_4sem = serie.casos_janela()
+    situacao = classificar(
+        casos_4sem, serie.incidencia_4sem, serie.media_historica, serie.limiar
+    )
+    codigos = geografia["ID_Municipio"].to_numpy(dtype=object)
+
+    linhas, colunas = np.nonzero(casos_4sem)
+    fato = pd.DataFrame(
+        {
+            "ID_Municipio": codigos[linhas],
+            "Semana_Epidemiologica": serie.semanas[colunas],
+            "Casos": serie.casos[linhas, colunas],
+            "Casos_4sem": casos_4sem[linhas, colunas],
+            "Incidencia": serie.incidencia[linhas, colunas].round(2),
+            "Incidencia_4sem": serie.incidencia_4sem[linhas, colunas].round(2),
+            "Media_Historica": serie.media_historica[linhas, colunas].round(2),
+            "Limiar": serie.limiar[linhas, colunas].round(2),
+            "Situacao": situacao[linhas, colunas],
+        }
+    )
+
+    ultima = len(serie.semanas) - 1
+    pop = populacao_por_semana(populacao, serie.municipios, serie.semanas[ultima:])
+    alertas = pd.DataFrame(
+        {
+            "ID_Municipio": codigos,
+            "Municipio": geografia["Municipio"].to_numpy(),
+            "UF": geografia["UF"].to_numpy(),
+            "Semana_Epidemiologica": serie.semanas[ultima],
+            "Populacao": pop[:, 0],
+            "Casos": serie.casos[:, ultima],
+            "Casos_4sem": casos_4sem[:, ultima],
+            "Incidencia_4sem": serie.incidencia_4sem[:, ultima].round(2),
+            "Media_Historica": serie.media_historica[:, ultima].round(2),
+            "Limiar": serie.limiar[:, ultima].round(2),
+            "Situacao": situacao[:, ultima],
+        }
+    )
+    alertas["Populacao"] = alertas["Populacao"].astype("Int64")
+    gravidade = alertas["Situacao"].map({s: i for i, s in enumerate(SITUACOES)})
+    alertas = alertas.iloc[
+        np.lexsort((-alertas["Incidencia_4sem"].fillna(0), -gravidade))
+    ]
+    return fato, alertas.reset_index(drop=True)
+
+
+def gerar_alertas(recalcular=False, tamanho_bloco=TAMANHO_BLOCO):
+    print("--- 📈 INCIDÊNCIA E ALERTAS POR MUNICÍPIO ---")
+    for arquivo in (ARQUIVO_FATO, ARQUIVO_GEOGRAFIA, ARQUIVO_POPULACAO):
+        if not os.path.exists(arquivo):
+            print(f"❌ Arquivo não encontrado: {arquivo}")
+            return None
+
+    inicio = time.perf_counter()
+    geografia = municipios_da_geografia()
+    populacao = carregar_populacao()
+    sem_populacao = (~geografia.index.isin(populacao.index)).sum()
+    if sem_populacao:
+        print(f"   ⚠️ {sem_populacao} municípios sem população.")
+
+    serie, mudou = atualizar_serie(geografia, populacao, recalcular, tamanho_bloco)
+    if not len(serie.semanas):
+        print("❌ Nenhuma semana epidemiológica válida na fato.")
+        return None
+
+    fato, alertas = montar_tabelas(serie, geografia, populacao)
+    # A fato de incidência (histórico inteiro) só é regravada quando a série muda
+    if mudou or not os.path.exists(ARQUIVO_INCIDENCIA):
+        salvar_csv_atomico(fato, ARQUIVO_INCIDENCIA, sep=";", index=False)
+    salvar_csv_atomico(alertas, ARQUIVO_ALERTAS, sep=";", index=False)
+
+    resumo = alertas["Situacao"].value_counts()
+    print(
+        f"   Semana {serie.semanas[-1]}: "
+        + ", ".join(f"{s} {int(resumo.get(s, 0))}" for s in reversed(SITUACOES))
+    )
+    duracao = time.perf_counter() - inicio
+    print(f"✅ Alertas salvos em '{ARQUIVO_ALERTAS}' ({duracao:.1f}s)")
+    return alertas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Incidência semanal, janela de 4 semanas e alertas por município."
+    )
+    parser.add_argument(
+        "--recalcular",
+        action="store_true",
+        help="Ignora a série compilada e recalcula todas as semanas",
+    )
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO)
+    args = parser.parse_args()
+    gerar_alertas(args.recalcular, args.tamanho_bloco)
@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from arquivos import salvar_csv_atomico
+from base_coordenadas import abrir_base
+from calendario_epidemiologico import (
+    SEMANAS_CONHECIDAS,
+    conferir_semanas,
+    semana_epidemiologica,
+)
+from coordenadas import RAIO_TERRA_KM
+from fila_geocodificacao import normalizar_cnes
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+PASTA_TRATADOS = "Dados_Tratados"
+ARQUIVO_FATO = os.path.join(PASTA_TRATADOS, "Fato_Dengue_Consolidada.csv")
+ARQUIVO_DIM = os.path.join(PASTA_TRATADOS, "Dim_Unidades_Saude.csv")
+PASTA_SAIDA = os.path.join(PASTA_TRATADOS, "Hexagonos")
+ARQUIVO_CONTAGEM = os.path.join(PASTA_SAIDA, "Fato_Hexagono_Semana.csv")
+
+TAMANHO_BLOCO = 1_000_000
+
+# Resolução -> raio do hexágono em km (centro ao vértice). Do Brasil inteiro
+# (resolução 0) ao bairro (resolução 3).
+RESOLUCOES = {0: 50.0, 1: 15.0, 2: 5.0, 3: 1.5}
+
+# Projeção senoidal (área igual) centrada no Brasil: hexágonos do mesmo
+# tamanho cobrem a mesma área em qualquer latitude
+MERIDIANO_CENTRAL = -54.0
+
+CASAS_DECIMAIS_GEOJSON = 5
+
+
+# ============================
+# GRADE HEXAGONAL
+# ============================
+
+
+def projetar(lat, lon):
+    """(x, y) em km na projeção senoidal."""
+    lat_rad = np.radians(lat)
+    x = RAIO_TERRA_KM * np.radians(lon - MERIDIANO_CENTRAL) * np.cos(lat_rad)
+    y = RAIO_TERRA_KM * lat_rad
+    return x, y
+
+
+def desprojetar(x, y):
+    """(lat, lon) de pontos (x, y) em km na projeção senoidal."""
+    lat_rad = y / RAIO_TERRA_KM
+    lon = MERIDIANO_CENTRAL + np.degrees(x / (RAIO_TERRA_KM * np.cos(lat_rad)))
+    return np.degrees(lat_rad), lon
+
+
+def hexagono_de(lat, lon, raio_km):
+    """
+    Coordenadas axiais (q, r) do hexágono (vértice para cima) que contém
+    cada ponto, com arredondamento cúbico vetorizado.
+    """
+    x, y = projetar(np.asarray(lat, dtype="float64"), np.asarray(lon, dtype="float64"))
+    q = (np.sqrt(3) / 3 * x - y / 3) / raio_km
+    r = (2 / 3 * y) / raio_km
+    s = -q - r
+
+    q_arred, r_arred, s_arred = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(q_arred - q), np.abs(r_arred - r), np.abs(s_arred - s)
+    corrige_q = (dq > dr) & (dq > ds)
+    corrige_r = ~corrige_q & (dr > ds)
+    q_arred = np.where(corrige_q, -r_arred - s_arred, q_arred)
+    r_arred = np.where(corrige_r, -q_arred - s_arred, r_arred)
+    return q_arred.astype("int64"), r_arred.astype("int64")
+
+
+def centro_hexagono(q, r, raio_km):
+    """(lat, lon) do centro dos hexágonos (q, r)."""
+    x = raio_km * np.sqrt(3) * (np.asarray(q) + np.asarray(r) / 2)
+    y = raio_km * 1.5 * np.asarray(r)
+    return desprojetar(x, y)
+
+
+def vertices_hexagono(q, r, raio_km):
+    """Arrays (n, 7) de lat e lon dos vértices de cada hexágono (anel fechado)."""
+    x = raio_km * np.sqrt(3) * (np.asarray(q) + np.asarray(r) / 2)
+    y = raio_km * 1.5 * np.asarray(r)
+    angulos = np.radians(30 + 60 * np.arange(7))
+    vx = x[:, None] + raio_km * np.cos(angulos)[None, :]
+    vy = y[:, None] + raio_km * np.sin(angulos)[None, :]
+    return desprojetar(vx, vy)
+
+
+def id_hexagono(resolucao, q, r):
+    """Identificador textual estável da célula: H<resolução>_<q>_<r>."""
+    return (
+        f"H{resolucao}_"
+        + pd.Series(q).astype(str).to_numpy().astype(object)
+        + "_"
+        + pd.Series(r).astype(str).to_numpy().astype(object)
+    )
+
+
+# ============================
+# AGREGAÇÃO
+# ============================
+
+
+def contar_por_unidade_semana(arquivo_fato=ARQUIVO_FATO, tamanho_bloco=TAMANHO_BLOCO):
+    """Notificações por (CNES, semana), lendo a fato em blocos."""
+    colunas = pd.read_csv(arquivo_fato, sep=";", nrows=0).columns
+    col_semana = (
+        "Semana_Epidemiologica"
+        if "Semana_Epidemiologica" in colunas
+        else "Data_Notificacao"
+    )
+
+    parciais = []
+    for bloco in pd.read_csv(
+        arquivo_fato,
+        sep=";",
+        dtype=str,
+        usecols=["CNES", col_semana],
+        chunksize=tamanho_bloco,
+    ):
+        parciais.append(bloco.groupby(["CNES", col_semana]).size())
+    if not parciais:
+        return pd.DataFrame(columns=["CNES", "Semana", "Notificacoes"])
+
+    contagem = (
+        pd.concat(parciais)
+        .groupby(level=[0, 1])
+        .sum()
+        .rename("Notificacoes")
+        .reset_index()
+    )
+    contagem["CNES"] = normalizar_cnes(contagem["CNES"])
+    if col_semana == "Data_Notificacao":
+        contagem["Semana"] = semana_epidemiologica(contagem[col_semana])
+    else:
+        contagem["Semana"] = pd.to_numeric(
+            contagem[col_semana], errors="coerce"
+        ).astype("Int32")
+    return (
+        contagem.dropna(subset=["CNES", "Semana"])
+        .groupby(["CNES", "Semana"], as_index=False)["Notificacoes"]
+        .sum()
+    )
+
+
+def unidades_geocodificadas(arquivo=ARQUIVO_DIM):
+    """
+    Latitude/Longitude aprovadas na qualidade, pelo CNES normalizado, lidas
+    da base binária (recompilada só se a dimensão mudou).
+    """
+    tabela = abrir_base(arquivo).tabela()
+    return tabela[["CNES", "Lat", "Lon"]].assign(CNES=tabela["CNES"].astype("string"))
+
+
+def agregar_hexagonos(contagem, unidades, resolucoes=RESOLUCOES):
+    """
+    Contagem por (resolução, hexágono, semana).
+
+    O hexágono é calculado uma vez por unidade (não por notificação) e a
+    contagem por unidade e semana é somada dentro de cada célula.
+    """
+    com_local = contagem.merge(unidades, on="CNES", how="inner")
+    tabelas = []
+    for resolucao, raio_km in resolucoes.items():
+        q, r = hexagono_de(
+            unidades["Lat"].to_numpy(), unidades["Lon"].to_numpy(), raio_km
+        )
+        celulas = pd.DataFrame({"CNES": unidades["CNES"].to_numpy(), "Q": q, "R": r})
+        tabela = (
+            com_local[["CNES", "Semana", "Notificacoes"]]
+            .merge(celulas, on="CNES")
+            .groupby(["Q", "R", "Semana"], as_index=False)
+            .agg(Notificacoes=("Notificacoes", "sum"), Unidades=("CNES", "nunique"))
+        )
+        tabela.insert(0, "Resolucao", resolucao)
+        tabela.insert(
+            1, "ID_Hexagono", id_hexagono(resolucao, tabela["Q"], tabela["R"])
+        )
+        tabelas.append(tabela)
+    return pd.concat(tabelas, ignore_index=True)
+
+
+def exportar_geojson(tabela, resolucao, raio_km, caminho):
+    """Polígonos das células com dados numa resolução e o total de cada uma."""
+    celulas = (
+        tabela[tabela["Resolucao"] == resolucao]
+        .groupby(["ID_Hexagono", "Q", "R"], as_index=False)["Notificacoes"]
+        .sum()
+    )
+    lat, lon = vertices_hexagono(
+        celulas["Q"].to_numpy(), celulas["R"].to_numpy(), raio_km
+    )
+    lat_c, lon_c = centro_hexagono(
+        celulas["Q"].to_numpy(), celulas["R"].to_numpy(), raio_km
+    )
+    lat = lat.round(CASAS_DECIMAIS_GEOJSON)
+    lon = lon.round(CASAS_DECIMAIS_GEOJSON)
+
+    feicoes = [
+        {
+            "type": "Feature",
+            "properties": {
+                "ID_Hexagono": id_hex,
+                "Resolucao": resolucao,
+                "Notificacoes": int(total),
+                "Latitude": round(float(lat_c[i]), CASAS_DECIMAIS_GEOJSON),
+                "Longitude": round(float(lon_c[i]), CASAS_DECIMAIS_GEOJSON),
+            },
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [np.column_stack([lon[i], lat[i]]).tolist()],
+            },
+        }
+        for i, (id_hex, total) in enumerate(
+            zip(celulas["ID_Hexagono"], celulas["Notificacoes"])
+        )
+    ]
+    caminho_tmp = caminho + ".tmp"
+    with open(caminho_tmp, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": feicoes}, f)
+    os.replace(caminho_tmp, caminho)
+    return len(feicoes)
+
+
+def gerar_malha_hexagonal(resolucoes=RESOLUCOES, tamanho_bloco=TAMANHO_BLOCO):
+    print("--- ⬡ AGREGAÇÃO EM HEXÁGONOS ---")
+    for arquivo in (ARQUIVO_FATO, ARQUIVO_DIM):
+        if not os.path.exists(arquivo):
+            print(f"❌ Arquivo não encontrado: {arquivo}")
+            return None
+
+    inicio = time.perf_counter()
+    os.makedirs(PASTA_SAIDA, exist_ok=True)
+    contagem = contar_por_unidade_semana(tamanho_bloco=tamanho_bloco)
+    unidades = unidades_geocodificadas()
+    tabela = agregar_hexagonos(contagem, unidades, resolucoes)
+
+    total = contagem["Notificacoes"].sum()
+    localizadas = contagem.loc[
+        contagem["CNES"].isin(unidades["CNES"]), "Notificacoes"
+    ].sum()
+    print(f"   Notificações com unidade geocodificada: {localizadas} de {total}")
+
+    salvar_csv_atomico(
+        tabela.drop(columns=["Q", "R"]), ARQUIVO_CONTAGEM, sep=";", index=False
+    )
+    for resolucao, raio_km in resolucoes.items():
+        caminho = os.path.join(PASTA_SAIDA, f"hexagonos_r{resolucao}.geojson")
+        n = exportar_geojson(tabela, resolucao, raio_km, caminho)
+        print(f"   Resolução {resolucao} ({raio_km:g} km): {n} células -> {caminho}")
+
+    duracao = time.perf_counter() - inicio
+    print(f"✅ Contagens em '{ARQUIVO_CONTAGEM}' ({duracao:.1f}s)")
+    return tabela
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Agrega as notificações em hexágonos por semana, com GeoJSON."
+    )
+    parser.add_argument(
+        "--resolucoes",
+        type=int,
+        nargs="+",
+        choices=sorted(RESOLUCOES),
+        default=sorted(RESOLUCOES),
+    )
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO)
+    parser.add_argument(
+        "--conferir-semanas",
+        action="store_true",
+        help="Só confere o calendário de semanas epidemiológicas e sai",
+    )
+    args = parser.parse_args()
+    if args.conferir_semanas:
+        conferir_semanas()
+        print(f"✅ Calendário confere em {len(SEMANAS_CONHECIDAS)} fronteiras.")
+        raise SystemExit
+    gerar_malha_hexagonal(
+        {r: RESOLUCOES[r] for r in args.resolucoes}, tamanho_bloco=args.tamanho_bloco
+    )
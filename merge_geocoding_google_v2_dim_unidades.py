@@ -1,56 +1,138 @@
+import argparse
 import os
 
 import pandas as pd
 
+from arquivos import salvar_csv_atomico
+from assinatura_endereco import calcular_assinatura
+from cdc_dim_unidades import registrar_e_informar
+from coordenadas import aplicar_qualidade
+from validar_poligonos import aplicar_validacao
+
 # CONFIGURAÇÕES
 PASTA_TRATADOS = "Dados_Tratados"
 ARQUIVO_PRINCIPAL = os.path.join(PASTA_TRATADOS, "Dim_Unidades_Saude.csv")
 ARQUIVO_DELTA = "novas_coordenadas_google.csv"
 
+COLUNAS_DELTA = ["CNES", "Latitude_Nova", "Longitude_Nova"]
+
+
+def coordenada_vazia(serie):
+    """Máscara das coordenadas não preenchidas no arquivo principal."""
+    return serie.isna() | serie.isin(["", "None", "nan", "0"])
+
+
+def compactar_delta(caminho):
+    """
+    Lê um arquivo delta, remove CNES repetidos (vale o último) e o regrava compactado.
+    """
+    df_delta = pd.read_csv(caminho, sep=";", dtype=str)
+    qtd_antes = len(df_delta)
+    df_delta = df_delta.dropna(subset=COLUNAS_DELTA)
+    df_delta = df_delta.drop_duplicates(subset=["CNES"], keep="last")
+
+    if len(df_delta) < qtd_antes:
+        salvar_csv_atomico(df_delta, caminho, sep=";", index=False)
+        print(
+            f"   🗜️  {os.path.basename(caminho)}: {qtd_antes} -> {len(df_delta)} linhas após compactação."
+        )
+    return df_delta
+
+
+def carregar_deltas(caminhos):
+    """Compacta e junta vários deltas; em conflito vale o arquivo mais à direita."""
+    lista_deltas = []
+    for caminho in caminhos:
+        if not os.path.exists(caminho):
+            print(f"   ⚠️ Delta não encontrado, ignorando: {caminho}")
+            continue
+        lista_deltas.append(compactar_delta(caminho))
 
-def aplicar_atualizacoes():
+    if not lista_deltas:
+        return None
+
+    df_delta = pd.concat(lista_deltas, ignore_index=True)
+    return df_delta.drop_duplicates(subset=["CNES"], keep="last").set_index("CNES")
+
+
+def aplicar_deltas(df_main, df_delta):
+    """
+    Atualiza, pelo índice CNES, apenas as linhas afetadas do principal.
+
+    Preenche Latitude/Longitude só onde estão vazias (a coordenada oficial
+    tem prioridade) e ignora entradas do delta geradas para um endereço que
+    já mudou. Retorna a quantidade de linhas atualizadas.
+    """
+    mask_afetada = coordenada_vazia(df_main["Latitude"]) & df_main["CNES"].isin(
+        df_delta.index
+    )
+    if not mask_afetada.any():
+        return 0
+
+    delta_alinhado = df_delta.reindex(df_main.loc[mask_afetada, "CNES"]).set_index(
+        df_main.index[mask_afetada]
+    )
+
+    if "Assinatura" in delta_alinhado.columns:
+        assinatura_atual = calcular_assinatura(df_main.loc[mask_afetada])
+        obsoleta = delta_alinhado["Assinatura"].notna() & (
+            delta_alinhado["Assinatura"] != assinatura_atual
+        )
+        delta_alinhado = delta_alinhado[~obsoleta]
+
+    df_main.loc[delta_alinhado.index, "Latitude"] = delta_alinhado["Latitude_Nova"]
+    df_main.loc[delta_alinhado.index, "Longitude"] = delta_alinhado["Longitude_Nova"]
+    return len(delta_alinhado)
+
+
+def aplicar_atualizacoes(arquivos_delta=(ARQUIVO_DELTA,)):
     print("--- 🔄 INICIANDO MERGE DE COORDENADAS ---")
 
-    if not os.path.exists(ARQUIVO_DELTA):
+    # 1. Carregar Delta(s) (Novas coordenadas), já compactados
+    print("   Carregando novas coordenadas...")
+    df_delta = carregar_deltas(arquivos_delta)
+    if df_delta is None:
         print("❌ Arquivo de novas coordenadas não encontrado.")
         return
 
-    # 1. Carregar Principal
+    # 2. Carregar Principal
     print("   Carregando arquivo principal...")
     df_main = pd.read_csv(ARQUIVO_PRINCIPAL, sep=";", dtype=str)
-    qtd_antes = df_main["Latitude"].notna().sum()
-
-    # 2. Carregar Delta (Novas coordenadas)
-    print("   Carregando novas coordenadas...")
-    df_delta = pd.read_csv(ARQUIVO_DELTA, sep=";", dtype=str)
-
-    # 3. O Merge (Update)
-    # Fazemos um Left Join do Principal com o Delta usando CNES
-    df_merged = pd.merge(
-        df_main,
-        df_delta[["CNES", "Latitude_Nova", "Longitude_Nova"]],
-        on="CNES",
-        how="left",
-    )
-
-    # A Mágica: Preencher Latitude APENAS onde ela está vazia no principal E existe no Delta
-    # Se já tem latitude no principal, NÃO mexe (mantém a original)
-    df_merged["Latitude"] = df_merged["Latitude"].fillna(df_merged["Latitude_Nova"])
-    df_merged["Longitude"] = df_merged["Longitude"].fillna(df_merged["Longitude_Nova"])
+    qtd_antes = (~coordenada_vazia(df_main["Latitude"])).sum()
 
-    # Remove colunas temporárias
-    df_final = df_merged.drop(columns=["Latitude_Nova", "Longitude_Nova"])
+    # 3. O Update (somente linhas afetadas)
+    qtd_atualizadas = aplicar_deltas(df_main, df_delta)
 
     # Estatísticas
-    qtd_depois = df_final["Latitude"].notna().sum()
+    qtd_depois = (~coordenada_vazia(df_main["Latitude"])).sum()
     print(f"   Coordenadas antes: {qtd_antes}")
     print(f"   Coordenadas depois: {qtd_depois}")
     print(f"   ✅ Incremento de: {qtd_depois - qtd_antes} unidades.")
 
-    # 4. Salvar (Sobrescreve o principal)
-    df_final.to_csv(ARQUIVO_PRINCIPAL, sep=";", index=False)
+    if qtd_atualizadas == 0:
+        print("   Nada a atualizar no arquivo principal.")
+        return
+
+    # 4. Flags de qualidade (Coord_Valida, Fora_UF...) da coordenada nova, como
+    # no --mesclar do geocoding_google: as etapas seguintes filtram por elas
+    aplicar_qualidade(df_main, corrigir_invertidas=False)
+    aplicar_validacao(df_main)
+
+    # 5. Salvar (troca atômica do principal)
+    salvar_csv_atomico(df_main, ARQUIVO_PRINCIPAL, sep=";", index=False)
     print(f"   💾 Arquivo principal atualizado com sucesso!")
+    registrar_e_informar(df_main)
 
 
 if __name__ == "__main__":
-    aplicar_atualizacoes()
+    parser = argparse.ArgumentParser(
+        description="Aplica arquivos delta de coordenadas na Dim_Unidades_Saude."
+    )
+    parser.add_argument(
+        "deltas",
+        nargs="*",
+        default=[ARQUIVO_DELTA],
+        help="Arquivos delta, na ordem de aplicação (o último vence).",
+    )
+    args = parser.parse_args()
+    aplicar_atualizacoes(args.deltas)
@@ -0,0 +1,185 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from assinatura_endereco import normalizar_campo
+from coordenadas import coordenada_ausente, converter_coordenada
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+ARQUIVO_ENTRADA = os.path.join("Dados_Auxiliares", "estabelecimentos_sergipe.csv")
+ARQUIVO_SAIDA = "coordenadas_reaproveitadas.csv"
+
+# Colunas do tbEstabelecimento -> nomes usados na Dim_Unidades_Saude
+MAPA_TB_ESTABELECIMENTO = {
+    "CO_CNES": "CNES",
+    "CO_IBGE": "ID_Municipio",
+    "NO_LOGRADOURO": "Rua",
+    "NU_ENDERECO": "Numero",
+    "CO_CEP": "CEP",
+    "NU_CNPJ_MANTENEDORA": "CNPJ_Mantenedora",
+    "NU_LATITUDE": "Latitude",
+    "NU_LONGITUDE": "Longitude",
+}
+
+# Blocos, do mais preciso para o menos preciso. Cada bloco só é aceito se as
+# unidades localizadas que o compõem estiverem próximas entre si
+# (maior amplitude de latitude/longitude, em graus; 0,001° ≈ 110 m).
+DISPERSAO_MAXIMA = {
+    "Endereco": 0.002,
+    "CEP": 0.005,
+    "CNPJ_Mantenedora": 0.002,
+}
+
+# Tipo_Correspondencia gravado nas unidades resolvidas por reaproveitamento
+TIPOS_REAPROVEITAMENTO = list(DISPERSAO_MAXIMA)
+
+# CEPs terminados em 000 são genéricos (cidade inteira), não servem de bloco
+SUFIXO_CEP_GENERICO = "000"
+
+
+# ============================
+# FUNÇÕES
+# ============================
+
+
+def chaves_de_bloqueio(df):
+    """
+    Chave de cada bloco por linha (NaN quando a linha não tem o dado).
+
+    Endereço e CNPJ são combinados com o município para não misturar
+    cidades diferentes.
+    """
+    municipio = df["ID_Municipio"].astype("string").str.strip().str[:6]
+    chaves = {}
+
+    if {"Rua", "Numero"} <= set(df.columns):
+        rua = normalizar_campo(df["Rua"])
+        numero = normalizar_campo(df["Numero"])
+        chave = municipio + "|" + rua + "|" + numero
+        chaves["Endereco"] = chave.mask((rua == "") | (numero == ""))
+
+    if "CEP" in df.columns:
+        cep = df["CEP"].astype("string").str.replace(r"\D", "", regex=True).str.zfill(8)
+        chaves["CEP"] = cep.mask(
+            cep.isna() | (cep == "00000000") | cep.str.endswith(SUFIXO_CEP_GENERICO)
+        )
+
+    if "CNPJ_Mantenedora" in df.columns:
+        cnpj = (
+            df["CNPJ_Mantenedora"]
+            .astype("string")
+            .str.replace(r"\.0$", "", regex=True)
+            .str.replace(r"\D", "", regex=True)
+        )
+        chaves["CNPJ_Mantenedora"] = (municipio + "|" + cnpj).mask(cnpj.isna() | (cnpj == ""))
+
+    return chaves
+
+
+def reaproveitar_coordenadas(df, dispersao_maxima=DISPERSAO_MAXIMA):
+    """
+    Coordenadas para unidades sem localização a partir de unidades irmãs já
+    localizadas (mesmo endereço, mesmo CEP ou mesma mantenedora).
+
+    Para cada bloco aceito usa a mediana das coordenadas das irmãs. Retorna
+    um DataFrame indexado como `df`, só com as linhas resolvidas e as colunas
+    Latitude, Longitude e Tipo_Correspondencia.
+    """
+    lat = converter_coordenada(df["Latitude"])
+    lon = converter_coordenada(df["Longitude"])
+    localizada = ~(coordenada_ausente(df["Latitude"]) | coordenada_ausente(df["Longitude"]))
+    pendente = ~localizada
+    # Coordenada marcada fora da UF/município continua na unidade, mas não é doada
+    if "Coord_Valida" in df.columns:
+        localizada &= df["Coord_Valida"].astype(str).eq("True")
+
+    resolvidas = []
+    for tipo, chave in chaves_de_bloqueio(df).items():
+        if not pendente.any():
+            break
+
+        # Índice do bloco: estatísticas das irmãs localizadas, por chave
+        irmas = pd.DataFrame(
+            {"Chave": chave[localizada], "Lat": lat[localizada], "Lon": lon[localizada]}
+        ).dropna(subset=["Chave"])
+        blocos = irmas.groupby("Chave").agg(
+            Lat=("Lat", "median"),
+            Lon=("Lon", "median"),
+            Lat_Min=("Lat", "min"),
+            Lat_Max=("Lat", "max"),
+            Lon_Min=("Lon", "min"),
+            Lon_Max=("Lon", "max"),
+        )
+        dispersao = (blocos["Lat_Max"] - blocos["Lat_Min"]).combine(
+            blocos["Lon_Max"] - blocos["Lon_Min"], max
+        )
+        blocos = blocos[dispersao <= dispersao_maxima[tipo]]
+
+        alvo = chave[pendente].dropna()
+        alvo = alvo[alvo.isin(blocos.index)]
+        if alvo.empty:
+            continue
+
+        achadas = blocos.loc[alvo.to_numpy(), ["Lat", "Lon"]].set_axis(alvo.index)
+        achadas["Tipo_Correspondencia"] = tipo
+        resolvidas.append(achadas)
+        pendente[alvo.index] = False
+
+    if not resolvidas:
+        return pd.DataFrame(columns=["Latitude", "Longitude", "Tipo_Correspondencia"])
+    return pd.concat(resolvidas).rename(columns={"Lat": "Latitude", "Lon": "Longitude"})
+
+
+def aplicar_reaproveitamento(df):
+    """
+    Preenche, no próprio DataFrame, as coordenadas das unidades resolvidas
+    por irmãs e marca a coluna Tipo_Correspondencia. Retorna a contagem por tipo.
+    """
+    resolvidas = reaproveitar_coordenadas(df)
+    if "Tipo_Correspondencia" not in df.columns:
+        df["Tipo_Correspondencia"] = None
+    if resolvidas.empty:
+        return {}
+
+    df.loc[resolvidas.index, "Latitude"] = resolvidas["Latitude"].astype(str)
+    df.loc[resolvidas.index, "Longitude"] = resolvidas["Longitude"].astype(str)
+    df.loc[resolvidas.index, "Tipo_Correspondencia"] = resolvidas["Tipo_Correspondencia"]
+    return resolvidas["Tipo_Correspondencia"].value_counts().to_dict()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Reaproveita coordenadas de estabelecimentos irmãos já localizados."
+    )
+    parser.add_argument(
+        "entrada", nargs="?", default=ARQUIVO_ENTRADA, help="CSV no formato do tbEstabelecimento"
+    )
+    parser.add_argument("--saida", default=ARQUIVO_SAIDA)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    df = pd.read_csv(
+        args.entrada,
+        sep=";",
+        dtype=str,
+        usecols=lambda c: c in MAPA_TB_ESTABELECIMENTO,
+    ).rename(columns=MAPA_TB_ESTABELECIMENTO)
+
+    sem_coordenada = (coordenada_ausente(df["Latitude"]) | coordenada_ausente(df["Longitude"])).sum()
+    resolvidas = reaproveitar_coordenadas(df)
+
+    df_saida = df.loc[resolvidas.index, ["CNES"]].join(resolvidas)
+    df_saida.to_csv(args.saida, sep=";", index=False)
+
+    print(f"   Sem coordenada: {sem_coordenada}")
+    for tipo, qtd in resolvidas["Tipo_Correspondencia"].value_counts().items():
+        print(f"   {tipo}: {qtd}")
+    print(
+        f"✅ {len(resolvidas)} coordenadas reaproveitadas em '{args.saida}' "
+        f"({time.perf_counter() - inicio:.1f}s)"
+    )
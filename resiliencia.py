@@ -0,0 +1,287 @@
+import random
+import threading
+import time
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+TENTATIVAS = 4
+ESPERA_BASE = 0.5  # segundos
+ESPERA_MAXIMA = 30.0  # segundos
+
+# Disjuntor: abre após N falhas seguidas e fica aberto por X segundos
+LIMITE_FALHAS = 5
+TEMPO_RECUPERACAO = 60.0
+TEMPO_RECUPERACAO_COTA = 15 * 60.0
+
+
+# ============================
+# ERROS CLASSIFICADOS
+# ============================
+
+
+class ErroExterno(Exception):
+    """Falha numa chamada a serviço externo (CNES, Google, Nominatim)."""
+
+    def __init__(self, mensagem, servico=None, causa=None):
+        super().__init__(mensagem)
+        self.servico = servico
+        self.causa = causa
+
+
+class ErroTransitorio(ErroExterno):
+    """Falha temporária (timeout, 5xx): vale tentar de novo mais tarde."""
+
+
+class ErroPermanente(ErroExterno):
+    """Requisição inválida ou recusada: repetir não adianta."""
+
+
+class ErroCota(ErroExterno):
+    """Cota ou limite de taxa do serviço estourado."""
+
+
+class CircuitoAberto(ErroTransitorio):
+    """O disjuntor do serviço está aberto; a chamada nem foi feita."""
+
+
+class ErroFatal(Exception):
+    """
+    Falha que precisa interromper a execução (ex.: gravação ausente no modo de
+    reprodução). Não é repetida, não é reclassificada e, por não ser um
+    ErroExterno, nunca é tratada como "não encontrado" pelos provedores.
+    """
+
+    def __init__(self, mensagem, servico=None, causa=None):
+        super().__init__(mensagem)
+        self.servico = servico
+        self.causa = causa
+
+
+class ErroConfiguracao(ErroFatal):
+    """Chave inválida ou revogada, API desabilitada: nenhuma chamada vai funcionar."""
+
+
+# Nomes das classes de exceção das bibliotecas (requests, googlemaps, geopy),
+# comparados pelo nome para não importar dependências opcionais aqui
+_EXCECOES_TRANSITORIAS = {
+    "Timeout",
+    "TransportError",
+    "ConnectionError",
+    "ChunkedEncodingError",
+    "GeocoderTimedOut",
+    "GeocoderUnavailable",
+    "GeocoderServiceError",
+}
+_EXCECOES_COTA = {"_OverQueryLimit", "GeocoderQuotaExceeded", "GeocoderRateLimited"}
+_EXCECOES_CONFIGURACAO = {
+    "GeocoderAuthenticationFailure",
+    "GeocoderInsufficientPrivileges",
+}
+_EXCECOES_PERMANENTES = {
+    "GeocoderQueryError",
+    "GeocoderParseError",
+}
+_STATUS_API_COTA = {"OVER_QUERY_LIMIT", "OVER_DAILY_LIMIT"}
+# INVALID_REQUEST é da consulta (endereço vazio ou malformado): cai em permanente
+_STATUS_API_CONFIGURACAO = {"REQUEST_DENIED"}
+
+
+def classe_para_status(status):
+    """Classe de erro correspondente a um status HTTP diferente de 2xx."""
+    if status == 429:
+        return ErroCota
+    if status in (401, 403):
+        return ErroConfiguracao
+    if status == 408 or status >= 500:
+        return ErroTransitorio
+    return ErroPermanente
+
+
+def classificar_excecao(exc):
+    """
+    Retorna a classe de erro (transitório, permanente, cota ou configuração)
+    de uma exceção.
+    """
+    if isinstance(exc, (ErroExterno, ErroFatal)):
+        return type(exc)
+
+    # Do mais específico para o mais genérico
+    for classe in type(exc).__mro__:
+        nome = classe.__name__
+        if nome in _EXCECOES_COTA:
+            return ErroCota
+        if nome in _EXCECOES_CONFIGURACAO:
+            return ErroConfiguracao
+        if nome in _EXCECOES_PERMANENTES:
+            return ErroPermanente
+        if nome in _EXCECOES_TRANSITORIAS:
+            return ErroTransitorio
+        if nome == "ApiError":
+            status = getattr(exc, "status", None)
+            if status in _STATUS_API_COTA:
+                return ErroCota
+            if status in _STATUS_API_CONFIGURACAO:
+                return ErroConfiguracao
+            if status == "UNKNOWN_ERROR":
+                return ErroTransitorio
+            return ErroPermanente
+        if nome == "HTTPError":
+            resposta = getattr(exc, "response", None)
+            status = getattr(exc, "status_code", getattr(resposta, "status_code", None))
+            if status is not None:
+                return classe_para_status(status)
+            return ErroTransitorio
+
+    return ErroPermanente
+
+
+# ============================
+# DISJUNTOR (CIRCUIT BREAKER)
+# ============================
+
+
+class Disjuntor:
+    """
+    Disjuntor por serviço.
+
+    Fechado: chamadas passam. Após `limite_falhas` falhas transitórias
+    seguidas (ou um erro de cota) abre e recusa chamadas durante o tempo de
+    recuperação; depois deixa passar uma chamada de teste (meio-aberto).
+    """
+
+    def __init__(self, nome, limite_falhas=LIMITE_FALHAS, tempo_recuperacao=TEMPO_RECUPERACAO):
+        self.nome = nome
+        self.limite_falhas = limite_falhas
+        self.tempo_recuperacao = tempo_recuperacao
+        self._falhas = 0
+        self._aberto_ate = 0.0
+        self._teste_em_andamento = False
+        self._trava = threading.Lock()
+
+    @property
+    def aberto(self):
+        return time.monotonic() < self._aberto_ate
+
+    def permitir(self):
+        """Levanta CircuitoAberto se a chamada não deve ser feita agora."""
+        with self._trava:
+            agora = time.monotonic()
+            if agora < self._aberto_ate:
+                raise CircuitoAberto(
+                    f"Disjuntor '{self.nome}' aberto por mais {self._aberto_ate - agora:.0f}s",
+                    servico=self.nome,
+                )
+            if self._falhas >= self.limite_falhas:
+                # Meio-aberto: apenas uma chamada de teste por vez
+                if self._teste_em_andamento:
+                    raise CircuitoAberto(
+                        f"Disjuntor '{self.nome}' aguardando chamada de teste",
+                        servico=self.nome,
+                    )
+                self._teste_em_andamento = True
+
+    def registrar_sucesso(self):
+        with self._trava:
+            self._falhas = 0
+            self._teste_em_andamento = False
+
+    def liberar_teste(self):
+        """Encerra a chamada de teste sem contar sucesso nem falha (ex.: ErroFatal)."""
+        with self._trava:
+            self._teste_em_andamento = False
+
+    def registrar_falha(self, tempo_abertura=None):
+        """Conta uma falha; `tempo_abertura` força a abertura imediata."""
+        with self._trava:
+            self._teste_em_andamento = False
+            self._falhas += 1
+            if tempo_abertura is not None:
+                self._falhas = max(self._falhas, self.limite_falhas)
+                self._aberto_ate = time.monotonic() + tempo_abertura
+            elif self._falhas >= self.limite_falhas:
+                self._aberto_ate = time.monotonic() + self.tempo_recuperacao
+
+
+_disjuntores = {}
+_trava_disjuntores = threading.Lock()
+
+
+def obter_disjuntor(servico):
+    """Disjuntor compartilhado de um serviço (criado na primeira chamada)."""
+    with _trava_disjuntores:
+        if servico not in _disjuntores:
+            _disjuntores[servico] = Disjuntor(servico)
+        return _disjuntores[servico]
+
+
+# ============================
+# CHAMADA COM RETENTATIVAS
+# ============================
+
+
+def calcular_espera(tentativa, espera_base=ESPERA_BASE, espera_maxima=ESPERA_MAXIMA):
+    """Backoff exponencial com jitter completo."""
+    return random.uniform(0, min(espera_maxima, espera_base * 2**tentativa))
+
+
+def chamar_com_resiliencia(
+    servico,
+    funcao,
+    *args,
+    tentativas=TENTATIVAS,
+    espera_base=ESPERA_BASE,
+    espera_maxima=ESPERA_MAXIMA,
+    **kwargs,
+):
+    """
+    Executa `funcao(*args, **kwargs)` protegida pelo disjuntor do serviço.
+
+    Falhas transitórias são repetidas com backoff exponencial e jitter;
+    erros permanentes e de cota sobem na hora como ErroPermanente/ErroCota.
+    Esgotadas as tentativas, levanta ErroTransitorio. ErroFatal (ex.: chave
+    recusada, como ErroConfiguracao) sobe na hora, sem retentativa.
+    """
+    disjuntor = obter_disjuntor(servico)
+    ultimo_erro = None
+
+    for tentativa in range(tentativas):
+        disjuntor.permitir()
+        try:
+            resultado = funcao(*args, **kwargs)
+        except ErroFatal:
+            disjuntor.liberar_teste()
+            raise
+        except Exception as exc:
+            classe = classificar_excecao(exc)
+            if issubclass(classe, ErroFatal):
+                # Sem isso uma chamada de teste deixaria o disjuntor meio-aberto preso
+                disjuntor.liberar_teste()
+                raise classe(str(exc), servico=servico, causa=exc) from exc
+            if classe is ErroPermanente:
+                # O serviço respondeu; o problema é a requisição
+                disjuntor.registrar_sucesso()
+                if isinstance(exc, ErroExterno):
+                    raise
+                raise ErroPermanente(str(exc), servico=servico, causa=exc) from exc
+            if classe is ErroCota:
+                disjuntor.registrar_falha(tempo_abertura=TEMPO_RECUPERACAO_COTA)
+                if isinstance(exc, ErroExterno):
+                    raise
+                raise ErroCota(str(exc), servico=servico, causa=exc) from exc
+
+            disjuntor.registrar_falha()
+            ultimo_erro = exc
+            if tentativa < tentativas - 1:
+                time.sleep(calcular_espera(tentativa, espera_base, espera_maxima))
+            continue
+
+        disjuntor.registrar_sucesso()
+        return resultado
+
+    raise ErroTransitorio(
+        f"{servico}: {tentativas} tentativas falharam ({ultimo_erro})",
+        servico=servico,
+        causa=ultimo_erro,
+    ) from ultimo_erro
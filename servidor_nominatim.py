@@ -0,0 +1,282 @@
+import argparse
+import json
+import os
+import re
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from assinatura_endereco import normalizar_campo, normalizar_texto
+from gazetteer import (
+    ARQUIVO_GAZETTEER,
+    ARQUIVO_MUNICIPIOS,
+    NIVEIS,
+    NIVEL_BAIRRO,
+    NIVEL_CEP,
+    NIVEL_ESTABELECIMENTO,
+    NIVEL_MUNICIPIO,
+    NIVEL_RUA,
+    NIVEL_SEDE,
+    Gazetteer,
+    chave_cep_texto,
+)
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+HOST = "127.0.0.1"
+PORTA = 8080
+
+ARQUIVO_ESTADOS = os.path.join("Dados_Auxiliares", "estados.csv")
+
+# Nominatim responde "importance" entre 0 e 1; aqui ela reflete a precisão do nível
+IMPORTANCIA = {
+    NIVEL_ESTABELECIMENTO: 0.9,
+    NIVEL_CEP: 0.8,
+    NIVEL_RUA: 0.7,
+    NIVEL_BAIRRO: 0.5,
+    NIVEL_MUNICIPIO: 0.3,
+    NIVEL_SEDE: 0.2,
+}
+
+# Meia largura (graus) da boundingbox devolvida, por nível. O nome da unidade
+# não é mais preciso que o CEP (nomes de rede e genéricos), então a caixa dele
+# não passa da confiança mínima do roteador
+RAIO_CAIXA = {
+    NIVEL_ESTABELECIMENTO: 0.002,
+    NIVEL_CEP: 0.002,
+    NIVEL_RUA: 0.005,
+    NIVEL_BAIRRO: 0.01,
+    NIVEL_MUNICIPIO: 0.05,
+    NIVEL_SEDE: 0.05,
+}
+
+LICENCA = "Dados: CNES/DataSUS e IBGE (servidor local compatível com Nominatim)"
+
+PAISES = {"BRASIL", "BRAZIL", "BR"}
+PADRAO_CEP = re.compile(r"^\d{5}-?\d{3}$")
+PADRAO_SEPARADOR = re.compile(r",| - ")
+
+
+# ============================
+# ÍNDICE
+# ============================
+
+
+class IndiceGeografico:
+    """
+    Índice em memória para responder consultas de texto livre.
+
+    Acha o município (nome ou código IBGE, desempatado pela UF) e, dentro
+    dele, o nível mais fino que alguma parte da consulta casar no gazetteer:
+    estabelecimento, CEP, rua ou bairro.
+    """
+
+    def __init__(self, gazetteer, arquivo_municipios=ARQUIVO_MUNICIPIOS):
+        self.gazetteer = gazetteer
+
+        df_est = pd.read_csv(ARQUIVO_ESTADOS, sep=",", dtype=str, encoding="utf-8-sig")
+        sigla_por_codigo = dict(zip(df_est["codigo_uf"], df_est["uf"]))
+        self.siglas = set(df_est["uf"])
+        self.uf_por_nome = dict(zip(normalizar_campo(df_est["nome"]), df_est["uf"]))
+
+        df_mun = pd.read_csv(arquivo_municipios, sep=",", dtype=str)
+        codigos = df_mun["codigo_ibge"].str[:6]
+        ufs = df_mun["codigo_uf"].map(sigla_por_codigo)
+        self.municipios = dict(zip(codigos, zip(df_mun["nome"], ufs)))
+        self.por_nome = {}
+        for nome, codigo, uf in zip(normalizar_campo(df_mun["nome"]), codigos, ufs):
+            self.por_nome.setdefault(nome, []).append((codigo, uf))
+
+    def _uf(self, texto):
+        if texto in self.siglas:
+            return texto
+        return self.uf_por_nome.get(texto)
+
+    def _municipio(self, texto, uf=None):
+        if texto.isdigit() and len(texto) in (6, 7):
+            return texto[:6] if texto[:6] in self.municipios else None
+        candidatos = self.por_nome.get(texto, [])
+        if uf:
+            candidatos = [c for c in candidatos if c[1] == uf]
+        return candidatos[0][0] if candidatos else None
+
+    def resolver(self, consulta=None, rua=None, cidade=None, estado=None, cep=None):
+        """(latitude, longitude, nivel, id_municipio) ou None."""
+        brutas = [p.strip() for p in PADRAO_SEPARADOR.split(consulta or "")]
+        brutas += [p for p in (rua, cep, cidade, estado) if p]
+        brutas = [p for p in brutas if p]
+        partes = [normalizar_texto(p) for p in brutas]
+
+        # CEP e UF podem aparecer em qualquer posição
+        ceps_brutos = [b for b in brutas if PADRAO_CEP.match(b)]
+        ceps = [c for c in map(chave_cep_texto, ceps_brutos) if c]
+        uf = next((self._uf(p) for p in reversed(partes) if self._uf(p)), None)
+
+        # Município: a última parte que casar (endereços terminam pela cidade)
+        municipio = None
+        posicao = len(partes)
+        for i in range(len(partes) - 1, -1, -1):
+            if partes[i] in PAISES:
+                continue
+            municipio = self._municipio(partes[i], uf)
+            if municipio:
+                posicao = i
+                break
+
+        if municipio is None:
+            for cep in ceps:
+                coordenada = self.gazetteer.buscar(NIVEL_CEP, cep)
+                if coordenada:
+                    return coordenada[0], coordenada[1], NIVEL_CEP, None
+            return None
+
+        melhor = None
+        for cep in ceps:
+            coordenada = self.gazetteer.buscar(NIVEL_CEP, cep)
+            if coordenada:
+                melhor = (coordenada, NIVEL_CEP)
+
+        for parte in partes[:posicao]:
+            if not parte or parte.isdigit():
+                continue
+            for nivel in (NIVEL_ESTABELECIMENTO, NIVEL_RUA, NIVEL_BAIRRO):
+                if melhor and NIVEIS.index(melhor[1]) <= NIVEIS.index(nivel):
+                    break
+                coordenada = self.gazetteer.buscar(nivel, f"{municipio}|{parte}")
+                if coordenada:
+                    melhor = (coordenada, nivel)
+                    break
+
+        # Como no Nominatim, parte abaixo do município que não casou (rua, bairro,
+        # CEP ou nome) dá resposta vazia; o centroide só vale para "só a cidade"
+        so_cidade = not ceps_brutos and all(
+            not parte or parte in PAISES or self._uf(parte)
+            for parte in partes[:posicao]
+        )
+        if melhor is None and so_cidade:
+            for nivel in (NIVEL_MUNICIPIO, NIVEL_SEDE):
+                coordenada = self.gazetteer.buscar(nivel, municipio)
+                if coordenada:
+                    melhor = (coordenada, nivel)
+                    break
+        if melhor is None:
+            return None
+
+        (lat, lon), nivel = melhor
+        return lat, lon, nivel, municipio
+
+    def resposta(self, resultado, consulta):
+        """Resultado no formato JSON do /search do Nominatim."""
+        lat, lon, nivel, municipio = resultado
+        nome, uf = self.municipios.get(municipio, ("", ""))
+        raio = RAIO_CAIXA[nivel]
+        exibicao = ", ".join(p for p in (consulta, nome, uf, "Brasil") if p)
+        return {
+            "place_id": zlib.crc32(f"{lat:.7f}|{lon:.7f}|{nivel}".encode("utf-8")),
+            "licence": LICENCA,
+            "osm_type": "node",
+            "osm_id": 0,
+            "lat": f"{lat:.7f}",
+            "lon": f"{lon:.7f}",
+            "boundingbox": [
+                f"{lat - raio:.7f}",
+                f"{lat + raio:.7f}",
+                f"{lon - raio:.7f}",
+                f"{lon + raio:.7f}",
+            ],
+            "display_name": exibicao,
+            "class": "place",
+            "type": nivel.lower(),
+            "importance": IMPORTANCIA[nivel],
+        }
+
+
+# ============================
+# SERVIDOR HTTP
+# ============================
+
+
+def criar_handler(indice, registrar_acessos=False):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Cabeçalho e corpo saem em escritas separadas; sem isso cada resposta
+        # esperaria o ACK atrasado do cliente (~40 ms)
+        disable_nagle_algorithm = True
+
+        def _enviar(self, status, corpo, tipo="application/json; charset=utf-8"):
+            dados = corpo.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+            if url.path in ("/status", "/status.php"):
+                self._enviar(200, "OK", "text/plain; charset=utf-8")
+                return
+            if url.path not in ("/", "/search", "/search.php"):
+                self._enviar(404, json.dumps({"error": "endpoint desconhecido"}))
+                return
+
+            consulta = parametros.get("q")
+            resultado = indice.resolver(
+                consulta,
+                rua=parametros.get("street"),
+                cidade=parametros.get("city") or parametros.get("county"),
+                estado=parametros.get("state"),
+                cep=parametros.get("postalcode"),
+            )
+            itens = []
+            if resultado:
+                texto = consulta or parametros.get("street") or ""
+                itens.append(indice.resposta(resultado, texto))
+            self._enviar(200, json.dumps(itens, ensure_ascii=False))
+
+        def log_message(self, formato, *args):
+            if registrar_acessos:
+                super().log_message(formato, *args)
+
+    return Handler
+
+
+def iniciar_servidor(
+    host=HOST, porta=PORTA, arquivo_gazetteer=ARQUIVO_GAZETTEER, registrar_acessos=False
+):
+    print("--- 🗺️ SERVIDOR NOMINATIM LOCAL ---")
+    indice = IndiceGeografico(Gazetteer.carregar(arquivo_gazetteer))
+    servidor = ThreadingHTTPServer(
+        (host, porta), criar_handler(indice, registrar_acessos)
+    )
+    servidor.daemon_threads = True
+    print(f"   Índice carregado: {len(indice.municipios)} municípios.")
+    print(f"✅ Ouvindo em http://{host}:{porta}/search (Ctrl+C para parar)")
+    print(
+        f"   Use NOMINATIM_DOMINIO={host}:{porta} NOMINATIM_LOCAL=1"
+        " nos scripts de geocodificação."
+    )
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n   Servidor encerrado.")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Servidor local compatível com o /search do Nominatim."
+    )
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--porta", type=int, default=PORTA)
+    parser.add_argument("--gazetteer", default=ARQUIVO_GAZETTEER)
+    parser.add_argument("--log", action="store_true", help="Mostra cada requisição")
+    args = parser.parse_args()
+    iniciar_servidor(args.host, args.porta, args.gazetteer, args.log)
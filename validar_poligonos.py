@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from coordenadas import avaliar_coordenadas, distancia_km
+
+try:
+    import shapely
+    from shapely import STRtree
+    from shapely.geometry import shape
+except ImportError:  # sem shapely a validação por polígono é desligada
+    shapely = None
+
+try:
+    import shapefile  # pyshp, só para ler .shp
+except ImportError:
+    shapefile = None
+
+# ============================
+# CONFIGURAÇÕES
+# ============================
+
+PASTA_TRATADOS = "Dados_Tratados"
+ARQUIVO_DIM = os.path.join(PASTA_TRATADOS, "Dim_Unidades_Saude.csv")
+
+# Malha municipal do IBGE em GeoJSON ou shapefile (ex.: BR_Municipios_2022.shp)
+ARQUIVO_MALHA = os.path.join("Dados_Auxiliares", "malha_municipal.geojson")
+
+# Malha compilada em WKB (Dados_Tratados/<arquivo da malha>.wkb): ler
+# GeoJSON/shapefile custa segundos, a compilada carrega em décimos. É refeita
+# quando o arquivo de origem for mais novo.
+ASSINATURA = b"MALHAMN1"
+TAMANHO_CABECALHO = 16
+
+ARQUIVO_RELATORIO = os.path.join(PASTA_TRATADOS, "validacao_poligonos.csv")
+COLUNAS_RELATORIO = ["CNES", "Nome_Unidade", "ID_Municipio", "Latitude", "Longitude"]
+
+# Propriedade com o código IBGE do município, nos formatos mais comuns
+# (shapefile do IBGE, API de malhas do IBGE, municipios.csv)
+CAMPOS_CODIGO = ["CD_MUN", "CD_GEOCMU", "codarea", "codigo_ibge", "GEOCODIGO", "id"]
+
+# Pontos fora do polígono esperado por menos que isso (ex.: do outro lado da
+# rua na divisa) não são reprovados
+TOLERANCIA_KM = 0.5
+
+
+# ============================
+# MALHA
+# ============================
+
+
+def _codigo(propriedades):
+    for campo in CAMPOS_CODIGO:
+        valor = propriedades.get(campo)
+        if valor not in (None, ""):
+            return str(valor).strip()[:6]
+    return None
+
+
+def ler_feicoes(caminho):
+    """(código IBGE de 6 dígitos, geometria GeoJSON) de cada município do arquivo."""
+    if caminho.lower().endswith(".shp"):
+        if shapefile is None:
+            raise ImportError(
+                "Instale o pyshp (pip install pyshp) para ler shapefiles."
+            )
+        with shapefile.Reader(caminho, encoding="latin1") as leitor:
+            campos = [campo[0] for campo in leitor.fields[1:]]
+            for registro in leitor.iterShapeRecords():
+                propriedades = dict(zip(campos, registro.record))
+                yield _codigo(propriedades), registro.shape.__geo_interface__
+    else:
+        with open(caminho, encoding="utf-8") as f:
+            dados = json.load(f)
+        for feicao in dados["features"]:
+            propriedades = {"id": feicao.get("id"), **(feicao.get("properties") or {})}
+            yield _codigo(propriedades), feicao["geometry"]
+
+
+def arquivo_compilado(caminho):
+    return os.path.join(PASTA_TRATADOS, os.path.basename(caminho) + ".wkb")
+
+
+def compilar_malha(caminho=ARQUIVO_MALHA, destino=None):
+    """
+    Grava a malha em binário: cabeçalho (ASSINATURA + quantidade), códigos
+    int64[n], tamanhos uint64[n] e os WKB concatenados.
+    """
+    codigos, geometrias = [], []
+    for codigo, geometria in ler_feicoes(caminho):
+        if codigo and geometria:
+            codigos.append(int(codigo))
+            geometrias.append(shape(geometria))
+    wkb = shapely.to_wkb(np.array(geometrias, dtype=object))
+
+    destino = destino or arquivo_compilado(caminho)
+    destino_tmp = destino + ".tmp"
+    with open(destino_tmp, "wb") as f:
+        f.write(ASSINATURA)
+        f.write(np.uint64(len(codigos)).tobytes())
+        f.write(np.array(codigos, dtype="int64").tobytes())
+        f.write(np.array([len(w) for w in wkb], dtype="uint64").tobytes())
+        f.write(b"".join(wkb))
+    os.replace(destino_tmp, destino)
+    return len(codigos)
+
+
+def ler_compilada(caminho):
+    """(códigos em texto, geometrias) lidos da malha compilada."""
+    with open(caminho, "rb") as f:
+        dados = f.read()
+    if dados[:8] != ASSINATURA:
+        raise ValueError(f"{caminho} não é uma malha compilada.")
+    n = int(np.frombuffer(dados[8:TAMANHO_CABECALHO], dtype="uint64")[0])
+    inicio = TAMANHO_CABECALHO
+    codigos = np.frombuffer(dados, dtype="int64", count=n, offset=inicio)
+    tamanhos = np.frombuffer(dados, dtype="uint64", count=n, offset=inicio + 8 * n)
+    fins = inicio + 16 * n + np.cumsum(tamanhos, dtype="int64")
+    wkb = [dados[fim - tam : fim] for fim, tam in zip(fins, tamanhos.astype("int64"))]
+    return codigos.astype(str).astype(object), shapely.from_wkb(wkb)
+
+
+class MalhaMunicipal:
+    """
+    Polígonos dos municípios num STRtree.
+
+    `municipio_de` acha em que município cada ponto cai (consulta em lote na
+    árvore); `contem` testa cada ponto contra o polígono do seu município
+    esperado, com as geometrias preparadas.
+    """
+
+    def __init__(self, caminho=ARQUIVO_MALHA):
+        compilado = arquivo_compilado(caminho)
+        if not os.path.exists(compilado) or (
+            os.path.getmtime(compilado) < os.path.getmtime(caminho)
+        ):
+            compilar_malha(caminho, compilado)
+
+        self.codigos, self.geometrias = ler_compilada(compilado)
+        shapely.prepare(self.geometrias)
+        self.arvore = STRtree(self.geometrias)
+        self.posicao = {codigo: i for i, codigo in enumerate(self.codigos)}
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def posicoes(self, id_municipio):
+        """Posição do polígono de cada município (-1 quando não está na malha)."""
+        municipio = pd.Series(id_municipio).astype("string").str.strip().str[:6]
+        return municipio.map(self.posicao).fillna(-1).to_numpy(dtype="int64")
+
+    def municipio_de(self, pontos):
+        """Código do município que contém cada ponto (None fora da malha)."""
+        entrada, arvore = self.arvore.query(pontos, predicate="covered_by")
+        achado = np.full(len(pontos), None, dtype=object)
+        # Ponto na divisa cai em dois polígonos: fica o primeiro
+        primeiro = np.unique(entrada, return_index=True)[1]
+        achado[entrada[primeiro]] = self.codigos[arvore[primeiro]]
+        return achado
+
+    def contem(self, pontos, posicoes):
+        """Ponto dentro (ou na borda) do polígono da posição correspondente."""
+        resultado = np.zeros(len(pontos), dtype=bool)
+        conhecido = posicoes >= 0
+        resultado[conhecido] = shapely.covered_by(
+            pontos[conhecido], self.geometrias[posicoes[conhecido]]
+        )
+        return resultado
+
+    def distancia_ate(self, pontos, posicoes):
+        """Distância de cada ponto até a borda do polígono da posição (km)."""
+        linhas = shapely.shortest_line(pontos, self.geometrias[posicoes])
+        coords = shapely.get_coordinates(linhas).reshape(-1, 2, 2)
+        return distancia_km(
+            coords[:, 0, 1], coords[:, 0, 0], coords[:, 1, 1], coords[:, 1, 0]
+        )
+
+
+@lru_cache(maxsize=2)
+def carregar_malha(caminho=ARQUIVO_MALHA):
+    """Malha carregada (uma vez por processo), ou None sem shapely ou sem arquivo."""
+    if shapely is None or not os.path.exists(caminho):
+        return None
+    return MalhaMunicipal(caminho)
+
+
+# ============================
+# VALIDAÇÃO
+# ============================
+
+
+def validar_coordenadas(df, malha, col_lat="Latitude", col_lon="Longitude"):
+    """
+    Testa, em lote, se cada coordenada cai no polígono do seu ID_Municipio.
+
+    Retorna um DataFrame alinhado a `df` com Dentro_Municipio (bool; NA para
+    coordenada ausente ou município fora da malha), Municipio_Encontrado e
+    Distancia_km até o município esperado, preenchidos só para os erros.
+    """
+    qualidade = avaliar_coordenadas(df, col_lat=col_lat, col_lon=col_lon)
+    posicoes = malha.posicoes(df["ID_Municipio"])
+    avaliar = ~qualidade["Coord_Nula"].to_numpy() & (posicoes >= 0)
+
+    resultado = pd.DataFrame(
+        {
+            "Dentro_Municipio": pd.Series(pd.NA, index=df.index, dtype="boolean"),
+            "Municipio_Encontrado": pd.Series(None, index=df.index, dtype="object"),
+            "Distancia_km": np.nan,
+        },
+        index=df.index,
+    )
+    if not avaliar.any():
+        return resultado
+
+    pontos = shapely.points(
+        qualidade["Lon"].to_numpy()[avaliar], qualidade["Lat"].to_numpy()[avaliar]
+    )
+    dentro = malha.contem(pontos, posicoes[avaliar])
+    resultado.loc[avaliar, "Dentro_Municipio"] = dentro
+
+    # Só os erros pagam a busca na árvore e o cálculo de distância
+    indice_erros = resultado.index[avaliar][~dentro]
+    if len(indice_erros):
+        pontos_erro = pontos[~dentro]
+        resultado.loc[indice_erros, "Municipio_Encontrado"] = malha.municipio_de(
+            pontos_erro
+        )
+        resultado.loc[indice_erros, "Distancia_km"] = malha.distancia_ate(
+            pontos_erro, posicoes[avaliar][~dentro]
+        )
+    return resultado
+
+
+def fora_do_poligono(df, col_lat="Latitude", col_lon="Longitude", malha=None):
+    """
+    Máscara das coordenadas fora do município além da TOLERANCIA_KM.
+
+    Sem shapely ou sem arquivo de malha retorna tudo False (a checagem por
+    caixa de coordenadas.py continua valendo).
+    """
+    if malha is None:
+        malha = carregar_malha()
+    if malha is None:
+        return pd.Series(False, index=df.index)
+    validacao = validar_coordenadas(df, malha, col_lat, col_lon)
+    return (validacao["Distancia_km"] > TOLERANCIA_KM).fillna(False)
+
+
+def aplicar_validacao(df, malha=None):
+    """
+    Reprova, no próprio DataFrame, coordenadas fora do polígono do município:
+    liga Fora_Municipio, desliga Coord_Valida e apaga a coordenada para ela
+    voltar à fila. Retorna a quantidade reprovada (None sem malha).
+    """
+    if malha is None:
+        malha = carregar_malha()
+    if malha is None:
+        return None
+    fora = fora_do_poligono(df, malha=malha)
+    if fora.any():
+        df.loc[fora, ["Latitude", "Longitude"]] = None
+        if "Fora_Municipio" in df.columns:
+            df.loc[fora, "Fora_Municipio"] = True
+            df.loc[fora, "Coord_Valida"] = False
+    return int(fora.sum())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Confere se as unidades caem no polígono do próprio município."
+    )
+    parser.add_argument("--malha", default=ARQUIVO_MALHA, help="GeoJSON ou shapefile")
+    parser.add_argument("--entrada", default=ARQUIVO_DIM)
+    parser.add_argument("--saida", default=ARQUIVO_RELATORIO)
+    args = parser.parse_args()
+
+    if shapely is None:
+        print("❌ Instale o shapely (pip install shapely) para validar por polígono.")
+        raise SystemExit(1)
+    if not os.path.exists(args.malha):
+        print(f"❌ Malha municipal não encontrada: {args.malha}")
+        raise SystemExit(1)
+
+    print("--- 🗺️ VALIDAÇÃO DAS COORDENADAS PELA MALHA MUNICIPAL ---")
+    inicio = time.perf_counter()
+    malha = MalhaMunicipal(args.malha)
+    print(f"   Malha: {len(malha)} municípios ({time.perf_counter() - inicio:.1f}s)")
+
+    df = pd.read_csv(
+        args.entrada,
+        sep=";",
+        dtype=str,
+        usecols=lambda c: c in COLUNAS_RELATORIO,
+    )
+    inicio = time.perf_counter()
+    validacao = validar_coordenadas(df, malha)
+    duracao = time.perf_counter() - inicio
+
+    erros = df.join(validacao)[~validacao["Dentro_Municipio"].fillna(True)]
+    erros = erros.sort_values("Distancia_km", ascending=False)
+    erros.to_csv(args.saida, sep=";", index=False)
+
+    print(
+        f"   Validadas: {validacao['Dentro_Municipio'].notna().sum()} coordenadas "
+        f"({duracao:.1f}s)"
+    )
+    print(f"   Fora do município: {len(erros)}")
+    print(
+        f"   Além da tolerância de {TOLERANCIA_KM} km: "
+        f"{(erros['Distancia_km'] > TOLERANCIA_KM).sum()}"
+    )
+    print(f"✅ Relatório em '{args.saida}'")